@@ -2,6 +2,8 @@
 ASGI config for AEQUORA project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn AEQUORA.asgi:application``) so the
+long-lived /api/stream/ connections do not each hold a worker thread.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -38,6 +38,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Must be first
+    'base.instrumentation.QueryBudgetMiddleware',  # SQL/serializer metrics per endpoint
+    'base.profiling.ProfilingMiddleware',  # sampled flamegraph capture (off unless PROFILING['ENABLED'])
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,6 +85,17 @@ DATABASES = {
     }
 }
 
+# --------------------------
+# CACHES
+# --------------------------
+# REDIS_URL (e.g. redis://127.0.0.1:6379/0) shares the cache between the web processes
+# and the `run_tasks` worker, which the dashboard cache and the identity cache's shared
+# tier rely on. Without it every process gets its own LocMemCache (development).
+if os.environ.get('REDIS_URL'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.environ['REDIS_URL']}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 # --------------------------
 # PASSWORD VALIDATION
 # --------------------------
@@ -131,15 +144,201 @@ DJOSER = {
 # REST FRAMEWORK
 # --------------------------
 # This tells Django to check for the 'Authorization: Token ...' header
+# The base.authentication classes also attach request.app_user / request.resident /
+# request.provider / request.authority / request.community (one query per request).
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
+        'base.authentication.AppTokenAuthentication',
+        'base.authentication.AppSessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
+
+# Keyset pagination for list endpoints (base.pagination). Clients can pass
+# ?page_size=N (up to API_MAX_PAGE_SIZE) or ?paginate=false for the legacy full list.
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+# --------------------------
+# IDENTITY CACHE (base.identity_cache)
+# --------------------------
+# Token key -> (auth user, app user, role profile, communityid).
+# SHARED_CACHE names a CACHES alias (e.g. 'default' backed by Redis/Memcached)
+# to share resolved identities - and revocations - across worker processes; without
+# it a revoked token is still accepted by other processes for up to TTL seconds.
+IDENTITY_CACHE = {
+    'MAX_ENTRIES': 2048,
+    'TTL': 5,
+    'SHARED_CACHE': None,
+    'SHARED_TTL': 300,
+}
+
+# --------------------------
+# BACKGROUND TASKS (base.tasks)
+# --------------------------
+# Run the worker with: python manage.py run_tasks
+# RUN_EAGERLY=True runs tasks in-process right after commit (development without a worker).
+BACKGROUND_TASKS = {
+    'RUN_EAGERLY': False,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 30,      # seconds, multiplied by the attempt number
+    'LOCK_TIMEOUT': 300,    # seconds before a Running task is considered abandoned
+    'POLL_INTERVAL': 1.0,   # seconds the worker sleeps when the queue is empty
+}
+NOTIFICATION_FANOUT_BATCH_SIZE = 1000
+
+# --------------------------
+# AUTHORITY DASHBOARD CACHE (base.dashboard_cache)
+# --------------------------
+# Stale-while-revalidate: entries older than FRESH_FOR seconds (or computed before a
+# newer issue/review write) are still served while one refresh task (run_tasks) runs.
+# With a per-process LocMemCache (no REDIS_URL) the request recomputes them instead.
+DASHBOARD_CACHE = {
+    'CACHE': 'default',
+    'FRESH_FOR': 30,
+    'KEEP_FOR': 3600,
+    'REFRESH_LOCK_TTL': 60,
+    'COLD_WAIT': 5,         # seconds a request waits for another one computing a missing entry
+}
+
+# --------------------------
+# REQUEST INSTRUMENTATION (base.instrumentation)
+# --------------------------
+# Per-endpoint SQL count/time, duplicate SQL and response bytes - plus serializer time
+# with SERIALIZER_TIMING, which patches DRF's Serializer.data - exposed at /api/_metrics/
+# (Prometheus). Without METRICS_TOKEN the endpoint is only served when DEBUG is on. Views declare `query_budget = N`; the tests enforce them.
+INSTRUMENTATION = {
+    'ENABLED': True,
+    'DEBUG_HEADER': True,
+    'ENFORCE_BUDGETS': False,
+    'SERIALIZER_TIMING': False,
+    'METRICS_TOKEN': None,
+}
+
+# --------------------------
+# SAMPLED PROFILING (base.profiling)
+# --------------------------
+# Profiles SAMPLE_RATE of requests and appends collapsed stacks to
+# OUTPUT_DIR/<url name>.collapsed (flamegraph.pl / speedscope). Replay the recorded
+# requests offline with `python manage.py profile_replay`.
+PROFILING = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.01,
+    'MODE': 'sampling',  # or 'tracing' (exact stacks, much slower)
+    'INTERVAL': 0.002,
+    'OUTPUT_DIR': BASE_DIR / 'profiles',
+}
+
+# --------------------------
+# BKASH PAYMENT GATEWAY (base.bkash)
+# --------------------------
+# The grant token is cached in CACHE until TOKEN_MARGIN seconds before it expires and is
+# then renewed with the refresh token; use a shared backend (Redis/Memcached) so all
+# workers share one token. Calls time out after (CONNECT_TIMEOUT, READ_TIMEOUT) seconds
+# and fail fast for BREAKER_RESET seconds after BREAKER_THRESHOLD consecutive failures.
+# For offline development point BASE_URL at `python manage.py run_bkash_mock`.
+# Payments are executed by run_tasks after the callback; payments still Pending
+# RECONCILE_AFTER seconds later are re-checked every RECONCILE_INTERVAL seconds and
+# marked Failed after ABANDON_AFTER.
+BKASH = {
+    'BASE_URL': os.environ.get('BKASH_BASE_URL', 'https://checkout.sandbox.bka.sh/v1.2.0-beta/checkout'),
+    'USERNAME': os.environ.get('BKASH_USERNAME', 'YOUR_SANDBOX_USERNAME'),
+    'PASSWORD': os.environ.get('BKASH_PASSWORD', 'YOUR_SANDBOX_PASSWORD'),
+    'APP_KEY': os.environ.get('BKASH_APP_KEY', 'YOUR_SANDBOX_APP_KEY'),
+    'APP_SECRET': os.environ.get('BKASH_APP_SECRET', 'YOUR_SANDBOX_APP_SECRET'),
+    'CALLBACK_URL': 'http://127.0.0.1:8000/api/payment/bkash/callback/',
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 10,
+    'RETRIES': 2,
+    'POOL_SIZE': 10,
+    'CACHE': 'default',
+    'TOKEN_MARGIN': 60,
+    'BREAKER_THRESHOLD': 5,
+    'BREAKER_RESET': 30,
+    'RETURN_URL': 'http://localhost:5173/book-service',
+    'RECONCILE_AFTER': 120,
+    'RECONCILE_INTERVAL': 300,
+    'ABANDON_AFTER': 24 * 3600,
+}
+
+# --------------------------
+# SOS FAST LANE (base.sos)
+# --------------------------
+# resident/sos/ commits the SOS row and returns; the photo (staged in STAGING_DIR, which
+# the run_tasks worker must be able to read), rollup and notification follow on the
+# worker at TASK_PRIORITY. `python manage.py run_benchmarks --sos` checks the POST ->
+# authority feed p95 against LATENCY_SLO_MS.
+SOS = {
+    'TASK_PRIORITY': 100,
+    'STAGING_DIR': None,  # default: MEDIA_ROOT / 'sos_staging'
+    'LATENCY_SLO_MS': 250,
+    'PENDING_LIMIT': 50,
+}
+
+# --------------------------
+# UPLOADS & IMAGE DERIVATIVES (base.uploads)
+# --------------------------
+# Multipart files are streamed to temporary files on disk (never held in memory) and
+# skipped past MAX_FILE_SIZE / MAX_REQUEST_SIZE. Thumbnails and web-sized copies of SOS,
+# issue and event photos are written by the run_tasks worker; they need Pillow.
+FILE_UPLOAD_HANDLERS = ['base.uploads.StreamingUploadHandler']
+
+# Media is stored once per distinct content under blobs/ab/cd/<sha256>.<ext>; URLs are
+# immutable. `python manage.py gc_media` removes blobs no row references any more
+# (older than GC_GRACE seconds).
+STORAGES = {
+    'default': {'BACKEND': 'base.media_store.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+MEDIA_STORE = {
+    'PREFIX': 'blobs',
+    'GC_GRACE': 24 * 3600,
+}
+UPLOADS = {
+    'MAX_FILE_SIZE': 10 * 1024 * 1024,
+    'MAX_REQUEST_SIZE': 25 * 1024 * 1024,
+    'VARIANTS': {'thumb': (320, 70), 'web': (1600, 80)},
+    'FORMAT': 'WEBP',
+}
+
+# --------------------------
+# MEDIA SERVING (base.media_serving, /api/media/<name>)
+# --------------------------
+# API responses carry signed, expiring /api/media/ URLs; the view checks them (or the
+# caller's permissions) and hands the transfer to the web server. Do not expose
+# MEDIA_ROOT directly in production. With BACKEND 'nginx':
+#     location /protected-media/ { internal; alias /path/to/media/; }
+# 'sendfile' emits X-Sendfile (Apache mod_xsendfile); 'django' streams the file itself
+# with Range/ETag support (development, or no front server).
+MEDIA_SERVING = {
+    'BACKEND': os.environ.get('MEDIA_SERVING_BACKEND', 'django'),
+    'INTERNAL_PREFIX': '/protected-media/',
+    'URL_TTL': 6 * 3600,
+}
+
+# --------------------------
+# SEARCH (base.search, /api/search/)
+# --------------------------
+# 'auto' uses MySQL FULLTEXT indexes on MySQL and the python inverted index (SearchPosting)
+# elsewhere. After bulk imports run `python manage.py rebuild_search_index`.
+SEARCH = {
+    'BACKEND': 'auto',
+    'MAX_RESULTS': 500,
+}
+
+# --------------------------
+# REAL-TIME PUSH (base.realtime, served at /api/stream/ under ASGI)
+# --------------------------
+# 'inprocess': signal handlers publish straight to connected clients (single process).
+# 'polling':  one poller per process also reads new rows from the database, needed
+#             when run_tasks or several ASGI workers run in separate processes.
+REALTIME = {
+    'BACKEND': 'polling',
+    'POLL_INTERVAL': 2.0,
+    'HEARTBEAT': 15.0,
+}
+
 # In AEQUORA/settings.py (Add to the bottom)
 
 # Media files (User uploads)
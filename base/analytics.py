@@ -0,0 +1,202 @@
+import datetime
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Issuereport, Review, Emergencyreport, Booking, Dailyrollup
+from .rollups import compute_rollups, ISSUE_METRICS, REVIEW_METRICS
+
+# ==========================================
+#  ANALYTICS AGGREGATES
+# ==========================================
+# Dashboards read the pre-aggregated Dailyrollup rows (base/rollups.py) for every day
+# before today and compute today live with the same grouped queries, so the cost of a
+# summary no longer grows with the issue history.
+#
+#   ?from=YYYY-MM-DD   -> issues/reviews created on or after this day
+#   ?to=YYYY-MM-DD     -> ... up to and including this day
+#   ?community=<id>    -> restrict to one community
+
+TOP_AREAS = 5
+
+
+class AnalyticsFilters:
+    def __init__(self, date_from=None, date_to=None, community_id=None, community_ids=None):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.community_id = community_id
+        # A set of communities (e.g. an authority's jurisdiction); takes precedence.
+        self.community_ids = community_ids
+
+    @classmethod
+    def from_params(cls, params):
+        """Raises ValueError with a client-facing message on malformed parameters."""
+        def day(name):
+            raw = params.get(name)
+            if not raw:
+                return None
+            try:
+                value = parse_date(raw)
+            except ValueError:
+                value = None
+            if value is None:
+                raise ValueError(f"'{name}' must be a date (YYYY-MM-DD)")
+            return value
+
+        community = params.get('community')
+        if community:
+            try:
+                community = int(community)
+            except ValueError:
+                raise ValueError("'community' must be an integer id")
+        return cls(day('from'), day('to'), community or None)
+
+    def date_range(self, field):
+        """Whole days, compared as datetimes (not __date) so the column's index applies."""
+        q = Q()
+        if self.date_from:
+            q &= Q(**{f'{field}__gte': _start_of(self.date_from)})
+        if self.date_to:
+            q &= Q(**{f'{field}__lt': _start_of(self.date_to + datetime.timedelta(days=1))})
+        return q
+
+    def community_filter(self, field='communityid'):
+        if self.community_ids is not None:
+            return Q(**{f'{field}__in': list(self.community_ids)})
+        if self.community_id:
+            return Q(**{field: self.community_id})
+        return Q()
+
+    def _scoped(self, queryset, field, community_field='communityid'):
+        return queryset.filter(self.date_range(field), self.community_filter(community_field))
+
+    def issues(self):
+        return self._scoped(Issuereport.objects.all(), 'createdat')
+
+    def reviews(self):
+        return self._scoped(Review.objects.all(), 'createdat', 'bookingid__communityid')
+
+    def sos_reports(self):
+        return self._scoped(Emergencyreport.objects.all(), 'timestamp')
+
+    def bookings(self):
+        return self._scoped(Booking.objects.all(), 'createdat')
+
+    def rollup_rows(self):
+        queryset = Dailyrollup.objects.all()
+        if self.date_from:
+            queryset = queryset.filter(day__gte=self.date_from)
+        if self.date_to:
+            queryset = queryset.filter(day__lte=self.date_to)
+        return queryset.filter(self.community_filter())
+
+    def stored_rows(self):
+        """Rollup rows for completed days; today is always computed live."""
+        return self.rollup_rows().filter(day__lt=timezone.localdate())
+
+    def today(self):
+        """The same filters narrowed to today, or None when the range ends before today."""
+        today = timezone.localdate()
+        if self.date_to and self.date_to < today:
+            return None
+        return AnalyticsFilters(max(self.date_from or today, today), self.date_to, self.community_id, self.community_ids)
+
+
+def _start_of(day):
+    start = datetime.datetime.combine(day, datetime.time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def metric_totals(filters, selection):
+    """
+    selection: {dimension: metrics}. Returns {(metric, dimension, dimension value): total}
+    over the stored rollups plus today's rows computed live.
+    """
+    match = Q()
+    for dimension, metrics in selection.items():
+        match |= Q(dimension=dimension, metric__in=metrics)
+    totals = Counter()
+    rows = filters.stored_rows().filter(match).values('metric', 'dimension', 'dimensionvalue').annotate(total=Sum('value')).order_by()
+    for row in rows:
+        totals[(row['metric'], row['dimension'], row['dimensionvalue'])] += row['total']
+
+    today = filters.today()
+    if today:
+        metrics = {metric for metrics in selection.values() for metric in metrics}
+        issue_dimensions = [dimension for dimension, metrics in selection.items() if set(metrics) & set(ISSUE_METRICS)]
+        for (_, _, metric, dimension, value), amount in compute_rollups(today, metrics, issue_dimensions).items():
+            if metric in selection.get(dimension, ()):
+                totals[(metric, dimension, value)] += amount
+    return totals
+
+
+def _total(totals, metric, dimension=''):
+    return sum((amount for (m, d, _), amount in totals.items() if m == metric and d == dimension), Decimal(0))
+
+
+def top_areas(filters, limit=TOP_AREAS):
+    """
+    Exact top areas without loading every distinct address: the stored top `limit`, plus
+    the stored totals of the areas that also appear today.
+    """
+    today_counts = Counter()
+    today = filters.today()
+    if today:
+        for (_, _, metric, _, value), amount in compute_rollups(today, ISSUE_METRICS, ['area']).items():
+            if metric == 'issues_created':
+                today_counts[value] += amount
+    area_totals = (
+        filters.stored_rows().filter(metric='issues_created', dimension='area')
+        .values('dimensionvalue').annotate(total=Sum('value'))
+    )
+    totals = Counter()
+    for row in area_totals.order_by('-total')[:limit]:
+        totals[row['dimensionvalue']] = row['total']
+    if today_counts:
+        for row in area_totals.filter(dimensionvalue__in=list(today_counts)).order_by():
+            totals[row['dimensionvalue']] = row['total']
+    totals.update(today_counts)
+    return [{'name': name or 'Unknown', 'count': int(count)} for name, count in totals.most_common(limit)]
+
+
+def format_resolution_time(avg):
+    if not avg:
+        return "0h 0m"
+    return f"{int(avg.total_seconds() // 3600)} hrs"
+
+
+def _average_rating(totals):
+    count = _total(totals, 'rating_count')
+    return float(_total(totals, 'rating_sum') / count) if count else 0
+
+
+def analytics_summary(filters):
+    totals = metric_totals(filters, {'type': ISSUE_METRICS, '': REVIEW_METRICS})
+    avg_resolution = None
+    resolution_count = _total(totals, 'resolution_count', 'type')
+    if resolution_count:
+        avg_resolution = datetime.timedelta(seconds=float(_total(totals, 'resolution_seconds', 'type') / resolution_count))
+    categories = Counter({value: amount for (metric, _, value), amount in totals.items() if metric == 'issues_created'})
+    return {
+        "totalReports": int(_total(totals, 'issues_created', 'type')),
+        "avgResolutionTime": format_resolution_time(avg_resolution),
+        "satisfactionScore": round(_average_rating(totals), 1),
+        "categoryStats": [{'name': name or 'Uncategorized', 'count': int(count)} for name, count in categories.most_common() if count],
+        "topAreas": top_areas(filters),
+    }
+
+
+def dashboard_stats(filters):
+    totals = metric_totals(filters, {'type': ('issues_created', 'issues_resolved'), '': REVIEW_METRICS})
+    total = int(_total(totals, 'issues_created', 'type'))
+    resolved = int(_total(totals, 'issues_resolved', 'type'))
+    return {
+        "total_issues": total,
+        "resolved_issues": resolved,
+        "pending_issues": total - resolved,
+        "satisfaction_rate": round((_average_rating(totals) / 5) * 100, 1),
+    }
@@ -6,4 +6,5 @@ class BaseConfig(AppConfig):
 
     def ready(self):
         # I have uncommented this so the signals.py file actually runs now
-        import base.signals
\ No newline at end of file
+        import base.signals
+        import base.payments  # registers the bKash payment task handlers
\ No newline at end of file
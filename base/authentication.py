@@ -0,0 +1,101 @@
+from rest_framework.authentication import TokenAuthentication, SessionAuthentication
+from rest_framework.authtoken.models import Token
+
+from .identity_cache import identity_cache
+from .models import UserEmail, Resident, Serviceprovider, Authority
+
+# ==========================================
+#  REQUEST-SCOPED IDENTITY
+# ==========================================
+# Every view used to start with UserEmail -> User -> Resident/Serviceprovider/Authority.
+# The authentication classes below resolve the whole chain once, with a single joined
+# query, and attach the results to the request:
+#   request.app_user   -> base.models.User (or None)
+#   request.resident   -> Resident profile (or None)
+#   request.provider   -> Serviceprovider profile (or None)
+#   request.authority  -> Authority profile (or None)
+#   request.community  -> Community of the app user (or None)
+# Token requests are additionally served from base.identity_cache, so a warm token
+# costs no queries at all.
+
+PROFILE_FIELDS = ('resident', 'serviceprovider', 'authority')
+
+
+def resolve_identity(auth_user):
+    """
+    Returns (app_user, profile) for a Django auth user using one query.
+    profile is the Resident / Serviceprovider / Authority row, whichever exists.
+    """
+    email = getattr(auth_user, 'email', None)
+    if not email:
+        return None, None
+    user_email = (
+        UserEmail.objects
+        .select_related(
+            'userid', 'userid__communityid',
+            *[f'userid__{field}' for field in PROFILE_FIELDS]
+        )
+        .filter(email=email)
+        .first()
+    )
+    if not user_email:
+        return None, None
+    app_user = user_email.userid
+    for field in PROFILE_FIELDS:
+        profile = getattr(app_user, field, None)
+        if profile is not None:
+            return app_user, profile
+    return app_user, None
+
+
+def attach_identity(request, app_user, profile):
+    request.app_user = app_user
+    request.resident = profile if isinstance(profile, Resident) else None
+    request.provider = profile if isinstance(profile, Serviceprovider) else None
+    request.authority = profile if isinstance(profile, Authority) else None
+    request.community = app_user.communityid if app_user else None
+
+
+class IdentityMixin:
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            app_user, profile = resolve_identity(result[0])
+            attach_identity(request, app_user, profile)
+        return result
+
+
+class AppTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        identity = identity_cache.get(key)
+        if identity is None:
+            user, token = super().authenticate_credentials(key)
+            app_user, profile = resolve_identity(user)
+            identity = (user, app_user, profile, app_user.communityid_id if app_user else None)
+            identity_cache.set(key, identity)
+        else:
+            user = identity[0]
+            token = Token(key=key, user=user)
+        self.identity = identity
+        return user, token
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            _, app_user, profile, _ = self.identity
+            attach_identity(request, app_user, profile)
+        return result
+
+
+class AppSessionAuthentication(IdentityMixin, SessionAuthentication):
+    pass
+
+
+def authenticate_token_key(key):
+    """
+    Identity tuple for a raw token key, for endpoints outside DRF (e.g. the SSE stream,
+    where EventSource cannot send an Authorization header). Raises AuthenticationFailed.
+    """
+    authenticator = AppTokenAuthentication()
+    authenticator.authenticate_credentials(key)
+    return authenticator.identity
@@ -0,0 +1,282 @@
+import datetime
+import gc
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import django
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections, transaction
+from django.db.models import Count
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .identity_cache import identity_cache
+from .instrumentation import RequestRecord
+from .models import UserEmail, Issuereport, Authoritycommunity, Booking
+from .sos import get_config as sos_config
+
+AuthUser = get_user_model()
+
+# ==========================================
+#  ENDPOINT BENCHMARKS
+# ==========================================
+# Calls every GET endpoint in base/urls.py through the Django test client, in-process,
+# against whatever database the settings point at (SQLite locally, MySQL on a server),
+# and reports per endpoint:
+#
+#   - latency: first (cold identity cache) request, then p50/p95/mean/max over the rest
+#   - SQL: queries per request and repeated identical statements (N+1 indicator)
+#   - memory: peak Python allocation of one extra request, under tracemalloc
+#
+# Requests run as the busiest resident, authority and service provider, so list
+# endpoints see realistic row counts. Results are plain JSON; `compare` diffs two runs.
+# Load data first with `manage.py generate_synthetic_data`.
+#
+# measure_sos_latency times the SOS fast lane end to end: POST resident/sos/ (with a
+# photo) until the new SOS is listed in authority/sos/, against SOS['LATENCY_SLO_MS'].
+
+# Not request/response endpoints, they call external services, or (bkash_query) they
+# poll one particular payment.
+SKIPPED = {'event_stream', 'metrics', 'bkash_callback', 'bkash_query'}
+
+# Query strings for endpoints that need one; every synthetic issue title has "problem near".
+ROUTE_QUERIES = {'search': 'q=problem near'}
+
+ROLE_PREFIXES = [
+    ('provider/', 'provider'),
+    ('resident/', 'resident'),
+    ('auth/', 'resident'),
+]
+
+
+def role_for(route):
+    for prefix, role in ROLE_PREFIXES:
+        if route.startswith(prefix):
+            return role
+    return 'authority'
+
+
+def discover_targets(only=None):
+    """(url name, route) for every parameterless, synchronous GET view."""
+    from . import urls
+    targets = []
+    for pattern in urls.urlpatterns:
+        view = getattr(pattern.callback, 'view_class', None)
+        route = str(pattern.pattern)
+        name = pattern.name
+        if view is None or not hasattr(view, 'get') or '<' in route or name in SKIPPED:
+            continue
+        if getattr(view, 'view_is_async', False):
+            continue
+        if only and name not in only:
+            continue
+        targets.append((name, f'{route}?{ROUTE_QUERIES[name]}' if name in ROUTE_QUERIES else route))
+    return targets
+
+
+def _auth_user_for(app_user_id):
+    emails = UserEmail.objects.filter(userid=app_user_id).values_list('email', flat=True)
+    return AuthUser.objects.filter(email__in=list(emails)).first()
+
+
+def benchmark_tokens():
+    """A token per role, for the user of that role with the most data."""
+    candidates = {
+        'resident': (Issuereport, 'residentid__userid'),
+        'authority': (Authoritycommunity, 'authorityid__userid'),
+        'provider': (Booking, 'providerid__userid'),
+    }
+    tokens = {}
+    for role, (model, field) in candidates.items():
+        busiest = model.objects.values(field).annotate(n=Count('pk')).order_by('-n')[:20]
+        for row in busiest:
+            auth_user = _auth_user_for(row[field])
+            if auth_user is not None:
+                tokens[role] = Token.objects.get_or_create(user=auth_user)[0].key
+                break
+    return tokens
+
+
+def percentile(values, pct):
+    """Linear interpolation between closest ranks (values need not be sorted)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _timed_get(client, path):
+    record = RequestRecord()
+    start = time.perf_counter()
+    with connections['default'].execute_wrapper(record):
+        response = client.get(path)
+    return response, (time.perf_counter() - start) * 1000, record
+
+
+def run_endpoint(client, path, iterations):
+    identity_cache.clear()
+    response, first_ms, first = _timed_get(client, path)
+
+    latencies, queries, duplicates = [], [], []
+    for _ in range(iterations):
+        response, elapsed, record = _timed_get(client, path)
+        latencies.append(elapsed)
+        queries.append(record.queries)
+        duplicates.append(record.duplicates)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        client.get(path)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'path': path,
+        'status': response.status_code,
+        'response_bytes': 0 if response.streaming else len(response.content),
+        'iterations': iterations,
+        'first_ms': round(first_ms, 3),
+        'first_queries': first.queries,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'max_ms': round(max(latencies), 3),
+        'queries': max(queries),
+        'duplicate_queries': max(duplicates),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def measure_sos_latency(iterations=20, tokens=None, photo_bytes=200 * 1024):
+    """
+    POST resident/sos/ -> first authority/sos/ response listing the new SOS. Runs in a
+    transaction that is rolled back, with photos staged in a temporary directory, so
+    nothing is left behind (the follow-up tasks are never run).
+    """
+    tokens = tokens or benchmark_tokens()
+    if 'resident' not in tokens or 'authority' not in tokens:
+        raise ValueError("SOS latency needs a resident and an authority with a login")
+    config = sos_config()
+    resident, authority = APIClient(), APIClient()
+    resident.credentials(HTTP_AUTHORIZATION=f"Token {tokens['resident']}")
+    authority.credentials(HTTP_AUTHORIZATION=f"Token {tokens['authority']}")
+    acknowledged, visible, queries = [], [], []
+    with tempfile.TemporaryDirectory() as staging, \
+            override_settings(ALLOWED_HOSTS=['*'], SOS={**config, 'STAGING_DIR': staging}), \
+            transaction.atomic():
+        for i in range(iterations):
+            photo = SimpleUploadedFile(f'sos-{i}.jpg', os.urandom(photo_bytes), content_type='image/jpeg')
+            record = RequestRecord()
+            start = time.perf_counter()
+            with connections['default'].execute_wrapper(record):
+                response = resident.post('/api/resident/sos/', {'emergencytype': 'Fire', 'location': 'Benchmark', 'photo': photo}, format='multipart')
+            acked = time.perf_counter()
+            if response.status_code != 201:
+                raise RuntimeError(f"resident/sos/ answered {response.status_code}: {response.content[:200]!r}")
+            feed = authority.get('/api/authority/sos/')
+            if response.data['sosid'] not in {row['sosid'] for row in feed.data.get('pending', [])}:
+                raise RuntimeError(f"SOS {response.data['sosid']} is not in the authority feed")
+            visible.append((time.perf_counter() - start) * 1000)
+            acknowledged.append((acked - start) * 1000)
+            queries.append(record.queries)
+        transaction.set_rollback(True)
+
+    p95 = percentile(visible, 95)
+    return {
+        'iterations': iterations,
+        'post_p50_ms': round(percentile(acknowledged, 50), 3),
+        'post_p95_ms': round(percentile(acknowledged, 95), 3),
+        'post_queries': max(queries),
+        'visible_p50_ms': round(percentile(visible, 50), 3),
+        'visible_p95_ms': round(p95, 3),
+        'visible_max_ms': round(max(visible), 3),
+        'slo_ms': config['LATENCY_SLO_MS'],
+        'slo_met': p95 <= config['LATENCY_SLO_MS'],
+    }
+
+
+def row_counts():
+    models = [model for model in apps.get_app_config('base').get_models() if model._meta.managed]
+    return {model._meta.label: model.objects.count() for model in models}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmarks(iterations=20, only=None, log=None, sos=False):
+    log = log or (lambda message: None)
+    if iterations < 1:
+        raise ValueError("iterations must be at least 1")
+    tokens = benchmark_tokens()
+    results, skipped = {}, {}
+    # The test client's host is "testserver".
+    with override_settings(ALLOWED_HOSTS=['*']):
+        for name, route in discover_targets(only):
+            role = role_for(route)
+            if role not in tokens:
+                skipped[name] = f"no {role} with a login in this database"
+                continue
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {tokens[role]}')
+            results[name] = dict(run_endpoint(client, f'/api/{route}', iterations), role=role)
+            log(f"{name:<26} p50 {results[name]['p50_ms']:>8.2f} ms  p95 {results[name]['p95_ms']:>8.2f} ms  "
+                f"{results[name]['queries']:>3} queries  {results[name]['peak_memory_kb']:>8.1f} KB")
+
+    sos_latency = None
+    if sos:
+        sos_latency = measure_sos_latency(iterations, tokens)
+        log(f"{'sos_latency':<26} post p95 {sos_latency['post_p95_ms']:>8.2f} ms  visible p95 {sos_latency['visible_p95_ms']:>8.2f} ms  "
+            f"(SLO {sos_latency['slo_ms']} ms: {'met' if sos_latency['slo_met'] else 'MISSED'})")
+
+    return {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'database': connections['default'].vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'iterations': iterations,
+            'rows': row_counts(),
+        },
+        'endpoints': results,
+        'skipped': skipped,
+        'sos_latency': sos_latency,
+    }
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Regressions of `current` against `baseline` (two run_benchmarks results): p95 slower
+    by more than `threshold` (a fraction), more queries per request, or a missed SOS SLO.
+    """
+    regressions = []
+    sos_now, sos_before = current.get('sos_latency'), baseline.get('sos_latency')
+    if sos_now and not sos_now['slo_met']:
+        regressions.append(f"sos_latency: visible p95 {sos_now['visible_p95_ms']:.2f} ms over the {sos_now['slo_ms']} ms SLO")
+    if sos_now and sos_before and sos_now['visible_p95_ms'] > sos_before['visible_p95_ms'] * (1 + threshold):
+        regressions.append(f"sos_latency: visible p95 {sos_before['visible_p95_ms']:.2f} -> {sos_now['visible_p95_ms']:.2f} ms")
+    for name, now in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before is None:
+            continue
+        if before['p95_ms'] and now['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.2f} -> {now['p95_ms']:.2f} ms")
+        if now['queries'] > before['queries']:
+            regressions.append(f"{name}: queries {before['queries']} -> {now['queries']}")
+    return regressions
@@ -0,0 +1,245 @@
+import logging
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+#  BKASH CHECKOUT CLIENT
+# ==========================================
+# One client per process (get_client()) with:
+#   - a pooled keep-alive requests.Session; connect/read timeouts on every call
+#   - bounded retries: connection failures always (nothing reached bKash), 502/503/504
+#     and read timeouts only for GET (query), because create/execute are not idempotent
+#   - a circuit breaker: after BREAKER_THRESHOLD consecutive failures calls fail fast
+#     with BkashUnavailable for BREAKER_RESET seconds, then one trial call is let through
+#   - the grant token cached in a Django cache alias (shared by every worker when that
+#     alias is Redis/Memcached) until shortly before it expires, then renewed with the
+#     refresh token; one worker renews while the others keep using the old token
+#
+# So a payment call is one gateway round-trip instead of grant + call.
+# base/bkash_mock.py is a local stand-in for the gateway (tests, offline development).
+
+DEFAULTS = {
+    'BASE_URL': 'https://checkout.sandbox.bka.sh/v1.2.0-beta/checkout',
+    'USERNAME': '',
+    'PASSWORD': '',
+    'APP_KEY': '',
+    'APP_SECRET': '',
+    'CALLBACK_URL': 'http://127.0.0.1:8000/api/payment/bkash/callback/',
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 10,
+    'RETRIES': 2,
+    'BACKOFF': 0.3,
+    'POOL_SIZE': 10,
+    'CACHE': 'default',
+    # Renew the grant token this many seconds before bKash says it expires.
+    'TOKEN_MARGIN': 60,
+    # bKash refresh tokens outlive the id_token by weeks; keep them this long.
+    'REFRESH_TOKEN_TTL': 7 * 24 * 3600,
+    'BREAKER_THRESHOLD': 5,
+    'BREAKER_RESET': 30,
+    # Where the callback sends the browser back to (?payment=processing|failed).
+    'RETURN_URL': 'http://localhost:5173/book-service',
+    # Payment execution and reconciliation (base/payments.py).
+    'RECONCILE_AFTER': 120,
+    'RECONCILE_INTERVAL': 300,
+    'ABANDON_AFTER': 24 * 3600,
+}
+
+TOKEN_KEY = 'bkash:token'
+TOKEN_LOCK_KEY = 'bkash:token:lock'
+TOKEN_LOCK_TTL = 15
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'BKASH', {}))
+    return config
+
+
+class BkashError(Exception):
+    """bKash answered, but not with success (bad credentials, invalid payment id, ...)."""
+    def __init__(self, message, status_code=None, data=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.data = data or {}
+
+
+class BkashUnavailable(BkashError):
+    """bKash could not be reached, timed out, failed with 5xx, or the breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, threshold, reset_after):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_after or self._trial_running:
+                raise BkashUnavailable("bKash circuit breaker is open")
+            self._trial_running = True  # half-open: this call decides
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.threshold:
+                if self._opened_at is None:
+                    logger.warning("bKash circuit breaker opened after %s failures", self._failures)
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+
+class BkashClient:
+    def __init__(self, config):
+        self.config = config
+        self.base_url = config['BASE_URL'].rstrip('/')
+        self.timeout = (config['CONNECT_TIMEOUT'], config['READ_TIMEOUT'])
+        self.cache = caches[config['CACHE']]
+        self.breaker = CircuitBreaker(config['BREAKER_THRESHOLD'], config['BREAKER_RESET'])
+        self.session = requests.Session()
+        retry = Retry(
+            total=config['RETRIES'], connect=config['RETRIES'], read=config['RETRIES'], status=config['RETRIES'],
+            status_forcelist=(502, 503, 504), allowed_methods=frozenset(['GET']),
+            backoff_factor=config['BACKOFF'], raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config['POOL_SIZE'], max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Accept': 'application/json', 'Content-Type': 'application/json'})
+
+    # --- transport ---
+
+    def _send(self, method, path, headers=None, json=None):
+        self.breaker.before_call()
+        try:
+            response = self.session.request(method, f"{self.base_url}/{path}", headers=headers, json=json, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            raise BkashUnavailable(f"bKash request failed: {e}") from e
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            raise BkashUnavailable(f"bKash returned HTTP {response.status_code}", response.status_code)
+        self.breaker.record_success()
+        try:
+            data = response.json()
+        except ValueError:
+            raise BkashError(f"bKash returned a non-JSON response (HTTP {response.status_code})", response.status_code)
+        if response.status_code != 200:
+            raise BkashError(data.get('statusMessage') or data.get('errorMessage') or f"HTTP {response.status_code}", response.status_code, data)
+        return data
+
+    # --- grant token ---
+
+    def _store_token(self, data):
+        entry = {
+            'id_token': data['id_token'],
+            'refresh_token': data.get('refresh_token'),
+            'expires_at': time.time() + int(data.get('expires_in') or 3600),
+        }
+        self.cache.set(TOKEN_KEY, entry, self.config['REFRESH_TOKEN_TTL'])
+        return entry
+
+    def _fetch_token(self, refresh_token=None):
+        credentials = {'username': self.config['USERNAME'], 'password': self.config['PASSWORD']}
+        body = {'app_key': self.config['APP_KEY'], 'app_secret': self.config['APP_SECRET']}
+        if refresh_token:
+            try:
+                data = self._send('POST', 'token/refresh', headers=credentials, json={**body, 'refresh_token': refresh_token})
+                if data.get('id_token'):
+                    return self._store_token(data)
+            except BkashUnavailable:
+                raise
+            except BkashError:
+                logger.info("bKash token refresh rejected; requesting a new grant")
+        data = self._send('POST', 'token/grant', headers=credentials, json=body)
+        if not data.get('id_token'):
+            raise BkashError(data.get('statusMessage') or data.get('msg') or "bKash token grant failed", data=data)
+        return self._store_token(data)
+
+    def get_token(self, force=False):
+        entry = self.cache.get(TOKEN_KEY)
+        if not force and entry and entry['expires_at'] - self.config['TOKEN_MARGIN'] > time.time():
+            return entry['id_token']
+        locked = self.cache.add(TOKEN_LOCK_KEY, 1, TOKEN_LOCK_TTL)
+        if not locked and not force and entry and entry['expires_at'] > time.time():
+            # Another worker is renewing; the current token is still good for TOKEN_MARGIN seconds.
+            return entry['id_token']
+        try:
+            # A rejected token (force) is renewed with a full grant, not its refresh token.
+            refresh_token = entry.get('refresh_token') if entry and not force else None
+            return self._fetch_token(refresh_token)['id_token']
+        finally:
+            if locked:
+                self.cache.delete(TOKEN_LOCK_KEY)
+
+    def invalidate_token(self):
+        self.cache.delete(TOKEN_KEY)
+
+    def _call(self, method, path, json=None):
+        headers = {'Authorization': self.get_token(), 'X-APP-Key': self.config['APP_KEY']}
+        try:
+            return self._send(method, path, headers=headers, json=json)
+        except BkashError as e:
+            if e.status_code != 401:
+                raise
+        # Token revoked or expired early: one retry with a fresh grant.
+        headers['Authorization'] = self.get_token(force=True)
+        return self._send(method, path, headers=headers, json=json)
+
+    # --- checkout API ---
+
+    def create_payment(self, amount, invoice_number, payer_reference, callback_url=None):
+        return self._call('POST', 'payment/create', json={
+            'mode': '0011',
+            'payerReference': payer_reference,
+            'callbackURL': callback_url or self.config['CALLBACK_URL'],
+            'amount': str(amount),
+            'currency': 'BDT',
+            'intent': 'sale',
+            'merchantInvoiceNumber': invoice_number,
+        })
+
+    def execute_payment(self, payment_id):
+        return self._call('POST', f"payment/execute/{quote(str(payment_id), safe='')}")
+
+    def query_payment(self, payment_id):
+        return self._call('GET', f"payment/query/{quote(str(payment_id), safe='')}")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide client; rebuilt when the BKASH settings change (tests)."""
+    global _client
+    config = get_config()
+    with _client_lock:
+        if _client is None or _client.config != config:
+            _client = BkashClient(config)
+        return _client
@@ -0,0 +1,188 @@
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================================
+#  LOCAL BKASH MOCK SERVER
+# ==========================================
+# A stand-in for the bKash checkout API (token/grant, token/refresh, payment/create,
+# payment/execute/<id>, payment/query/<id>) for tests and offline development:
+#
+#   server = MockBkashServer().start()
+#   settings.BKASH = {'BASE_URL': server.base_url, ...}
+#   ... server.calls['token/grant'] ...
+#   server.stop()
+#
+# Faults can be injected per endpoint: `server.fail('payment/create', status=503, times=2)`
+# or `server.delay('payment/query', 0.5)`. `manage.py run_bkash_mock` serves it standalone.
+
+ROUTES = [
+    ('POST', re.compile(r'^token/grant$'), 'token/grant'),
+    ('POST', re.compile(r'^token/refresh$'), 'token/refresh'),
+    ('POST', re.compile(r'^payment/create$'), 'payment/create'),
+    ('POST', re.compile(r'^payment/execute/(?P<payment_id>[^/]+)$'), 'payment/execute'),
+    ('GET', re.compile(r'^payment/query/(?P<payment_id>[^/]+)$'), 'payment/query'),
+]
+
+
+class MockBkashServer:
+    def __init__(self, host='127.0.0.1', port=0, token_lifetime=3600, prefix='/checkout'):
+        self.token_lifetime = token_lifetime
+        self.prefix = prefix.rstrip('/')
+        self.calls = Counter()
+        self.payments = {}
+        self.tokens = {}
+        self.refresh_tokens = set()
+        self._faults = {}
+        self._delays = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{self.prefix}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='bkash-mock', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # --- fault injection ---
+
+    def fail(self, endpoint, status=503, times=1):
+        """The next `times` calls to `endpoint` answer HTTP `status`."""
+        with self._lock:
+            self._faults[endpoint] = [status, times]
+
+    def delay(self, endpoint, seconds):
+        self._delays[endpoint] = seconds
+
+    def revoke_tokens(self):
+        """Simulates bKash expiring every issued id_token early (calls then get 401)."""
+        with self._lock:
+            self.tokens.clear()
+
+    def _take_fault(self, endpoint):
+        with self._lock:
+            fault = self._faults.get(endpoint)
+            if not fault:
+                return None
+            fault[1] -= 1
+            if fault[1] <= 0:
+                del self._faults[endpoint]
+            return fault[0]
+
+    # --- endpoints ---
+
+    def _issue_token(self):
+        id_token = uuid.uuid4().hex
+        refresh_token = uuid.uuid4().hex
+        self.tokens[id_token] = time.time() + self.token_lifetime
+        self.refresh_tokens.add(refresh_token)
+        return 200, {'id_token': id_token, 'token_type': 'Bearer', 'expires_in': self.token_lifetime, 'refresh_token': refresh_token}
+
+    def handle(self, method, path, headers, body):
+        for route_method, pattern, endpoint in ROUTES:
+            match = pattern.match(path)
+            if match and route_method == method:
+                break
+        else:
+            return 404, {'errorMessage': 'Not found'}
+        with self._lock:
+            self.calls[endpoint] += 1
+        if endpoint in self._delays:
+            time.sleep(self._delays[endpoint])
+        status = self._take_fault(endpoint)
+        if status is not None:
+            return status, {'errorMessage': 'Injected fault'}
+
+        with self._lock:
+            if endpoint == 'token/grant':
+                if not headers.get('username') or not body.get('app_key'):
+                    return 401, {'statusMessage': 'Invalid credentials'}
+                return self._issue_token()
+            if endpoint == 'token/refresh':
+                if body.get('refresh_token') not in self.refresh_tokens:
+                    return 401, {'statusMessage': 'Invalid refresh token'}
+                self.refresh_tokens.discard(body['refresh_token'])
+                return self._issue_token()
+
+            if self.tokens.get(headers.get('authorization'), 0) < time.time():
+                return 401, {'statusMessage': 'Unauthorized'}
+
+            if endpoint == 'payment/create':
+                payment_id = f"TR{uuid.uuid4().hex[:16].upper()}"
+                self.payments[payment_id] = {
+                    'paymentID': payment_id,
+                    'amount': body.get('amount'),
+                    'currency': body.get('currency', 'BDT'),
+                    'intent': body.get('intent', 'sale'),
+                    'merchantInvoiceNumber': body.get('merchantInvoiceNumber'),
+                    'transactionStatus': 'Initiated',
+                }
+                return 200, {**self.payments[payment_id], 'statusCode': '0000', 'bkashURL': f"{self.base_url}/pay/{payment_id}"}
+
+            payment = self.payments.get(match.group('payment_id'))
+            if payment is None:
+                return 200, {'statusCode': '2056', 'statusMessage': 'Invalid Payment ID'}
+            if endpoint == 'payment/execute':
+                if payment['transactionStatus'] == 'Completed':
+                    return 200, {'statusCode': '2062', 'statusMessage': 'The payment has already been completed'}
+                payment['transactionStatus'] = 'Completed'
+                payment['trxID'] = f"TRX{uuid.uuid4().hex[:10].upper()}"
+            return 200, {**payment, 'statusCode': '0000', 'statusMessage': 'Successful'}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real gateway
+
+            def _dispatch(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    body = {}
+                path = self.path.split('?', 1)[0]
+                if not path.startswith(server.prefix + '/'):
+                    status, data = 404, {'errorMessage': 'Not found'}
+                else:
+                    headers = {key.lower(): value for key, value in self.headers.items()}
+                    status, data = server.handle(self.command, path[len(server.prefix) + 1:], headers, body)
+                payload = json.dumps(data).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # the client timed out (delay())
+
+            do_GET = do_POST = _dispatch
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .analytics import AnalyticsFilters, dashboard_stats
+from .tasks import task, enqueue
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+#  VERSIONED DASHBOARD CACHE (STALE-WHILE-REVALIDATE)
+# ==========================================
+# The authority dashboard is polled by every open tab. Stats are cached per set of
+# communities together with the version of each community they were computed from:
+#
+#   - versions match and the entry is younger than FRESH_FOR -> served as is
+#   - otherwise the stale entry is still served immediately, and exactly one REFRESH_TASK
+#     is queued (guarded by cache.add() on a lock key, and by the task's dedupe key), so
+#     N tabs polling at once cause one recomputation, not N
+#   - no entry at all -> computed in the request holding the same lock; concurrent
+#     requests wait up to COLD_WAIT seconds for its result instead of computing too
+#
+# The stats themselves are named functions of the community ids in STATS, so the
+# worker (`manage.py run_tasks`) can recompute them. That only helps when CACHE is shared
+# with the worker (settings.CACHES, REDIS_URL): with a per-process LocMemCache the worker
+# would fill its own memory, so the request holding the lock recomputes the stale entry
+# itself instead, and concurrent requests keep getting the stale one.
+# Versions are bumped from the Issuereport/Review signals (base/signals.py) after commit.
+
+DEFAULTS = {
+    'CACHE': 'default',
+    'FRESH_FOR': 30,
+    'KEEP_FOR': 3600,
+    'REFRESH_LOCK_TTL': 60,
+    'COLD_WAIT': 5,
+    'COLD_WAIT_INTERVAL': 0.05,
+}
+
+REFRESH_TASK = 'dashboard.refresh'
+
+
+def _authority_stats(community_ids):
+    return dashboard_stats(AnalyticsFilters(community_ids=community_ids))
+
+
+STATS = {'authority': _authority_stats}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'DASHBOARD_CACHE', {}))
+    return config
+
+
+def _cache(config):
+    return caches[config['CACHE']]
+
+
+def _is_local(cache):
+    return isinstance(cache, LocMemCache)
+
+
+def _version_key(community_id):
+    return f'dashboard:version:{community_id}'
+
+
+def bump_versions(community_ids):
+    config = get_config()
+    _cache(config).set_many({_version_key(c): uuid.uuid4().hex for c in community_ids if c}, None)
+
+
+def current_versions(community_ids, config=None):
+    config = config or get_config()
+    stored = _cache(config).get_many([_version_key(c) for c in community_ids])
+    return [stored.get(_version_key(c), '0') for c in community_ids]
+
+
+def _key(name, community_ids):
+    return f'dashboard:{name}:' + ','.join(map(str, community_ids))
+
+
+def cached_stats(name, community_ids):
+    """STATS[name](community_ids) through the cache."""
+    config = get_config()
+    cache = _cache(config)
+    community_ids = sorted(community_ids)
+    key = _key(name, community_ids)
+    versions = current_versions(community_ids, config)
+    entry = cache.get(key)
+
+    if entry is None:
+        return _compute_cold(cache, config, key, versions, name, community_ids)
+
+    fresh = entry['versions'] == versions and time.time() - entry['computed_at'] < config['FRESH_FOR']
+    if not fresh and cache.add(key + ':refreshing', 1, config['REFRESH_LOCK_TTL']):
+        if _is_local(cache):
+            try:
+                return _store(cache, config, key, versions, STATS[name](community_ids))
+            finally:
+                cache.delete(key + ':refreshing')
+        _queue_refresh(config, key, versions, name, community_ids)
+    return entry['data']
+
+
+def _store(cache, config, key, versions, data):
+    cache.set(key, {'versions': versions, 'computed_at': time.time(), 'data': data}, config['KEEP_FOR'])
+    return data
+
+
+def _compute_cold(cache, config, key, versions, name, community_ids):
+    lock = key + ':refreshing'
+    deadline = time.monotonic() + config['COLD_WAIT']
+    while not cache.add(lock, 1, config['REFRESH_LOCK_TTL']):
+        # Another request (or the worker) is computing this entry.
+        if time.monotonic() >= deadline:
+            logger.warning("Gave up waiting for %s; computing it in this request", key)
+            return STATS[name](community_ids)
+        time.sleep(config['COLD_WAIT_INTERVAL'])
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['data']
+    try:
+        return _store(cache, config, key, versions, STATS[name](community_ids))
+    finally:
+        cache.delete(lock)
+
+
+def _queue_refresh(config, key, versions, name, community_ids):
+    # One task per entry, versions and FRESH_FOR window (dedupekey is at most 100 chars).
+    window = int(time.time() // config['FRESH_FOR'])
+    digest = hashlib.sha1(f"{key}:{','.join(versions)}:{window}".encode()).hexdigest()
+    try:
+        enqueue(REFRESH_TASK, {'name': name, 'community_ids': community_ids}, dedupe_key=f'dashboard:{digest}')
+    except Exception:
+        _cache(config).delete(key + ':refreshing')  # let the next request try again
+        raise
+
+
+@task(REFRESH_TASK)
+def refresh_stats(bg_task):
+    name, community_ids = bg_task.payload['name'], bg_task.payload['community_ids']
+    config = get_config()
+    cache = _cache(config)
+    key = _key(name, community_ids)
+    try:
+        # Versions read before computing: a write landing meanwhile leaves the entry stale.
+        versions = current_versions(community_ids, config)
+        _store(cache, config, key, versions, STATS[name](community_ids))
+    finally:
+        cache.delete(key + ':refreshing')
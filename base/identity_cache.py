@@ -0,0 +1,120 @@
+import hashlib
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+# ==========================================
+#  CROSS-REQUEST IDENTITY CACHE
+# ==========================================
+# Maps a DRF Token key to the resolved identity tuple
+#   (DjangoAuthUser, AppUser, role profile, communityid)
+# so authenticated requests skip the Token + UserEmail lookups entirely.
+#
+# Two tiers:
+#   1. In-process LRU with a short TTL (always on).
+#   2. Optional shared tier in a Django cache alias (IDENTITY_CACHE['SHARED_CACHE']),
+#      so every worker process benefits from one resolution.
+#
+# Entries are invalidated from the model signals in base/signals.py. The shared tier
+# and the local tier of the writing process are purged immediately, and GENERATION_KEY
+# in the shared tier is bumped: local entries remember the generation they were stored
+# under and are only served while it is unchanged, so a revoked token is refused by
+# every process on its next request. Without a shared tier there is nothing to check,
+# and other processes keep a revoked identity for at most TTL seconds.
+
+DEFAULTS = {
+    'MAX_ENTRIES': 2048,
+    'TTL': 5,
+    'SHARED_CACHE': None,
+    'SHARED_TTL': 300,
+}
+
+GENERATION_KEY = 'identity:generation'
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'IDENTITY_CACHE', {}))
+    return config
+
+
+class IdentityCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _shared_key(token_key):
+        # Never put raw tokens into a shared cache backend.
+        return 'identity:' + hashlib.sha256(token_key.encode()).hexdigest()
+
+    def _shared(self, config):
+        alias = config['SHARED_CACHE']
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def _generation(shared):
+        return shared.get(GENERATION_KEY, '0') if shared is not None else None
+
+    def get(self, token_key):
+        config = get_config()
+        shared = self._shared(config)
+        generation = self._generation(shared)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token_key)
+            if entry is not None:
+                expires, entry_generation, payload = entry
+                if expires > now and entry_generation == generation:
+                    self._entries.move_to_end(token_key)
+                    # Unpickle per hit so views can never mutate a shared instance.
+                    return pickle.loads(payload)
+                del self._entries[token_key]
+
+        if shared is None:
+            return None
+        payload = shared.get(self._shared_key(token_key))
+        if payload is None:
+            return None
+        self._store_local(token_key, payload, generation, config)
+        return pickle.loads(payload)
+
+    def set(self, token_key, identity):
+        config = get_config()
+        payload = pickle.dumps(identity, protocol=pickle.HIGHEST_PROTOCOL)
+        shared = self._shared(config)
+        self._store_local(token_key, payload, self._generation(shared), config)
+        if shared is not None:
+            shared.set(self._shared_key(token_key), payload, config['SHARED_TTL'])
+
+    def _store_local(self, token_key, payload, generation, config):
+        with self._lock:
+            self._entries[token_key] = (time.monotonic() + config['TTL'], generation, payload)
+            self._entries.move_to_end(token_key)
+            while len(self._entries) > config['MAX_ENTRIES']:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token_keys):
+        token_keys = list(token_keys)
+        if not token_keys:
+            return
+        with self._lock:
+            for key in token_keys:
+                self._entries.pop(key, None)
+        shared = self._shared(get_config())
+        if shared is not None:
+            shared.delete_many([self._shared_key(key) for key in token_keys])
+            # Drops the local entries of every other process on their next lookup.
+            shared.set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,285 @@
+import logging
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+#  PER-ENDPOINT SQL INSTRUMENTATION
+# ==========================================
+# QueryBudgetMiddleware records, for every request, keyed by the URL name from
+# base/urls.py:
+#   - SQL query count and DB time (a connection execute wrapper)
+#   - duplicate SQL: the same statement text run more than once, i.e. an N+1 pattern
+#   - serializer time (time spent building serializer.data; only with
+#     INSTRUMENTATION['SERIALIZER_TIMING'], which wraps DRF's Serializer.data)
+#   - response bytes and total request time
+#
+# Totals are exposed at /api/_metrics/ in Prometheus text format (per process). With
+# DEBUG and INSTRUMENTATION['DEBUG_HEADER'] each response also carries Server-Timing
+# and X-Query-Count headers.
+#
+# Views may declare `query_budget = N` (or per method: {'GET': N}). Requests over budget are logged and counted;
+# with INSTRUMENTATION['ENFORCE_BUDGETS'] (used by the tests) they raise instead.
+#
+# The connection's execute wrapper records into the request's RequestRecord through a
+# contextvar; under ASGI it is installed on the worker thread that runs sync views.
+
+DEFAULTS = {
+    'ENABLED': True,
+    'DEBUG_HEADER': True,
+    'ENFORCE_BUDGETS': False,
+    # Patches DRF's Serializer.data / ListSerializer.data process-wide to time them.
+    'SERIALIZER_TIMING': False,
+    # When set, /api/_metrics/ requires "Authorization: Bearer <token>" or ?token=.
+    'METRICS_TOKEN': None,
+}
+
+PREFIX = 'aequora'
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'INSTRUMENTATION', {}))
+    return config
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+# Savepoints only appear when a request runs inside an outer transaction (tests,
+# benchmarks); they are not counted, so budgets mean the same everywhere.
+TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class RequestRecord:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith(TRANSACTION_CONTROL):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.statements[sql] += 1
+
+
+_current = ContextVar('instrumentation_record', default=None)
+
+
+def _execute_in_context(execute, sql, params, many, context):
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    return record(execute, sql, params, many, context)
+
+
+def install_context_wrapper():
+    """Routes the calling thread's queries to the RequestRecord of the current context."""
+    wrappers = connections['default'].execute_wrappers
+    if _execute_in_context not in wrappers:
+        wrappers.append(_execute_in_context)
+
+
+# --- Serializer timing ---
+
+def _timed_data(original):
+    def data(self):
+        record = _current.get()
+        if record is None:
+            return original(self)
+        # Only the outermost serializer is timed; nested ones run inside it.
+        record.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            record.serializer_depth -= 1
+            if record.serializer_depth == 0:
+                record.serializer_time += time.perf_counter() - start
+    return data
+
+
+def install_serializer_timing():
+    from rest_framework import serializers
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        prop = cls.__dict__['data']
+        if not getattr(prop.fget, '_instrumented', False):
+            timed = _timed_data(prop.fget)
+            timed._instrumented = True
+            setattr(cls, 'data', property(timed))
+
+
+# --- Registry ---
+
+class MetricsRegistry:
+    FIELDS = ('requests', 'queries', 'db_seconds', 'duplicate_queries', 'serializer_seconds',
+              'response_bytes', 'request_seconds', 'budget_exceeded')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, **values):
+        with self._lock:
+            stats = self._views.setdefault(view, dict.fromkeys(self.FIELDS, 0) | {'max_queries': 0})
+            for field, value in values.items():
+                stats[field] += value
+            stats['max_queries'] = max(stats['max_queries'], values.get('queries', 0))
+
+    def snapshot(self):
+        with self._lock:
+            return {view: dict(stats) for view, stats in self._views.items()}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
+
+METRICS = [
+    # (field, prometheus name, type, help)
+    ('requests', 'requests_total', 'counter', 'Requests handled.'),
+    ('queries', 'sql_queries_total', 'counter', 'SQL queries executed.'),
+    ('db_seconds', 'sql_duration_seconds_total', 'counter', 'Time spent in SQL.'),
+    ('duplicate_queries', 'sql_duplicate_queries_total', 'counter', 'Repeated identical SQL statements within one request (N+1 indicator).'),
+    ('max_queries', 'sql_queries_max', 'gauge', 'Most SQL queries seen in a single request.'),
+    ('serializer_seconds', 'serializer_duration_seconds_total', 'counter', 'Time spent building serializer data.'),
+    ('response_bytes', 'response_bytes_total', 'counter', 'Response body bytes (non-streaming responses).'),
+    ('request_seconds', 'request_duration_seconds_total', 'counter', 'Wall time spent handling requests.'),
+    ('budget_exceeded', 'query_budget_exceeded_total', 'counter', 'Requests that ran more queries than the view\'s query_budget.'),
+]
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus():
+    snapshot = registry.snapshot()
+    lines = []
+    for field, name, kind, help_text in METRICS:
+        lines.append(f'# HELP {PREFIX}_{name} {help_text}')
+        lines.append(f'# TYPE {PREFIX}_{name} {kind}')
+        for view in sorted(snapshot):
+            value = snapshot[view][field]
+            value = f'{value:.6f}' if isinstance(value, float) else str(value)
+            lines.append(f'{PREFIX}_{name}{{view="{_label(view)}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+# --- Middleware ---
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.url_name or match.view_name or 'unnamed'
+
+
+def _query_budget(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view = getattr(match.func, 'view_class', match.func)
+    budget = getattr(view, 'query_budget', None)
+    if isinstance(budget, dict):  # per method, e.g. {'GET': 3}
+        return budget.get(request.method)
+    return budget
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        if get_config()['SERIALIZER_TIMING']:
+            install_serializer_timing()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self._acall(request)
+        config = get_config()
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        record = RequestRecord()
+        token = _current.set(record)
+        start = time.perf_counter()
+        try:
+            install_context_wrapper()
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - start
+        self._finish(request, response, record, elapsed, config)
+        return response
+
+    async def _acall(self, request):
+        config = get_config()
+        if not config['ENABLED']:
+            return await self.get_response(request)
+
+        record = RequestRecord()
+        token = _current.set(record)
+        start = time.perf_counter()
+        try:
+            # Sync views run on the same thread-sensitive thread as this call; the
+            # context (and so the record) is carried over to it.
+            await sync_to_async(install_context_wrapper)()
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - start
+        # Streaming bodies (the SSE stream) are produced after this returns and are not counted.
+        self._finish(request, response, record, elapsed, config)
+        return response
+
+    def _finish(self, request, response, record, elapsed, config):
+        view = _view_name(request)
+        size = 0 if response.streaming else len(response.content)
+        budget = _query_budget(request)
+        over_budget = budget is not None and record.queries > budget
+        registry.record(
+            view, requests=1, queries=record.queries, db_seconds=record.db_time,
+            duplicate_queries=record.duplicates, serializer_seconds=record.serializer_time,
+            response_bytes=size, request_seconds=elapsed, budget_exceeded=int(over_budget),
+        )
+
+        if settings.DEBUG and config['DEBUG_HEADER']:
+            response['X-Query-Count'] = str(record.queries)
+            response['Server-Timing'] = (
+                f'db;dur={record.db_time * 1000:.2f};desc="{record.queries} queries, {record.duplicates} duplicate", '
+                f'ser;dur={record.serializer_time * 1000:.2f}, total;dur={elapsed * 1000:.2f}'
+            )
+
+        if over_budget:
+            repeated = [sql for sql, count in record.statements.most_common(3) if count > 1]
+            message = f"{view}: {record.queries} queries (budget {budget}); most repeated: {repeated}"
+            if config['ENFORCE_BUDGETS']:
+                raise QueryBudgetExceeded(message)
+            logger.warning("Query budget exceeded - %s", message)
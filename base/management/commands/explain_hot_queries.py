@@ -0,0 +1,84 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+
+from base.models import (
+    UserEmail, Issuereport, Booking, Notification, Event, Emergencyreport
+)
+
+
+class Command(BaseCommand):
+    help = "Runs EXPLAIN on the hot-path queries and checks that the expected index is used."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strict', action='store_true', help="Exit with an error if any expected index is not used.")
+        parser.add_argument('--verbose-plans', action='store_true', help="Print the full plan for every query.")
+
+    def sample(self, model, field):
+        # Use real values when the table has data so the planner sees realistic selectivity.
+        return model.objects.aggregate(value=Min(field))['value'] or 0
+
+    def hot_queries(self):
+        email = UserEmail.objects.values_list('email', flat=True).first() or 'nobody@example.com'
+        community = self.sample(Issuereport, 'communityid')
+        resident = self.sample(Booking, 'residentid')
+        provider = self.sample(Booking, 'providerid')
+        service = self.sample(Booking, 'serviceid')
+        user = self.sample(Notification, 'userid')
+        event_community = self.sample(Event, 'communityid')
+        one_minute_ago = timezone.now() - datetime.timedelta(minutes=1)
+        return [
+            ("UserEmail by email", 'user_email_email_idx',
+             UserEmail.objects.filter(email=email)),
+            # iexact compiles to LIKE on MySQL (index range scan) but to a
+            # case-folding LIKE ... ESCAPE on SQLite/Postgres, which cannot use it.
+            ("UserEmail by email (login, iexact)", 'user_email_email_idx',
+             UserEmail.objects.filter(email__iexact=email), 'mysql'),
+            ("Issues for community, newest first", 'issue_comm_created_idx',
+             Issuereport.objects.filter(communityid=community).order_by('-createdat')[:50]),
+            ("Issues by status", 'issue_status_idx',
+             Issuereport.objects.filter(status='Resolved')),
+            ("Resident bookings, newest first", 'booking_res_created_idx',
+             Booking.objects.filter(residentid=resident).order_by('-createdat')[:5]),
+            ("Provider bookings by booking date", 'booking_prov_date_idx',
+             Booking.objects.filter(providerid=provider).order_by('-bookingdate')),
+            ("Booking duplicate check", 'booking_dup_check_idx',
+             Booking.objects.filter(residentid=resident, serviceid=service, status='Pending', createdat__gte=one_minute_ago)),
+            ("Latest notifications for user", 'notif_user_created_idx',
+             Notification.objects.filter(userid=user).order_by('-createdat')[:10]),
+            ("Unread notifications for user, newest first", 'notif_user_read_created_idx',
+             Notification.objects.filter(userid=user, isread=False).order_by('-createdat')),
+            ("Events for community by date", 'event_comm_date_idx',
+             Event.objects.filter(communityid=event_community).order_by('-date')),
+            ("Events by status", 'event_status_idx',
+             Event.objects.filter(status='Pending').order_by('-date')),
+            ("Latest SOS reports", 'sos_timestamp_idx',
+             Emergencyreport.objects.order_by('-timestamp')[:50]),
+        ]
+
+    def handle(self, *args, **options):
+        missing = []
+        for label, index_name, queryset, *vendor in self.hot_queries():
+            if vendor and connection.vendor not in vendor:
+                self.stdout.write(f"SKIPS  {index_name:<28} {label} (only checked on {', '.join(vendor)})")
+                continue
+            plan = queryset.explain()
+            used = index_name.lower() in plan.lower()
+            marker = self.style.SUCCESS("USES  ") if used else self.style.WARNING("MISSES")
+            self.stdout.write(f"{marker} {index_name:<28} {label}")
+            if options['verbose_plans'] or not used:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+            if not used:
+                missing.append(label)
+
+        if missing:
+            # Tiny tables are often scanned even when an index exists; load realistic data first.
+            self.stdout.write(self.style.WARNING(f"{len(missing)} quer{'y' if len(missing) == 1 else 'ies'} did not use the expected index."))
+            if options['strict']:
+                raise CommandError("Expected indexes not used: " + ", ".join(missing))
+        else:
+            self.stdout.write(self.style.SUCCESS("All hot-path queries use their indexes."))
@@ -0,0 +1,24 @@
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+
+from base.media_store import ContentAddressedStorage, collect_garbage, rebuild_references
+
+
+class Command(BaseCommand):
+    help = "Deletes content-addressed media blobs that no row references (base/media_store.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, help="Only delete files older than this many seconds (default MEDIA_STORE['GC_GRACE']).")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be deleted.")
+        parser.add_argument('--rebuild', action='store_true', help="Re-derive the reference table from the media columns first.")
+
+    def handle(self, *args, **options):
+        storage = storages['default']
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError("STORAGES['default'] is not base.media_store.ContentAddressedStorage.")
+        if options['rebuild']:
+            count = rebuild_references()
+            self.stdout.write(f"Rebuilt {count} media reference(s).")
+        deleted, freed = collect_garbage(storage, grace=options['grace'], dry_run=options['dry_run'])
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} unreferenced file(s), {freed} bytes."))
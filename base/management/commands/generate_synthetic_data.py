@@ -0,0 +1,48 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from base.models import Community
+from base.synthetic import SCALES, PASSWORD, SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = "Fills the database with synthetic communities, users, issues, bookings, notifications, ... for load tests."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small', help="Preset row counts (default: small).")
+        for name in SCALES['small']:
+            parser.add_argument(f'--{name}', type=int, help=f"Override the preset number of {name}.")
+        parser.add_argument('--days', type=int, default=365, help="Spread timestamps over this many past days.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--append', action='store_true', help="Allow generating into a database that already has communities.")
+        parser.add_argument('--skip-derived', action='store_true',
+                            help="Do not rebuild daily rollups, provider ratings and notification counters afterwards.")
+
+    def handle(self, *args, **options):
+        if Community.objects.exists() and not options['append']:
+            raise CommandError("The database already has data; pass --append to add synthetic rows anyway.")
+        counts = dict(SCALES[options['scale']])
+        for name in counts:
+            if options[name] is not None:
+                counts[name] = options[name]
+        if min(counts['communities'], counts['users']) < 1:
+            raise CommandError("At least one community and one user are required.")
+
+        started = time.perf_counter()
+        generator = SyntheticDataGenerator(
+            counts, seed=options['seed'], days=options['days'], batch_size=options['batch_size'],
+            log=lambda message: self.stdout.write(f"  {message}"),
+        )
+        written = generator.run()
+        self.stdout.write(f"Wrote {sum(written.values())} row(s) in {time.perf_counter() - started:.1f}s.")
+
+        if not options['skip_derived']:
+            # bulk_create skipped the signals that normally keep these in step.
+            for command in ('rebuild_daily_rollups', 'rebuild_provider_ratings', 'reconcile_notification_counters',
+                            'rebuild_search_index'):
+                self.stdout.write(f"Running {command} ...")
+                call_command(command, batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Synthetic data ready. Every generated user's password is '{PASSWORD}'."))
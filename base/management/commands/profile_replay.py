@@ -0,0 +1,89 @@
+import json
+import time
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from base.profiling import MODES, get_config, output_dir, profile_call, write_profile, category_times
+
+AuthUser = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Replays requests recorded by ProfilingMiddleware (requests.jsonl) and writes collapsed-stack profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', nargs='?', help="Request log to replay. Default: <PROFILING OUTPUT_DIR>/requests.jsonl.")
+        parser.add_argument('--url-name', nargs='+', help="Only replay requests for these URL names.")
+        parser.add_argument('--limit', type=int, help="Replay at most this many recorded requests.")
+        parser.add_argument('--repeat', type=int, default=1, help="Replay each request this many times.")
+        parser.add_argument('--mode', choices=MODES, default='tracing')
+        parser.add_argument('--output', help="Directory for the profiles. Default: <OUTPUT_DIR>/replay.")
+        parser.add_argument('--as-user', help="Send every request as this auth user (id or email) instead of the recorded one.")
+        parser.add_argument('--commit', action='store_true', help="Keep the writes of replayed requests (default: rolled back).")
+
+    def handle(self, *args, **options):
+        config = get_config()
+        log_path = options['log'] or output_dir(config) / 'requests.jsonl'
+        out = options['output'] or output_dir(config) / 'replay'
+        entries = self.load(log_path, options['url_name'], options['limit'])
+        if not entries:
+            raise CommandError(f"No matching requests in {log_path}.")
+        override_user = self.resolve_user(options['as_user']) if options['as_user'] else None
+
+        timings = defaultdict(list)
+        categories = defaultdict(Counter)
+        tokens = {}
+        # Replayed requests must not be profiled a second time by the middleware.
+        with override_settings(ALLOWED_HOSTS=['*'], PROFILING={**config, 'ENABLED': False}):
+            for entry in entries:
+                user = override_user or entry.get('user')
+                client = APIClient()
+                if user is not None:
+                    if user not in tokens:
+                        tokens[user] = Token.objects.get_or_create(user_id=user)[0].key
+                    client.credentials(HTTP_AUTHORIZATION=f"Token {tokens[user]}")
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    response, stacks = profile_call(lambda: self.replay(client, entry, options['commit']), options['mode'], config)
+                    timings[entry['url_name']].append((time.perf_counter() - start) * 1000)
+                    write_profile(out, entry['url_name'], stacks)
+                    categories[entry['url_name']].update(category_times(stacks))
+                    if response.status_code >= 400:
+                        self.stderr.write(f"{entry['method']} {entry['path']} -> {response.status_code}")
+
+        for url_name, values in sorted(timings.items()):
+            per_request = {category: round(total / len(values), 3) for category, total in categories[url_name].items()}
+            self.stdout.write(f"{url_name or 'unresolved'}: {len(values)} request(s), mean {sum(values) / len(values):.2f} ms, "
+                              f"per request (ms): {json.dumps(per_request, sort_keys=True)}")
+        self.stdout.write(self.style.SUCCESS(f"Collapsed stacks written to {out}/ (view with flamegraph.pl or speedscope)."))
+
+    def load(self, path, url_names, limit):
+        try:
+            with open(path) as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+        if url_names:
+            entries = [entry for entry in entries if entry.get('url_name') in url_names]
+        return entries[:limit] if limit else entries
+
+    def resolve_user(self, value):
+        lookup = {'pk': value} if value.isdigit() else {'email': value}
+        user_id = AuthUser.objects.filter(**lookup).values_list('pk', flat=True).first()
+        if user_id is None:
+            raise CommandError(f"No auth user {value!r}.")
+        return user_id
+
+    def replay(self, client, entry, commit):
+        path = entry['path'] + (f"?{entry['query']}" if entry.get('query') else '')
+        with transaction.atomic():
+            response = client.generic(entry['method'], path, data=entry.get('body', ''), content_type=entry.get('content_type') or 'application/octet-stream')
+            if not commit:
+                transaction.set_rollback(True)
+        return response
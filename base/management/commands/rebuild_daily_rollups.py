@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from base.analytics import AnalyticsFilters
+from base.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Backfills or repairs the Dailyrollup table from Issuereport, Emergencyreport, Booking and Review."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help="First day to rebuild (YYYY-MM-DD). Default: the beginning.")
+        parser.add_argument('--to', dest='date_to', help="Last day to rebuild (YYYY-MM-DD). Default: today.")
+        parser.add_argument('--community', help="Only rebuild this community id.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            filters = AnalyticsFilters.from_params({
+                'from': options['date_from'], 'to': options['date_to'], 'community': options['community'],
+            })
+        except ValueError as e:
+            raise CommandError(str(e))
+        written = rebuild_rollups(filters, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt daily rollups: {written} row(s) written."))
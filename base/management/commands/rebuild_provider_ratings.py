@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from rest_framework.authtoken.models import Token
+
+from base.identity_cache import identity_cache
+from base.models import Review, Serviceprovider, UserEmail
+
+
+class Command(BaseCommand):
+    help = "Recomputes every provider's rating_sum/rating_count from the Review table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report providers whose aggregate has drifted.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        actual = {
+            row['providerid']: (row['total'], row['n'])
+            for row in Review.objects.filter(rating__isnull=False)
+            .values('providerid').annotate(total=Sum('rating'), n=Count('rating')).order_by()
+        }
+
+        drifted = []
+        for provider in Serviceprovider.objects.only('providerid', 'rating_sum', 'rating_count').iterator(chunk_size=options['batch_size']):
+            rating_sum, rating_count = actual.get(provider.pk, (0, 0))
+            if (provider.rating_sum, provider.rating_count) != (rating_sum, rating_count):
+                provider.rating_sum, provider.rating_count = rating_sum, rating_count
+                drifted.append(provider)
+
+        self.stdout.write(f"{len(drifted)} provider rating aggregate(s) drifted.")
+        if options['dry_run']:
+            return
+        Serviceprovider.objects.bulk_update(drifted, ['rating_sum', 'rating_count'], batch_size=options['batch_size'])
+        # bulk_update sends no signals; identity-cached profiles carry the rating too.
+        emails = UserEmail.objects.filter(userid__serviceprovider__in=drifted).values('email')
+        identity_cache.invalidate(Token.objects.filter(user__email__in=emails).values_list('key', flat=True))
+        self.stdout.write(self.style.SUCCESS("Provider ratings rebuilt."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from base.search import DOCUMENTS, get_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the python search backend's inverted index (base/search.py); MySQL FULLTEXT indexes need nothing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', dest='types', action='append', choices=sorted(DOCUMENTS),
+                            help="Only rebuild this document type (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if backend.name != 'python':
+            self.stdout.write(f"The {backend.name} search backend keeps its own index; nothing to do.")
+            return
+        for name in options['types'] or DOCUMENTS:
+            count = backend.rebuild(DOCUMENTS[name], batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Indexed {count} {name}(s)."))
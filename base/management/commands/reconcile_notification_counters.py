@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from base.models import Notification, Notificationcounter
+
+
+class Command(BaseCommand):
+    help = "Recomputes every user's unread notification counter from the Notification table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report counters that have drifted.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        actual = dict(
+            Notification.objects.filter(isread=False)
+            .values('userid').annotate(unread=Count('notificationid'))
+            .values_list('userid', 'unread')
+        )
+        stored = dict(Notificationcounter.objects.values_list('userid', 'unread'))
+
+        drifted = []
+        for user_id, unread in stored.items():
+            expected = actual.get(user_id, 0)
+            if unread != expected:
+                drifted.append(Notificationcounter(userid_id=user_id, unread=expected))
+        missing = [
+            Notificationcounter(userid_id=user_id, unread=unread)
+            for user_id, unread in actual.items() if user_id not in stored
+        ]
+
+        self.stdout.write(f"{len(drifted)} drifted counter(s), {len(missing)} missing counter(s).")
+        if options['dry_run']:
+            return
+        Notificationcounter.objects.bulk_update(drifted, ['unread'], batch_size=options['batch_size'])
+        Notificationcounter.objects.bulk_create(missing, batch_size=options['batch_size'], ignore_conflicts=True)
+        self.stdout.write(self.style.SUCCESS("Notification counters reconciled."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from base.payments import reconcile_pending_payments
+
+
+class Command(BaseCommand):
+    help = "Queues a bKash status query for every payment still Pending (run_tasks also does this every RECONCILE_INTERVAL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500, help="Payments queued per run, oldest first.")
+
+    def handle(self, *args, **options):
+        queued = reconcile_pending_payments(options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Queued verification of {queued} pending payment(s)."))
@@ -0,0 +1,58 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from base.benchmark import run_benchmarks, compare
+
+
+class Command(BaseCommand):
+    help = "Benchmarks every GET endpoint in base/urls.py (latency percentiles, query counts, peak memory) and writes JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help="Timed requests per endpoint (after one cold request).")
+        parser.add_argument('--only', nargs='+', metavar='URL_NAME', help="Only these endpoints, by URL name.")
+        parser.add_argument('--output', help="Write the JSON results to this file instead of stdout.")
+        parser.add_argument('--compare', metavar='BASELINE_JSON', help="Report regressions against an earlier run.")
+        parser.add_argument('--threshold', type=float, default=0.2, help="Allowed p95 slowdown as a fraction (default 0.2).")
+        parser.add_argument('--fail-on-regression', action='store_true', help="Exit with an error when --compare finds regressions or --sos misses its SLO.")
+        parser.add_argument('--sos', action='store_true', help="Also time POST resident/sos/ -> authority feed against SOS['LATENCY_SLO_MS'].")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {e}")
+
+        log = self.stderr.write if not options['output'] else self.stdout.write
+        try:
+            results = run_benchmarks(options['iterations'], options['only'], log=log, sos=options['sos'])
+        except (ValueError, RuntimeError) as e:
+            raise CommandError(str(e))
+        for name, reason in results['skipped'].items():
+            log(f"skipped {name}: {reason}")
+
+        payload = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(payload + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Results for {len(results['endpoints'])} endpoint(s) written to {options['output']}."))
+        else:
+            self.stdout.write(payload)
+
+        sos_latency = results['sos_latency']
+        if sos_latency and not sos_latency['slo_met'] and baseline is None:
+            log(f"SOS SLO MISSED: visible p95 {sos_latency['visible_p95_ms']:.2f} ms > {sos_latency['slo_ms']} ms")
+            if options['fail_on_regression']:
+                raise CommandError("SOS latency SLO missed.")
+
+        if baseline is not None:
+            regressions = compare(baseline, results, options['threshold'])
+            for line in regressions:
+                log(f"REGRESSION {line}")
+            if not regressions:
+                log("No regressions against the baseline.")
+            elif options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}.")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from base.bkash_mock import MockBkashServer
+
+
+class Command(BaseCommand):
+    help = "Serves the local bKash mock (base/bkash_mock.py) for offline development of the payment flow."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--token-lifetime', type=int, default=3600, help="Seconds until issued id_tokens expire.")
+
+    def handle(self, *args, **options):
+        server = MockBkashServer(options['host'], options['port'], token_lifetime=options['token_lifetime']).start()
+        self.stdout.write(f"bKash mock listening; set BKASH_BASE_URL={server.base_url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+        self.stdout.write("bKash mock stopped.")
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from base import bkash
+from base.notifications import materialize_outbox
+from base.payments import reconcile_pending_payments
+from base.tasks import run_pending, get_config
+import base.signals  # noqa: F401  (registers every task handler)
+
+
+class Command(BaseCommand):
+    help = "Runs the DB-backed background task worker (base/tasks.py) and drains the notification outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the currently due tasks and exit.")
+        parser.add_argument('--batch-size', type=int, default=50, help="Tasks claimed per round.")
+        parser.add_argument('--kind', action='append', dest='kinds', help="Only run tasks of this kind (repeatable).")
+        parser.add_argument('--outbox-batch-size', type=int, default=500, help="Outbox rows materialized per round.")
+        parser.add_argument('--no-outbox', action='store_true', help="Do not drain the notification outbox.")
+        parser.add_argument('--no-reconcile', action='store_true', help="Do not queue verification of pending bKash payments.")
+
+    def handle(self, *args, **options):
+        poll_interval = get_config()['POLL_INTERVAL']
+        reconcile_interval = bkash.get_config()['RECONCILE_INTERVAL']
+        next_reconcile = 0
+        self.stdout.write("Background task worker started.")
+        try:
+            while True:
+                if not options['no_reconcile'] and time.monotonic() >= next_reconcile:
+                    queued = reconcile_pending_payments()
+                    if queued:
+                        self.stdout.write(f"Queued verification of {queued} pending payment(s).")
+                    next_reconcile = time.monotonic() + reconcile_interval
+                processed = run_pending(options['batch_size'], kinds=options['kinds'])
+                if processed:
+                    self.stdout.write(f"Processed {processed} task(s).")
+                if not options['no_outbox']:
+                    materialized = materialize_outbox(options['outbox_batch_size'])
+                    if materialized:
+                        self.stdout.write(f"Materialized {materialized} outbox row(s).")
+                    processed += materialized
+                if processed:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write("Background task worker stopped.")
@@ -0,0 +1,198 @@
+import math
+import mimetypes
+import os
+import re
+import time
+from functools import lru_cache
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date, parse_etags
+
+from .media_store import storage_name, blob_digest
+from .models import Authority, Resident, Serviceprovider, Emergencyreport, Mediareference
+
+# ==========================================
+#  MEDIA SERVING
+# ==========================================
+# /api/media/<name> serves files from MEDIA_ROOT after a permission check; the front
+# web server should not expose MEDIA_ROOT itself. Serializers emit signed URLs
+# (served_url): listing a row is the permission check, and the signature - bound to
+# the file and an expiry - lets <img> tags and links fetch the file with no credentials
+# and no database query. Unsigned requests need a token (header or ?token=) or a
+# session, and may_access() decides:
+#
+#   authorities     -> everything
+#   issue/event     -> any signed-in user
+#   SOS evidence    -> the resident who sent the SOS
+#   certifications  -> the provider they belong to
+#
+# BACKEND chooses who ships the bytes:
+#   'nginx'    -> X-Accel-Redirect to INTERNAL_PREFIX (an `internal` location aliasing
+#                 MEDIA_ROOT); the worker is released straight away
+#   'sendfile' -> X-Sendfile with the absolute path (Apache mod_xsendfile, lighttpd)
+#   'django'   -> FileResponse with ETag / If-None-Match and single-range Range support;
+#                 under a WSGI server with wsgi.file_wrapper (gunicorn) the body goes out
+#                 with sendfile(2)
+#
+# Blob names are content hashes (base/media_store.py), so their responses are marked
+# immutable; expiries are rounded up to URL_TTL so a URL stays the same, and cacheable,
+# for at least URL_TTL seconds.
+
+DEFAULTS = {
+    'BACKEND': 'django',
+    'INTERNAL_PREFIX': '/protected-media/',
+    'URL_TTL': 6 * 3600,
+    'BLOB_MAX_AGE': 365 * 24 * 3600,
+    'MAX_AGE': 3600,
+}
+
+SIGNER_SALT = 'base.media'
+PUBLIC_MODELS = {'base.Issuereport', 'base.Event'}
+RANGE = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'MEDIA_SERVING', {}))
+    return config
+
+
+# --- Signed URLs ---
+
+def _signature(name, expires):
+    return signing.Signer(salt=SIGNER_SALT).signature(f'{name}:{expires}')
+
+
+@lru_cache(maxsize=1)
+def _view_prefix():
+    return reverse('media', args=['x'])[:-1]
+
+
+def served_url(url, config=None):
+    """The signed /api/media/ URL for a stored media URL; other URLs are returned as is."""
+    name = storage_name(url)
+    if name is None:
+        return url
+    ttl = (config or get_config())['URL_TTL']
+    expires = math.ceil((time.time() + ttl) / ttl) * ttl
+    return f"{_view_prefix()}{quote(name)}?{urlencode({'exp': expires, 'sig': _signature(name, expires)})}"
+
+
+def valid_signature(name, expires, signature):
+    if not (expires and signature and expires.isdigit()) or int(expires) < time.time():
+        return False
+    return constant_time_compare(signature, _signature(name, expires))
+
+
+# --- Permissions ---
+
+def may_access(name, profile):
+    if isinstance(profile, Authority):
+        return True
+    digest = blob_digest(name)
+    if digest is None or profile is None:
+        return False  # files from before the content-addressed store: signed URLs only
+    references = set(Mediareference.objects.filter(sha256=digest).values_list('model', 'objectid'))
+    if any(model in PUBLIC_MODELS for model, _ in references):
+        return True
+    if isinstance(profile, Serviceprovider) and ('base.Serviceprovider', profile.pk) in references:
+        return True
+    sos_ids = [objectid for model, objectid in references if model == 'base.Emergencyreport']
+    return (isinstance(profile, Resident) and bool(sos_ids)
+            and Emergencyreport.objects.filter(pk__in=sos_ids, residentid=profile).exists())
+
+
+# --- Responses ---
+
+class FileRange:
+    """`length` bytes of an open file from its current position (for FileResponse)."""
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single byte range; None to send everything; False if unsatisfiable."""
+    match = RANGE.fullmatch(header.replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None  # malformed or multiple ranges: a full response is allowed
+    first, last = match.groups()
+    if first == '':
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _etag(name, stat):
+    digest = blob_digest(name)
+    return f'"{digest}"' if digest else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def serve(request, name, path, config=None):
+    config = config or get_config()
+    stat = os.stat(path)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if blob_digest(name):
+        cache_control = f"private, max-age={config['BLOB_MAX_AGE']}, immutable"
+    else:
+        cache_control = f"private, max-age={config['MAX_AGE']}"
+
+    if config['BACKEND'] in ('nginx', 'sendfile'):
+        response = HttpResponse(content_type=content_type)
+        if config['BACKEND'] == 'nginx':
+            response['X-Accel-Redirect'] = config['INTERNAL_PREFIX'] + quote(name)
+        else:
+            response['X-Sendfile'] = path
+        response['Cache-Control'] = cache_control
+        return response
+
+    etag = _etag(name, stat)
+    headers = {'ETag': etag, 'Cache-Control': cache_control, 'Last-Modified': http_date(stat.st_mtime)}
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    byte_range = None
+    if 'Range' in request.headers and request.headers.get('If-Range', etag) == etag:
+        byte_range = parse_range(request.headers['Range'], stat.st_size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    file = open(path, 'rb')
+    if byte_range:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(FileRange(file, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(file, content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    for header, value in headers.items():
+        response[header] = value
+    return response
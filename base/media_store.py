@@ -0,0 +1,187 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+from urllib.parse import unquote
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+from .models import Mediareference
+
+# ==========================================
+#  CONTENT-ADDRESSED MEDIA STORE
+# ==========================================
+# ContentAddressedStorage (STORAGES['default']) ignores the client file name: every file
+# is stored once, by the SHA-256 of its bytes, at
+#
+#   <PREFIX>/ab/cd/abcd...ef.<ext>
+#
+# so the same photo uploaded by twenty residents is one file, and a URL never changes
+# content (it can be cached as immutable). The hash is computed while the bytes are
+# copied in; StreamingUploadHandler already hashes uploads as they arrive, so those are
+# just renamed into place.
+#
+# Mediareference maps the media columns in REFERENCE_FIELDS to their blobs. Code that
+# stores a file on a row calls sync_references(instance) afterwards; rows deleted through
+# the ORM drop theirs (base/signals.py). `manage.py gc_media` deletes blobs nothing
+# references once they are older than GC_GRACE (an upload is stored before the row that
+# will reference it), and `gc_media --rebuild` re-derives the table from the columns.
+
+DEFAULTS = {
+    'PREFIX': 'blobs',
+    'GC_GRACE': 24 * 3600,
+}
+
+REFERENCE_FIELDS = {
+    'base.Emergencyreport': ('photo', 'photothumb', 'photoweb'),
+    'base.Issuereport': ('photo', 'photothumb', 'photoweb'),
+    'base.Event': ('photo', 'photothumb', 'photoweb'),
+    'base.Serviceprovider': ('certificationfile',),
+}
+
+INCOMING = '.incoming'
+EXTENSION = re.compile(r'\.[a-z0-9]{1,10}')
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'MEDIA_STORE', {}))
+    return config
+
+
+def storage_name(url):
+    """'/media/sos_evidence/th_3.jpg' -> 'sos_evidence/th_3.jpg'; None for foreign URLs."""
+    if url and url.startswith(settings.MEDIA_URL):
+        return unquote(url[len(settings.MEDIA_URL):])
+    return None
+
+
+def blob_name(digest, extension=''):
+    prefix = get_config()['PREFIX']
+    return f"{prefix}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def blob_digest(name):
+    """The SHA-256 of a blob storage name, or None for any other name."""
+    match = re.fullmatch(rf"{re.escape(get_config()['PREFIX'])}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/([0-9a-f]{{64}})(\.[a-z0-9]+)?", name or '')
+    return match.group(1) if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Names are chosen by _save(); identical content is meant to share one.
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        if not EXTENSION.fullmatch(extension):
+            extension = ''
+        incoming = self.path(INCOMING)
+        os.makedirs(incoming, exist_ok=True)
+
+        digest = getattr(content, 'sha256', None)
+        temporary_path = getattr(content, 'temporary_file_path', None)
+        if digest and temporary_path:
+            staged, owned = temporary_path(), False
+        else:
+            digest, staged = self._copy_in(content, incoming)
+            owned = True
+
+        name = blob_name(digest, extension)
+        path = self.path(name)
+        if os.path.exists(path):
+            # Deduplicated. Touch it so gc_media's grace period starts again: a new
+            # reference is on its way.
+            os.utime(path)
+            if owned:
+                os.unlink(staged)
+            return name
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Same name means same bytes, so a concurrent writer winning the race is fine.
+        file_move_safe(staged, path, allow_overwrite=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(path, self.file_permissions_mode)
+        return name
+
+    def _copy_in(self, content, incoming):
+        hasher = hashlib.sha256()
+        fd, staged = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.unlink(staged)
+            raise
+        return hasher.hexdigest(), staged
+
+
+# --- References ---
+
+def _references(label, pk, values):
+    references = []
+    for field in REFERENCE_FIELDS[label]:
+        name = storage_name(values.get(field))
+        digest = blob_digest(name)
+        if digest:
+            references.append(Mediareference(sha256=digest, name=name, model=label, objectid=pk, field=field))
+    return references
+
+
+def sync_references(instance):
+    """Rewrites the blob references of one row from its current media columns."""
+    label = instance._meta.label
+    values = type(instance).objects.filter(pk=instance.pk).values(*REFERENCE_FIELDS[label]).first() or {}
+    with transaction.atomic():
+        Mediareference.objects.filter(model=label, objectid=instance.pk).delete()
+        Mediareference.objects.bulk_create(_references(label, instance.pk, values))
+
+
+def drop_references(instance):
+    Mediareference.objects.filter(model=instance._meta.label, objectid=instance.pk).delete()
+
+
+def rebuild_references(batch_size=1000):
+    """Re-derives the whole table from the media columns; returns the reference count."""
+    references = []
+    for label, fields in REFERENCE_FIELDS.items():
+        model = apps.get_model(label)
+        rows = model.objects.exclude(**{f'{field}__isnull': True for field in fields}).values('pk', *fields)
+        for row in rows.iterator(chunk_size=batch_size):
+            references.extend(_references(label, row['pk'], row))
+    with transaction.atomic():
+        Mediareference.objects.all().delete()
+        Mediareference.objects.bulk_create(references, batch_size=batch_size)
+    return len(references)
+
+
+# --- Garbage collection ---
+
+def collect_garbage(storage, grace=None, dry_run=False):
+    """
+    Deletes blobs no Mediareference points at and leftover incoming files, both only
+    when older than `grace` seconds. Returns (files deleted, bytes freed).
+    """
+    config = get_config()
+    grace = config['GC_GRACE'] if grace is None else grace
+    cutoff = time.time() - grace
+    referenced = set(Mediareference.objects.values_list('sha256', flat=True).distinct())
+    deleted = freed = 0
+    for root, is_blob in ((storage.path(config['PREFIX']), True), (storage.path(INCOMING), False)):
+        for directory, _, files in os.walk(root):
+            for file_name in files:
+                path = os.path.join(directory, file_name)
+                stat = os.stat(path)
+                if stat.st_mtime > cutoff or (is_blob and os.path.splitext(file_name)[0] in referenced):
+                    continue
+                if not dry_run:
+                    os.unlink(path)
+                deleted += 1
+                freed += stat.st_size
+    return deleted, freed
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0006_alter_event_category'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['residentid', '-createdat'], name='booking_res_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['providerid', '-bookingdate'], name='booking_prov_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['residentid', 'serviceid', 'status', 'createdat'], name='booking_dup_check_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emergencyreport',
+            index=models.Index(fields=['-timestamp'], name='sos_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['communityid', '-date'], name='event_comm_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['status'], name='event_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issuereport',
+            index=models.Index(fields=['communityid', '-createdat'], name='issue_comm_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issuereport',
+            index=models.Index(fields=['status'], name='issue_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['userid', '-createdat'], name='notif_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['userid', 'isread', '-createdat'], name='notif_user_read_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useremail',
+            index=models.Index(fields=['email'], name='user_email_email_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0007_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Backgroundtask',
+            fields=[
+                ('taskid', models.AutoField(db_column='taskID', primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=50)),
+                ('payload', models.JSONField(default=dict)),
+                ('dedupekey', models.CharField(blank=True, db_column='dedupeKey', max_length=100, null=True, unique=True)),
+                ('priority', models.SmallIntegerField(default=0)),
+                ('status', models.CharField(default='Pending', max_length=9)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('lasterror', models.TextField(blank=True, db_column='lastError', null=True)),
+                ('runafter', models.DateTimeField(db_column='runAfter', default=django.utils.timezone.now)),
+                ('lockedat', models.DateTimeField(blank=True, db_column='lockedAt', null=True)),
+                ('createdat', models.DateTimeField(auto_now_add=True, db_column='createdAt')),
+                ('updatedat', models.DateTimeField(auto_now=True, db_column='updatedAt')),
+            ],
+            options={
+                'db_table': 'BackgroundTask',
+                'indexes': [models.Index(fields=['status', '-priority', 'runafter'], name='task_claim_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0008_backgroundtask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notificationoutbox',
+            fields=[
+                ('outboxid', models.AutoField(db_column='outboxID', primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=30)),
+                ('payload', models.JSONField(default=dict)),
+                ('createdat', models.DateTimeField(auto_now_add=True, db_column='createdAt')),
+                ('processedat', models.DateTimeField(blank=True, db_column='processedAt', null=True)),
+            ],
+            options={
+                'db_table': 'NotificationOutbox',
+                'indexes': [models.Index(fields=['processedat', 'outboxid'], name='outbox_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0009_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notificationcounter',
+            fields=[
+                ('userid', models.OneToOneField(db_column='userID', on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='base.user')),
+                ('unread', models.IntegerField(default=0)),
+                ('updatedat', models.DateTimeField(auto_now=True, db_column='updatedAt')),
+            ],
+            options={
+                'db_table': 'NotificationCounter',
+            },
+        ),
+    ]
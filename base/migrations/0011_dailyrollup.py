@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0010_notificationcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Dailyrollup',
+            fields=[
+                ('rollupid', models.BigAutoField(db_column='rollupID', primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('metric', models.CharField(max_length=30)),
+                ('dimension', models.CharField(default='', max_length=20)),
+                ('dimensionvalue', models.CharField(db_column='dimensionValue', default='', max_length=255)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'db_table': 'DailyRollup',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['createdat'], name='booking_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issuereport',
+            index=models.Index(fields=['createdat'], name='issue_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['createdat'], name='review_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyrollup',
+            name='communityid',
+            field=models.ForeignKey(db_column='communityID', on_delete=django.db.models.deletion.CASCADE, to='base.community'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyrollup',
+            index=models.Index(fields=['metric', 'day'], name='rollup_metric_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=('communityid', 'day', 'metric', 'dimension', 'dimensionvalue'), name='rollup_key_uniq'),
+        ),
+    ]
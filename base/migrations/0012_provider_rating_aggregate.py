@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:17
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_ratings(apps, schema_editor):
+    Review = apps.get_model('base', 'Review')
+    Serviceprovider = apps.get_model('base', 'Serviceprovider')
+    totals = (
+        Review.objects.filter(rating__isnull=False)
+        .values('providerid').annotate(total=Sum('rating'), n=Count('rating')).order_by()
+    )
+    for row in totals:
+        Serviceprovider.objects.filter(pk=row['providerid']).update(rating_sum=row['total'], rating_count=row['n'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0011_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='rating_count',
+            field=models.IntegerField(db_column='ratingCount', default=0),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='rating_sum',
+            field=models.IntegerField(db_column='ratingSum', default=0),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
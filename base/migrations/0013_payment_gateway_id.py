@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0012_provider_rating_aggregate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(blank=True, max_length=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='gatewaypaymentid',
+            field=models.CharField(blank=True, db_column='gatewayPaymentID', max_length=50, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'paymentdate'], name='payment_status_date_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0013_payment_gateway_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emergencyreport',
+            index=models.Index(fields=['status', '-timestamp'], name='sos_status_time_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0014_sos_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emergencyreport',
+            name='photothumb',
+            field=models.CharField(blank=True, db_column='photoThumb', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='emergencyreport',
+            name='photoweb',
+            field=models.CharField(blank=True, db_column='photoWeb', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='photothumb',
+            field=models.CharField(blank=True, db_column='photoThumb', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='photoweb',
+            field=models.CharField(blank=True, db_column='photoWeb', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='issuereport',
+            name='photothumb',
+            field=models.CharField(blank=True, db_column='photoThumb', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='issuereport',
+            name='photoweb',
+            field=models.CharField(blank=True, db_column='photoWeb', max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0015_photo_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Mediareference',
+            fields=[
+                ('referenceid', models.BigAutoField(db_column='referenceID', primary_key=True, serialize=False)),
+                ('sha256', models.CharField(max_length=64)),
+                ('name', models.CharField(max_length=255)),
+                ('model', models.CharField(max_length=50)),
+                ('objectid', models.IntegerField(db_column='objectID')),
+                ('field', models.CharField(max_length=30)),
+                ('createdat', models.DateTimeField(auto_now_add=True, db_column='createdAt')),
+            ],
+            options={
+                'db_table': 'MediaReference',
+                'indexes': [models.Index(fields=['sha256'], name='media_reference_blob_idx')],
+                'constraints': [models.UniqueConstraint(fields=('model', 'objectid', 'field'), name='media_reference_uniq')],
+            },
+        ),
+    ]
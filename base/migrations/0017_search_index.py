@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:04
+
+from django.db import migrations, models
+
+# (table, index, columns) for the 'mysql' backend of base/search.py.
+FULLTEXT_INDEXES = [
+    ('IssueReport', 'issue_search_ft', ['title', 'description', 'mapAddress', 'type']),
+    ('Event', 'event_search_ft', ['title', 'description', 'location', 'category']),
+    ('Service', 'service_search_ft', ['serviceName', 'category', 'description']),
+]
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    quote = schema_editor.quote_name
+    for table, index, columns in FULLTEXT_INDEXES:
+        schema_editor.execute(
+            f"CREATE FULLTEXT INDEX {quote(index)} ON {quote(table)} ({', '.join(quote(column) for column in columns)})"
+        )
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, index, _ in FULLTEXT_INDEXES:
+        schema_editor.execute(f"DROP INDEX {schema_editor.quote_name(index)} ON {schema_editor.quote_name(table)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0016_media_references'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Searchposting',
+            fields=[
+                ('postingid', models.BigAutoField(db_column='postingID', primary_key=True, serialize=False)),
+                ('term', models.CharField(max_length=50)),
+                ('doctype', models.CharField(db_column='docType', max_length=10)),
+                ('objectid', models.IntegerField(db_column='objectID')),
+                ('communityid', models.IntegerField(db_column='communityID')),
+                ('weight', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'db_table': 'SearchPosting',
+                'indexes': [models.Index(fields=['doctype', 'term', 'communityid'], name='search_term_idx'), models.Index(fields=['doctype', 'objectid'], name='search_document_idx')],
+            },
+        ),
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings  # <--- Added this import
+from django.utils import timezone
 
 # --- Core Application Models ---
 
@@ -64,10 +65,17 @@ class Serviceprovider(models.Model):
     certificationfile = models.CharField(db_column='certificationFile', max_length=255, blank=True, null=True)
     availability_status = models.CharField(max_length=9, blank=True, null=True)
     subrole = models.CharField(db_column='subRole', max_length=50, blank=True, null=True)
+    # Denormalized from Review (kept in step by base/signals.py, repaired by rebuild_provider_ratings).
+    rating_sum = models.IntegerField(db_column='ratingSum', default=0)
+    rating_count = models.IntegerField(db_column='ratingCount', default=0)
 
     class Meta:
         db_table = 'ServiceProvider'
 
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.rating_count, 1) if self.rating_count else 0
+
 # 5. Authority
 class Authority(models.Model):
     authorityid = models.AutoField(db_column='authorityID', primary_key=True)
@@ -94,6 +102,9 @@ class UserEmail(models.Model):
     class Meta:
         db_table = 'User_Email'
         unique_together = (('userid', 'email'),)
+        # Login/identity lookups filter on email alone. MySQL's default collation is
+        # case-insensitive, so email__iexact (LIKE without wildcards) uses this index too.
+        indexes = [models.Index(fields=['email'], name='user_email_email_idx')]
 
 # 7. User_PhoneNumber
 class UserPhonenumber(models.Model):
@@ -129,6 +140,8 @@ class Issuereport(models.Model):
     type = models.CharField(max_length=50, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     photo = models.CharField(max_length=255, blank=True, null=True)
+    photothumb = models.CharField(db_column='photoThumb', max_length=255, blank=True, null=True)
+    photoweb = models.CharField(db_column='photoWeb', max_length=255, blank=True, null=True)
     mapaddress = models.CharField(db_column='mapAddress', max_length=255, blank=True, null=True)
     status = models.CharField(max_length=11, blank=True, null=True)
     prioritylevel = models.CharField(db_column='priorityLevel', max_length=6, blank=True, null=True)
@@ -137,6 +150,11 @@ class Issuereport(models.Model):
 
     class Meta:
         db_table = 'IssueReport'
+        indexes = [
+            models.Index(fields=['communityid', '-createdat'], name='issue_comm_created_idx'),
+            models.Index(fields=['status'], name='issue_status_idx'),
+            models.Index(fields=['createdat'], name='issue_created_idx'),
+        ]
 
 # 10. IssueVote
 class Issuevote(models.Model):
@@ -168,6 +186,8 @@ class Event(models.Model):
     title = models.CharField(max_length=150)
     description = models.TextField(blank=True, null=True)
     photo = models.CharField(max_length=255, blank=True, null=True)
+    photothumb = models.CharField(db_column='photoThumb', max_length=255, blank=True, null=True)
+    photoweb = models.CharField(db_column='photoWeb', max_length=255, blank=True, null=True)
     date = models.DateField()
     time = models.TimeField()
     location = models.CharField(max_length=255, blank=True, null=True)
@@ -177,6 +197,10 @@ class Event(models.Model):
 
     class Meta:
         db_table = 'Event'
+        indexes = [
+            models.Index(fields=['communityid', '-date'], name='event_comm_date_idx'),
+            models.Index(fields=['status'], name='event_status_idx'),
+        ]
 
 # 13. EventParticipation
 class Eventparticipation(models.Model):
@@ -209,6 +233,8 @@ class Emergencyreport(models.Model):
     communityid = models.ForeignKey(Community, models.CASCADE, db_column='communityID')
     emergencytype = models.CharField(db_column='emergencyType', max_length=8)
     photo = models.CharField(max_length=255, blank=True, null=True)
+    photothumb = models.CharField(db_column='photoThumb', max_length=255, blank=True, null=True)
+    photoweb = models.CharField(db_column='photoWeb', max_length=255, blank=True, null=True)
     location = models.CharField(max_length=255, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=9, blank=True, null=True)
@@ -216,6 +242,11 @@ class Emergencyreport(models.Model):
 
     class Meta:
         db_table = 'EmergencyReport'
+        indexes = [
+            models.Index(fields=['-timestamp'], name='sos_timestamp_idx'),
+            # Authority feed: the Pending SOS block, newest first.
+            models.Index(fields=['status', '-timestamp'], name='sos_status_time_idx'),
+        ]
 
 # 16. Notification
 class Notification(models.Model):
@@ -230,6 +261,11 @@ class Notification(models.Model):
 
     class Meta:
         db_table = 'Notification'
+        # MySQL has no partial indexes, so "unread for user" is a composite on isread instead.
+        indexes = [
+            models.Index(fields=['userid', '-createdat'], name='notif_user_created_idx'),
+            models.Index(fields=['userid', 'isread', '-createdat'], name='notif_user_read_created_idx'),
+        ]
 
 # 17. Booking
 class Booking(models.Model):
@@ -247,6 +283,13 @@ class Booking(models.Model):
 
     class Meta:
         db_table = 'Booking'
+        indexes = [
+            models.Index(fields=['residentid', '-createdat'], name='booking_res_created_idx'),
+            models.Index(fields=['providerid', '-bookingdate'], name='booking_prov_date_idx'),
+            # BookingView duplicate check: resident + service + status within the last minute.
+            models.Index(fields=['residentid', 'serviceid', 'status', 'createdat'], name='booking_dup_check_idx'),
+            models.Index(fields=['createdat'], name='booking_created_idx'),
+        ]
 
 # 18. Payment
 class Payment(models.Model):
@@ -256,10 +299,16 @@ class Payment(models.Model):
     method = models.CharField(max_length=5)
     transactionid = models.CharField(db_column='transactionID', max_length=100, blank=True, null=True)
     paymentdate = models.DateTimeField(db_column='paymentDate', auto_now_add=True)
-    status = models.CharField(max_length=8, blank=True, null=True)
+    status = models.CharField(max_length=9, blank=True, null=True)  # Pending / Completed / Failed
+    # bKash paymentID from payment/create; the callback and reconciliation look payments up by it.
+    gatewaypaymentid = models.CharField(db_column='gatewayPaymentID', max_length=50, unique=True, blank=True, null=True)
 
     class Meta:
         db_table = 'Payment'
+        indexes = [
+            # Reconciliation: pending gateway payments, oldest first.
+            models.Index(fields=['status', 'paymentdate'], name='payment_status_date_idx'),
+        ]
 
 # 19. Review
 class Review(models.Model):
@@ -273,6 +322,7 @@ class Review(models.Model):
 
     class Meta:
         db_table = 'Review'
+        indexes = [models.Index(fields=['createdat'], name='review_created_idx')]
 
 # 20. LoginLog
 class Loginlog(models.Model):
@@ -300,6 +350,100 @@ class Activitylog(models.Model):
     class Meta:
         db_table = 'ActivityLog'
 
+# 22. BackgroundTask (DB-backed work queue, see base/tasks.py)
+class Backgroundtask(models.Model):
+    taskid = models.AutoField(db_column='taskID', primary_key=True)
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    # Enqueueing twice with the same key is a no-op, which makes producers idempotent.
+    dedupekey = models.CharField(db_column='dedupeKey', max_length=100, unique=True, blank=True, null=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=9, default='Pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    lasterror = models.TextField(db_column='lastError', blank=True, null=True)
+    runafter = models.DateTimeField(db_column='runAfter', default=timezone.now)
+    lockedat = models.DateTimeField(db_column='lockedAt', blank=True, null=True)
+    createdat = models.DateTimeField(db_column='createdAt', auto_now_add=True)
+    updatedat = models.DateTimeField(db_column='updatedAt', auto_now=True)
+
+    class Meta:
+        db_table = 'BackgroundTask'
+        indexes = [models.Index(fields=['status', '-priority', 'runafter'], name='task_claim_idx')]
+
+# 23. NotificationOutbox (compact notification intents, see base/notifications.py)
+class Notificationoutbox(models.Model):
+    outboxid = models.AutoField(db_column='outboxID', primary_key=True)
+    kind = models.CharField(max_length=30)
+    payload = models.JSONField(default=dict)
+    createdat = models.DateTimeField(db_column='createdAt', auto_now_add=True)
+    processedat = models.DateTimeField(db_column='processedAt', blank=True, null=True)
+
+    class Meta:
+        db_table = 'NotificationOutbox'
+        indexes = [models.Index(fields=['processedat', 'outboxid'], name='outbox_pending_idx')]
+
+# 24. NotificationCounter (denormalized unread count per user)
+class Notificationcounter(models.Model):
+    userid = models.OneToOneField(User, models.CASCADE, db_column='userID', primary_key=True)
+    unread = models.IntegerField(default=0)
+    updatedat = models.DateTimeField(db_column='updatedAt', auto_now=True)
+
+    class Meta:
+        db_table = 'NotificationCounter'
+
+# 25. DailyRollup (pre-aggregated dashboard metrics per day and community, see base/rollups.py)
+class Dailyrollup(models.Model):
+    rollupid = models.BigAutoField(db_column='rollupID', primary_key=True)
+    day = models.DateField()
+    communityid = models.ForeignKey(Community, models.CASCADE, db_column='communityID')
+    metric = models.CharField(max_length=30)
+    # e.g. dimension='type', dimensionvalue='Road'; '' when the metric has no breakdown.
+    dimension = models.CharField(max_length=20, default='')
+    dimensionvalue = models.CharField(db_column='dimensionValue', max_length=255, default='')
+    value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'DailyRollup'
+        constraints = [
+            models.UniqueConstraint(fields=['communityid', 'day', 'metric', 'dimension', 'dimensionvalue'], name='rollup_key_uniq'),
+        ]
+        indexes = [models.Index(fields=['metric', 'day'], name='rollup_metric_day_idx')]
+
+# 26. MediaReference (which rows use which content-addressed blob, see base/media_store.py)
+class Mediareference(models.Model):
+    referenceid = models.BigAutoField(db_column='referenceID', primary_key=True)
+    sha256 = models.CharField(max_length=64)
+    name = models.CharField(max_length=255)
+    # e.g. model='base.Issuereport', field='photothumb'
+    model = models.CharField(max_length=50)
+    objectid = models.IntegerField(db_column='objectID')
+    field = models.CharField(max_length=30)
+    createdat = models.DateTimeField(db_column='createdAt', auto_now_add=True)
+
+    class Meta:
+        db_table = 'MediaReference'
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'objectid', 'field'], name='media_reference_uniq'),
+        ]
+        indexes = [models.Index(fields=['sha256'], name='media_reference_blob_idx')]
+
+# 27. SearchPosting (inverted index of the python search backend, see base/search.py)
+class Searchposting(models.Model):
+    postingid = models.BigAutoField(db_column='postingID', primary_key=True)
+    term = models.CharField(max_length=50)
+    # 'issue', 'event' or 'service' (base.search.DOCUMENTS)
+    doctype = models.CharField(db_column='docType', max_length=10)
+    objectid = models.IntegerField(db_column='objectID')
+    communityid = models.IntegerField(db_column='communityID')
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        db_table = 'SearchPosting'
+        indexes = [
+            models.Index(fields=['doctype', 'term', 'communityid'], name='search_term_idx'),
+            models.Index(fields=['doctype', 'objectid'], name='search_document_idx'),
+        ]
+
 # --- Corrected Example Model (Was ApiExample) ---
 # Renamed to Example so views.py and serializers.py imports work.
 class Example(models.Model):
@@ -0,0 +1,266 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import (
+    User, Resident, Event, Issuereport, Service, Notification, Notificationoutbox,
+    Notificationcounter
+)
+from .realtime import publish_notifications
+from .tasks import task, enqueue, get_config
+
+# ==========================================
+#  NOTIFICATION FAN-OUT
+# ==========================================
+# Publishing an event notifies the whole community. That used to happen inside the
+# approving request; it now runs on the background worker (base/tasks.py):
+#   - user ids are streamed with values_list().iterator(), never loaded as models
+#   - notifications are inserted in fixed-size batches, each batch in its own
+#     transaction together with a resume cursor, so a crashed run picks up where it
+#     stopped instead of starting over
+#   - the task is keyed by event id, so re-saving a Published event does not notify twice
+
+EVENT_PUBLISHED_TASK = 'notifications.event_published'
+
+
+def fanout_batch_size():
+    return getattr(settings, 'NOTIFICATION_FANOUT_BATCH_SIZE', 1000)
+
+
+def enqueue_event_published(event):
+    return enqueue(EVENT_PUBLISHED_TASK, {'event': event.pk}, dedupe_key=f'event-published:{event.pk}')
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@task(EVENT_PUBLISHED_TASK)
+def fan_out_event_published(bg_task):
+    event = Event.objects.filter(pk=bg_task.payload['event']).first()
+    if event is None:
+        return
+
+    if not bg_task.payload.get('creator_notified'):
+        with transaction.atomic():
+            creator_notification = Notification.objects.create(
+                userid_id=event.postedbyid_id,
+                communityid_id=event.communityid_id,
+                message=f"Congratulations! Your event '{event.title}' has been approved and published.",
+                type='event',
+                link='/events'
+            )
+            increment_unread({event.postedbyid_id: 1})
+            transaction.on_commit(lambda: publish_notifications([creator_notification]))
+            bg_task.payload['creator_notified'] = True
+            bg_task.save(update_fields=['payload', 'updatedat'])
+
+    batch_size = fanout_batch_size()
+    message = f"New Event: '{event.title}' is happening on {event.date}!"
+    user_ids = (
+        User.objects
+        .filter(communityid=event.communityid_id, userid__gt=bg_task.payload.get('cursor', 0))
+        .exclude(userid=event.postedbyid_id)
+        .order_by('userid')
+        .values_list('userid', flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+    for batch in _batched(user_ids, batch_size):
+        with transaction.atomic():
+            notifications = Notification.objects.bulk_create([
+                Notification(userid_id=user_id, communityid_id=event.communityid_id, message=message, type='event', link='/events')
+                for user_id in batch
+            ])
+            transaction.on_commit(lambda notifications=notifications: publish_notifications(notifications))
+            increment_unread({user_id: 1 for user_id in batch})
+            bg_task.payload['cursor'] = batch[-1]
+            bg_task.save(update_fields=['payload', 'updatedat'])
+
+
+# ==========================================
+#  NOTIFICATION OUTBOX
+# ==========================================
+# Signal handlers used to insert a Notification and walk several lazy FKs
+# (residentid.userid, serviceid.servicename, ...) inside every resident write.
+# They now write one compact Notificationoutbox row holding only ids already on the
+# instance - no reads - in the caller's transaction. The worker materializes pending
+# rows in batches: references are resolved with one query per model and the
+# notifications are bulk-inserted in the same transaction that marks the rows done.
+
+OUTBOX_RENDERERS = {}
+
+
+def outbox_renderer(kind):
+    def decorator(func):
+        OUTBOX_RENDERERS[kind] = func
+        return func
+    return decorator
+
+
+def emit(kind, **payload):
+    row = Notificationoutbox.objects.create(kind=kind, payload=payload)
+    if get_config()['RUN_EAGERLY']:
+        transaction.on_commit(materialize_outbox)
+    return row
+
+
+class OutboxRefs:
+    """Bulk lookups shared by every row of one outbox batch."""
+    def __init__(self, rows):
+        def ids(key):
+            return {row.payload[key] for row in rows if row.payload.get(key)}
+        self.resident_user = dict(Resident.objects.filter(pk__in=ids('resident')).values_list('residentid', 'userid'))
+        user_ids = ids('user') | set(self.resident_user.values())
+        self.user_community = dict(User.objects.filter(pk__in=user_ids).values_list('userid', 'communityid'))
+        self.service_name = dict(Service.objects.filter(pk__in=ids('service')).values_list('serviceid', 'servicename'))
+        self.issue_title = dict(Issuereport.objects.filter(pk__in=ids('issue')).values_list('issueid', 'title'))
+        self.event_title = dict(Event.objects.filter(pk__in=ids('event')).values_list('eventid', 'title'))
+
+    def user_for(self, payload):
+        if payload.get('user'):
+            return payload['user']
+        return self.resident_user.get(payload.get('resident'))
+
+
+@outbox_renderer('issue_submitted')
+def render_issue_submitted(payload, refs):
+    return dict(message=f"Success: Your issue report '{payload['title']}' has been submitted.", type='issue', link='/report-issue')
+
+
+@outbox_renderer('issue_resolved')
+def render_issue_resolved(payload, refs):
+    return dict(message=f"Good news! Your issue '{payload['title']}' has been resolved.", type='issue', link='/report-issue')
+
+
+@outbox_renderer('booking_created')
+def render_booking_created(payload, refs):
+    service_name = refs.service_name.get(payload['service'])
+    return dict(message=f"Booking Sent: Request for '{service_name}' submitted successfully.", type='booking', link='/book-service')
+
+
+@outbox_renderer('booking_updated')
+def render_booking_updated(payload, refs):
+    service_name = refs.service_name.get(payload['service'])
+    messages = {
+        'Accepted': f"Good news! Your booking for '{service_name}' has been ACCEPTED.",
+        'Rejected': f"Update: Your booking for '{service_name}' was declined.",
+        'Completed': f"Service '{service_name}' is marked as COMPLETED.",
+    }
+    if payload['status'] not in messages:
+        return None
+    return dict(message=messages[payload['status']], type='booking', link='/book-service')
+
+
+@outbox_renderer('sos_sent')
+def render_sos_sent(payload, refs):
+    return dict(message="SOS ALERT SENT! Authorities have been notified of your location.", type='sos', link='/sos')
+
+
+@outbox_renderer('profile_updated')
+def render_profile_updated(payload, refs):
+    return dict(message="Security Alert: Your profile information was updated.", type='profile', link='/profile')
+
+
+@outbox_renderer('vote_cast')
+def render_vote_cast(payload, refs):
+    vote_action = "upvoted" if payload['votetype'] == 'up' else "downvoted"
+    return dict(message=f"You {vote_action} the issue: '{refs.issue_title.get(payload['issue'])}'.", type='vote', link='/community-voting')
+
+
+@outbox_renderer('event_join')
+def render_event_join(payload, refs):
+    return dict(message=f"You are going to event: '{refs.event_title.get(payload['event'])}'", type='event', link='/events')
+
+
+def materialize_outbox(limit=500):
+    """Turns up to `limit` pending outbox rows into Notifications. Returns the row count."""
+    with transaction.atomic():
+        rows = list(
+            Notificationoutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(processedat__isnull=True)
+            .order_by('outboxid')[:limit]
+        )
+        if not rows:
+            return 0
+        refs = OutboxRefs(rows)
+        notifications = []
+        for row in rows:
+            user_id = refs.user_for(row.payload)
+            renderer = OUTBOX_RENDERERS.get(row.kind)
+            # Rows whose user has since been deleted are simply marked processed.
+            fields = renderer(row.payload, refs) if renderer and user_id in refs.user_community else None
+            if not fields:
+                continue
+            # 'community' is the row's community; rows without one use the user's community.
+            community_id = row.payload['community'] if 'community' in row.payload else refs.user_community.get(user_id)
+            notifications.append(Notification(userid_id=user_id, communityid_id=community_id, **fields))
+        Notification.objects.bulk_create(notifications)
+        increment_unread(Counter(n.userid_id for n in notifications))
+        transaction.on_commit(lambda: publish_notifications(notifications))
+        Notificationoutbox.objects.filter(pk__in=[row.pk for row in rows]).update(processedat=timezone.now())
+    return len(rows)
+
+
+# ==========================================
+#  UNREAD COUNTERS
+# ==========================================
+# Notificationcounter keeps each user's unread count so the badge is a primary-key
+# read instead of COUNT(*) over Notification. Every path that inserts notifications
+# calls increment_unread() in the same transaction; marking all as read resets it.
+# A missing counter is seeded from the Notification table, and
+# `manage.py reconcile_notification_counters` repairs any drift.
+
+
+def _seed_counts(user_ids):
+    return dict(
+        Notification.objects.filter(userid__in=user_ids, isread=False)
+        .values('userid').annotate(unread=Count('notificationid'))
+        .values_list('userid', 'unread')
+    )
+
+
+def increment_unread(counts):
+    """counts: {user_id: number of notifications just inserted}."""
+    if not counts:
+        return
+    existing = set(Notificationcounter.objects.filter(userid__in=list(counts)).values_list('userid', flat=True))
+    by_amount = defaultdict(list)
+    for user_id, amount in counts.items():
+        if user_id in existing:
+            by_amount[amount].append(user_id)
+    for amount, user_ids in by_amount.items():
+        Notificationcounter.objects.filter(userid__in=user_ids).update(unread=F('unread') + amount, updatedat=timezone.now())
+
+    missing = [user_id for user_id in counts if user_id not in existing]
+    if missing:
+        # The new notifications are already inserted, so the seed count includes them.
+        seeded = _seed_counts(missing)
+        Notificationcounter.objects.bulk_create(
+            [Notificationcounter(userid_id=user_id, unread=seeded.get(user_id, 0)) for user_id in missing],
+            ignore_conflicts=True
+        )
+
+
+def get_unread_count(user_id):
+    unread = Notificationcounter.objects.filter(userid=user_id).values_list('unread', flat=True).first()
+    if unread is None:
+        unread = _seed_counts([user_id]).get(user_id, 0)
+        Notificationcounter.objects.bulk_create([Notificationcounter(userid_id=user_id, unread=unread)], ignore_conflicts=True)
+    return unread
+
+
+def reset_unread(user_id):
+    updated = Notificationcounter.objects.filter(userid=user_id).update(unread=0, updatedat=timezone.now())
+    if not updated:
+        Notificationcounter.objects.bulk_create([Notificationcounter(userid_id=user_id, unread=0)], ignore_conflicts=True)
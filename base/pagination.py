@@ -0,0 +1,165 @@
+import base64
+import datetime
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# ==========================================
+#  KEYSET (CURSOR) PAGINATION
+# ==========================================
+# Pages are cut with "WHERE (field, pk) < (last_field, last_pk)" on the view's existing
+# ordering column, with the primary key as a stable tiebreaker, so every page costs the
+# same no matter how deep it is.
+#
+#   ?page_size=N       -> page size (default settings.API_PAGE_SIZE, capped at API_MAX_PAGE_SIZE)
+#   ?cursor=...        -> opaque cursor taken from the previous page's "next_cursor"
+#   ?paginate=false    -> legacy mode: the full, unpaginated list (old response shape)
+
+
+class KeysetPagination(BasePagination):
+    page_size = getattr(settings, 'API_PAGE_SIZE', 50)
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    legacy_query_param = 'paginate'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None):
+        self.ordering = ordering
+
+    def is_legacy(self, request):
+        return request.query_params.get(self.legacy_query_param, '').lower() in ('false', '0', 'no', 'off')
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, view):
+        ordering = self.ordering or getattr(view, 'cursor_ordering', None)
+        assert ordering, 'KeysetPagination needs an ordering (e.g. "-createdat") or view.cursor_ordering.'
+        return ordering
+
+    def encode_cursor(self, value, pk):
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            value = value.isoformat()
+        raw = json.dumps([value, pk]).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def coerce_cursor(self, queryset, field, value, pk):
+        """The cursor's values as the ordering field and pk expect them; NotFound otherwise."""
+        if field in queryset.query.annotations:
+            model_field = queryset.query.annotations[field].output_field
+        else:
+            model_field = queryset.model._meta.get_field(field)
+        try:
+            value, pk = model_field.to_python(value), queryset.model._meta.pk.to_python(pk)
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None or pk is None:  # NULL cannot be compared with < / >
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.is_legacy(request):
+            return None
+
+        ordering = self.get_ordering(view)
+        field = ordering.lstrip('-')
+        descending = ordering.startswith('-')
+        pk_name = queryset.model._meta.pk.name
+        queryset = queryset.order_by(ordering, ('-' if descending else '') + pk_name)
+
+        cursor = self.decode_cursor(request)
+        if cursor:
+            value, last_pk = self.coerce_cursor(queryset, field, *cursor)
+            op = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'{pk_name}__{op}': last_pk})
+            )
+
+        self.request = request
+        self.page_size_used = self.get_page_size(request)
+        page = list(queryset[:self.page_size_used + 1])
+        self.next_cursor = None
+        if len(page) > self.page_size_used:
+            page = page[:self.page_size_used]
+            last = page[-1]
+            self.next_cursor = self.encode_cursor(getattr(last, field), last.pk)
+        return page
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('next_cursor', self.next_cursor),
+            ('page_size', self.page_size_used),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'page_size': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+
+class RankedPagination(KeysetPagination):
+    """
+    Pages over an already ranked list (search hits), where there is no column to cut
+    on; the cursor carries the offset. Same response shape as KeysetPagination.
+    """
+    def paginate_list(self, items, request):
+        if self.is_legacy(request):
+            return None
+        cursor = self.decode_cursor(request)
+        offset = cursor[0] if cursor else 0
+        if not isinstance(offset, int) or offset < 0:
+            raise NotFound(self.invalid_cursor_message)
+        self.request = request
+        self.page_size_used = self.get_page_size(request)
+        end = offset + self.page_size_used
+        self.next_cursor = self.encode_cursor(end, None) if len(items) > end else None
+        return items[offset:end]
+
+
+def paginated_response(request, queryset, serializer_class, ordering, view=None, context=None):
+    """
+    Keyset pagination for plain APIViews: returns the paginated Response, or the full
+    serialized list when the client asked for the legacy unpaginated mode.
+    """
+    paginator = KeysetPagination(ordering)
+    page = paginator.paginate_queryset(queryset, request, view=view)
+    context = context or {'request': request}
+    if page is None:
+        return Response(serializer_class(queryset, many=True, context=context).data)
+    return paginator.get_paginated_response(serializer_class(page, many=True, context=context).data)
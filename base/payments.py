@@ -0,0 +1,127 @@
+import datetime
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import bkash
+from .models import Payment
+from .tasks import task, enqueue
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+#  BKASH PAYMENT EXECUTION & RECONCILIATION
+# ==========================================
+# The callback no longer talks to bKash inside the browser redirect. It looks up the
+# Payment row BkashInitiateView tagged with the gateway paymentID, enqueues an execute
+# task and redirects straight away. The worker (`manage.py run_tasks`) then:
+#
+#   EXECUTE_TASK -> payment/execute; if bKash rejects it (e.g. "already completed" after
+#                   an earlier attempt timed out) the query API decides the outcome
+#   VERIFY_TASK  -> payment/query for payments still Pending RECONCILE_AFTER seconds
+#                   after booking (callback never arrived, worker was down, ...)
+#
+# Both end in apply_gateway_status(), which locks the Payment row and is idempotent:
+# a Completed payment is never touched again and a trxID is only recorded once.
+# Gateway outages raise BkashUnavailable, so the task is retried with backoff.
+
+EXECUTE_TASK = 'payments.bkash_execute'
+VERIFY_TASK = 'payments.bkash_verify'
+EXECUTE_PRIORITY = 10
+
+FAILED_STATUSES = {'Cancelled', 'Failed', 'Expired'}
+
+
+def record_created_payment(booking, payment_id):
+    """Tags the booking's Payment (created by BookingView) with the bKash paymentID."""
+    Payment.objects.update_or_create(
+        bookingid=booking,
+        defaults={'gatewaypaymentid': payment_id, 'method': 'Bkash', 'status': 'Pending'},
+        create_defaults={'gatewaypaymentid': payment_id, 'method': 'Bkash', 'status': 'Pending', 'amount': booking.price},
+    )
+
+
+def enqueue_execution(payment_id):
+    return enqueue(EXECUTE_TASK, {'payment_id': payment_id}, dedupe_key=f'bkash-execute:{payment_id}', priority=EXECUTE_PRIORITY)
+
+
+def apply_gateway_status(payment_pk, data, abandon=False):
+    """
+    Applies a bKash execute/query response to the Payment and its Booking; returns the
+    resulting Payment status. With `abandon` a payment bKash does not report as
+    Completed is marked Failed.
+    """
+    transaction_status = data.get('transactionStatus')
+    with transaction.atomic():
+        payment = Payment.objects.select_for_update().select_related('bookingid').get(pk=payment_pk)
+        if payment.status == 'Completed':
+            return payment.status
+        if data.get('statusCode') == '0000' and transaction_status == 'Completed':
+            trx_id = data.get('trxID')
+            if trx_id and Payment.objects.filter(transactionid=trx_id).exclude(pk=payment.pk).exists():
+                logger.error("bKash trxID %s is already recorded on another payment; payment %s left as is", trx_id, payment.pk)
+                return payment.status
+            payment.status = 'Completed'
+            payment.transactionid = trx_id
+            payment.save(update_fields=['status', 'transactionid'])
+            booking = payment.bookingid
+            booking.status = 'Confirmed'
+            booking.paymentstatus = 'Paid'
+            booking.save(update_fields=['status', 'paymentstatus'])
+        elif transaction_status in FAILED_STATUSES or abandon:
+            payment.status = 'Failed'
+            payment.save(update_fields=['status'])
+    return payment.status
+
+
+@task(EXECUTE_TASK)
+def execute_bkash_payment(bg_task):
+    payment_id = bg_task.payload['payment_id']
+    payment = Payment.objects.filter(gatewaypaymentid=payment_id).values('pk', 'status').first()
+    if payment is None or payment['status'] == 'Completed':
+        return
+    client = bkash.get_client()
+    try:
+        data = client.execute_payment(payment_id)
+    except bkash.BkashUnavailable:
+        raise
+    except bkash.BkashError as e:
+        logger.info("bKash execute for %s rejected (%s); querying instead", payment_id, e)
+        data = {}
+    if data.get('statusCode') != '0000':
+        data = client.query_payment(payment_id)
+    apply_gateway_status(payment['pk'], data)
+
+
+@task(VERIFY_TASK)
+def verify_bkash_payment(bg_task):
+    payment_id = bg_task.payload['payment_id']
+    payment = Payment.objects.filter(gatewaypaymentid=payment_id).values('pk', 'status', 'paymentdate').first()
+    if payment is None or payment['status'] != 'Pending':
+        return
+    data = bkash.get_client().query_payment(payment_id)
+    abandon_before = timezone.now() - datetime.timedelta(seconds=bkash.get_config()['ABANDON_AFTER'])
+    apply_gateway_status(payment['pk'], data, abandon=payment['paymentdate'] < abandon_before)
+
+
+def reconcile_pending_payments(limit=500):
+    """
+    Enqueues a VERIFY_TASK for every bKash payment still Pending RECONCILE_AFTER seconds
+    after it was created. Tasks are keyed per RECONCILE_INTERVAL slot, so running this
+    from several workers (or cron) queues each payment at most once per interval.
+    """
+    config = bkash.get_config()
+    now = timezone.now()
+    slot = int(now.timestamp() // config['RECONCILE_INTERVAL'])
+    due = (
+        Payment.objects
+        .filter(status='Pending', gatewaypaymentid__isnull=False,
+                paymentdate__lte=now - datetime.timedelta(seconds=config['RECONCILE_AFTER']))
+        .order_by('paymentdate')
+        .values_list('gatewaypaymentid', flat=True)[:limit]
+    )
+    payment_ids = list(due)
+    for payment_id in payment_ids:
+        enqueue(VERIFY_TASK, {'payment_id': payment_id}, dedupe_key=f'bkash-verify:{payment_id}:{slot}')
+    return len(payment_ids)
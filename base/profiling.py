@@ -0,0 +1,358 @@
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.urls import resolve, Resolver404
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+#  SAMPLED REQUEST PROFILING (FLAMEGRAPHS)
+# ==========================================
+# Opt-in (PROFILING['ENABLED']). ProfilingMiddleware profiles SAMPLE_RATE of the requests
+# and appends their stacks, in collapsed-stack format ("frame;frame;frame value"), to
+# OUTPUT_DIR/<url name>.collapsed. Values are microseconds in both modes:
+#
+#   MODE 'sampling' -> a thread snapshots the request thread's stack every INTERVAL
+#                      seconds (low overhead, statistical)
+#   MODE 'tracing'  -> deterministic, cProfile-style: every call is recorded with its
+#                      exact stack (complete, but several times slower)
+#
+# View with flamegraph.pl (`flamegraph.pl profiles/auth_issue_list.collapsed > out.svg`)
+# or by opening the file in https://www.speedscope.app.
+#
+# Frames are labelled "path/module.py:Class.method", so SerializerMethodField calls,
+# Signal.send (signal handlers) and Model.from_db (ORM instantiation) stand out; each
+# profiled request also gets a line in OUTPUT_DIR/requests.jsonl with the time spent in
+# those CATEGORIES. `manage.py profile_replay` replays that log offline.
+#
+# Under ASGI a sync view runs on the request's thread-sensitive worker thread, so that
+# is the thread profiled, and only its stacks under SyncToAsync (the view and the sync
+# middleware) are kept; async views (the SSE stream) are not profiled.
+
+DEFAULTS = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.01,
+    'MODE': 'sampling',
+    'INTERVAL': 0.002,
+    'OUTPUT_DIR': None,  # default: BASE_DIR / 'profiles'
+    'MAX_DEPTH': 128,
+    # Also profile any request carrying "X-Profile: 1" while DEBUG is on.
+    'DEBUG_HEADER': True,
+    # Request bodies are stored in requests.jsonl for replay unless the URL name is listed.
+    'RECORD_BODIES': True,
+    'REDACT_URL_NAMES': ('login', 'register', 'change_password', 'bkash_callback'),
+    # Query parameters carrying credentials (API/stream tokens, signed media URLs).
+    'REDACT_QUERY_PARAMS': ('token', 'sig', 'exp'),
+}
+
+MODES = ('sampling', 'tracing')
+MAX_RECORDED_BODY = 64 * 1024
+REDACTED = '[redacted]'
+# Frame that sync code called through sync_to_async runs under (see _acall).
+WORKER_FRAME = 'asgiref/sync.py:SyncToAsync.thread_handler'
+
+# Category -> frame label fragments; a stack counts towards a category if any frame matches.
+CATEGORIES = {
+    'serializer_method_fields': ('SerializerMethodField.to_representation',),
+    'signal_handlers': ('Signal.send',),
+    'orm_instantiation': ('Model.from_db',),
+    'sql': ('django/db/backends/utils.py:',),
+}
+
+_write_lock = threading.Lock()
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PROFILING', {}))
+    return config
+
+
+def output_dir(config):
+    return Path(config['OUTPUT_DIR'] or Path(settings.BASE_DIR) / 'profiles')
+
+
+# --- Frame labels ---
+
+_labels = {}
+
+
+def _short_path(filename):
+    """'/venv/lib/site-packages/rest_framework/fields.py' -> 'rest_framework/fields.py'."""
+    best = filename
+    for root in sys.path:
+        if root and filename.startswith(root.rstrip(os.sep) + os.sep):
+            candidate = filename[len(root.rstrip(os.sep)) + 1:]
+            if len(candidate) < len(best):
+                best = candidate
+    return best.replace(os.sep, '/')
+
+
+def _label(filename, name):
+    key = (filename, name)
+    label = _labels.get(key)
+    if label is None:
+        # ';' separates frames and ' ' the value in collapsed files.
+        label = f"{_short_path(filename)}:{name}".replace(';', ',').replace(' ', '_')
+        _labels[key] = label
+    return label
+
+
+# --- Sampling profiler ---
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread."""
+    def __init__(self, interval, max_depth, thread_id=None):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return Counter({stack: int(seconds * 1_000_000) for stack, seconds in self.stacks.items()})
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            # Weight each sample by the time since the previous one: under GIL contention
+            # the sampler wakes up later than `interval`.
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            if frame is None:
+                continue
+            frames = []
+            while frame is not None and len(frames) < self.max_depth:
+                code = frame.f_code
+                frames.append(_label(code.co_filename, code.co_qualname))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(frames))] += elapsed
+
+
+# --- Deterministic tracer ---
+
+class StackTracer:
+    """
+    Records every Python and C call of the current thread (sys.setprofile) and charges
+    the time between events to the exact stack. cProfile only keeps caller -> callee
+    pairs, which cannot be turned back into stacks when wrappers are shared (every
+    Django middleware runs through the same `inner`), so this keeps the stacks itself.
+    """
+    def __init__(self, max_depth):
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self._keys = []
+        self._overflow = 0
+        self._last = None
+
+    def start(self):
+        self._last = time.perf_counter()
+        sys.setprofile(self._event)
+
+    def stop(self):
+        sys.setprofile(None)
+        return Counter({stack: int(seconds * 1_000_000) for stack, seconds in self.stacks.items()})
+
+    def _push(self, label):
+        if len(self._keys) >= self.max_depth:
+            self._overflow += 1
+            return
+        self._keys.append(f"{self._keys[-1]};{label}" if self._keys else label)
+
+    def _pop(self):
+        if self._overflow:
+            self._overflow -= 1
+        elif self._keys:  # frames entered before start() return without a matching push
+            self._keys.pop()
+
+    def _event(self, frame, event, arg):
+        now = time.perf_counter()
+        if self._keys:
+            self.stacks[self._keys[-1]] += now - self._last
+        if event == 'call':
+            self._push(_label(frame.f_code.co_filename, frame.f_code.co_qualname))
+        elif event == 'c_call':
+            self._push(f"{getattr(arg, '__module__', None) or 'builtins'}:{getattr(arg, '__qualname__', arg)}".replace(' ', '_'))
+        else:  # return, c_return, c_exception
+            self._pop()
+        # Excludes the tracer's own bookkeeping from the next interval.
+        self._last = time.perf_counter()
+
+
+# --- Output ---
+
+def _safe_name(url_name):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', url_name or 'unresolved')
+
+
+def category_times(stacks):
+    """Milliseconds per CATEGORIES entry, plus the total."""
+    totals = dict.fromkeys(CATEGORIES, 0)
+    for stack, value in stacks.items():
+        for category, markers in CATEGORIES.items():
+            if any(marker in stack for marker in markers):
+                totals[category] += value
+    result = {category: round(value / 1000, 3) for category, value in totals.items()}
+    result['total'] = round(sum(stacks.values()) / 1000, 3)
+    return result
+
+
+def write_profile(directory, url_name, stacks, entry=None):
+    """Appends stacks to <url name>.collapsed and `entry` (if any) to requests.jsonl."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    lines = ''.join(f"{stack} {value}\n" for stack, value in stacks.items() if value > 0)
+    with _write_lock:
+        with open(directory / f"{_safe_name(url_name)}.collapsed", 'a') as f:
+            f.write(lines)
+        if entry is not None:
+            with open(directory / 'requests.jsonl', 'a') as f:
+                f.write(json.dumps(entry, default=str) + '\n')
+
+
+def make_profiler(mode, config, thread_id=None):
+    if mode == 'tracing':
+        return StackTracer(config['MAX_DEPTH'])
+    return StackSampler(config['INTERVAL'], config['MAX_DEPTH'], thread_id)
+
+
+def profile_call(func, mode, config):
+    """Runs func() under the profiler for `mode`; returns (result, collapsed stacks)."""
+    profiler = make_profiler(mode, config)
+    profiler.start()
+    try:
+        result = func()
+    finally:
+        stacks = profiler.stop()
+    return result, stacks
+
+
+def redact_query(query, names):
+    """The query string with the values of the `names` parameters replaced."""
+    names = {name.lower() for name in names}
+    pairs = parse_qsl(query, keep_blank_values=True)
+    if not any(key.lower() in names for key, _ in pairs):
+        return query
+    return urlencode([(key, REDACTED if key.lower() in names else value) for key, value in pairs])
+
+
+def request_entry(request, url_name, elapsed, stacks, mode, config):
+    entry = {
+        'time': time.time(),
+        'url_name': url_name,
+        'method': request.method,
+        'path': request.path,
+        'query': redact_query(request.META.get('QUERY_STRING', ''), config['REDACT_QUERY_PARAMS']),
+        'content_type': request.META.get('CONTENT_TYPE', ''),
+        'user': getattr(getattr(request, 'user', None), 'pk', None),
+        'mode': mode,
+        'ms': round(elapsed * 1000, 3),
+        'categories': category_times(stacks),
+    }
+    if config['RECORD_BODIES'] and url_name not in config['REDACT_URL_NAMES']:
+        body = getattr(request, '_body', b'')
+        if body:
+            entry['body'] = body.decode('utf-8', errors='replace')
+    return entry
+
+
+# --- Middleware ---
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self._acall(request)
+        config = get_config()
+        if not config['ENABLED'] or not self._sampled(request, config):
+            return self.get_response(request)
+        mode = config['MODE'] if config['MODE'] in MODES else 'sampling'
+        self._read_body(request, config)
+        start = time.perf_counter()
+        response, stacks = profile_call(lambda: self.get_response(request), mode, config)
+        self._finish(request, stacks, time.perf_counter() - start, mode, config)
+        return response
+
+    async def _acall(self, request):
+        config = get_config()
+        if not config['ENABLED'] or self._async_view(request) or not self._sampled(request, config):
+            return await self.get_response(request)
+        mode = config['MODE'] if config['MODE'] in MODES else 'sampling'
+        self._read_body(request, config)
+        # The thread sync_to_async hands this request's sync code to: the tracer has to be
+        # installed there, and it is the thread the sampler watches.
+        thread_id = await sync_to_async(threading.get_ident)()
+        profiler = make_profiler(mode, config, thread_id)
+        start = time.perf_counter()
+        if mode == 'tracing':
+            await sync_to_async(profiler.start)()  # sys.setprofile() applies to the calling thread
+        else:
+            profiler.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stacks = await sync_to_async(profiler.stop)() if mode == 'tracing' else profiler.stop()
+        elapsed = time.perf_counter() - start
+        # Between sync calls the worker thread waits for work; that is not the request's time.
+        stacks = Counter({stack: value for stack, value in stacks.items() if WORKER_FRAME in stack})
+        await sync_to_async(self._finish)(request, stacks, elapsed, mode, config)
+        return response
+
+    def _finish(self, request, stacks, elapsed, mode, config):
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.url_name if match else None
+        try:
+            write_profile(output_dir(config), url_name, stacks, request_entry(request, url_name, elapsed, stacks, mode, config))
+        except OSError:
+            logger.exception("Could not write profile for %s", request.path)
+
+    def _read_body(self, request, config):
+        if config['RECORD_BODIES'] and self._small_body(request):
+            request.body  # read now; DRF consumes the stream without keeping a copy
+
+    @staticmethod
+    def _async_view(request):
+        try:
+            return iscoroutinefunction(resolve(request.path_info).func)
+        except Resolver404:
+            return False
+
+    @staticmethod
+    def _small_body(request):
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return False
+        return 0 < length <= MAX_RECORDED_BODY and not request.content_type.startswith('multipart/')
+
+    @staticmethod
+    def _sampled(request, config):
+        if config['DEBUG_HEADER'] and settings.DEBUG and request.headers.get('X-Profile') == '1':
+            return True
+        return random.random() < config['SAMPLE_RATE']
@@ -0,0 +1,282 @@
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count
+
+from .models import Notification, Emergencyreport, Issuereport
+
+# ==========================================
+#  REAL-TIME PUSH (SERVER-SENT EVENTS)
+# ==========================================
+# Pages used to poll resident/notifications/ on mount and authority/dashboard-stats/
+# every 30 seconds. The ASGI app now serves an SSE stream (NotificationStreamView) fed by:
+#   - broker: an in-process pub/sub. Signal handlers and the notification
+#     materializers publish to it after commit.
+#   - poller: a fallback for multi-process deployments (several ASGI workers, or
+#     notifications materialized by a separate run_tasks process). One DatabasePoller
+#     per process polls, while anyone is subscribed, for new SOS rows, new notifications
+#     of the connected users and counter changes of the connected communities, and
+#     publishes them to the broker like any other producer.
+#
+# Channels:
+#   user:<userid>           -> 'notification' events for that user
+#   authority:<communityid> -> 'counters' (per community) and 'sos' events for the
+#                              authority dashboards of that community; SOS seen by both
+#                              the broker and the poll are de-duplicated per stream
+DEFAULTS = {
+    # 'inprocess' when everything runs in one process (RUN_EAGERLY tasks, one ASGI
+    # worker); 'polling' adds the database poller on top of the in-process broker.
+    'BACKEND': 'polling',
+    'POLL_INTERVAL': 2.0,
+    'HEARTBEAT': 15.0,
+    'QUEUE_SIZE': 100,
+}
+
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'REALTIME', {}))
+    return config
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def authority_channel(community_id):
+    return f'authority:{community_id}'
+
+
+class InProcessBroker:
+    """Thread-safe fan-out from sync code (signals, workers) to asyncio subscribers."""
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def has_subscribers(self, channel=None):
+        if channel is None:
+            return bool(self._subscribers)
+        return bool(self._subscribers.get(channel))
+
+    def channel_ids(self, prefix):
+        """The ids of subscribed '<prefix>:<id>' channels."""
+        with self._lock:
+            channels = list(self._subscribers)
+        return [int(channel.split(':', 1)[1]) for channel in channels if channel.startswith(prefix + ':')]
+
+    def subscribe(self, channels):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=get_config()['QUEUE_SIZE'])
+        subscriber = (loop, queue)
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber, channels):
+        with self._lock:
+            for channel in channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def publish(self, channel, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._offer, queue, (event, data))
+
+    @staticmethod
+    def _offer(queue, item):
+        # A client that stops reading must not grow memory; it just misses events.
+        if not queue.full():
+            queue.put_nowait(item)
+
+
+broker = InProcessBroker()
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+def notification_payload(notification):
+    return {
+        'notificationid': notification.notificationid,
+        'message': notification.message,
+        'type': notification.type,
+        'link': notification.link,
+        'isread': notification.isread,
+        'createdat': notification.createdat,
+    }
+
+
+def community_counters(community_ids):
+    """{communityid: {'sos_pending': n, 'issues_pending': n}} with two grouped queries."""
+    sos = dict(
+        Emergencyreport.objects.filter(communityid__in=community_ids, status='Pending')
+        .values_list('communityid').annotate(count=Count('pk')).order_by()
+    )
+    issues = dict(
+        Issuereport.objects.filter(communityid__in=community_ids).exclude(status='Resolved')
+        .values_list('communityid').annotate(count=Count('pk')).order_by()
+    )
+    return {
+        community_id: {'sos_pending': sos.get(community_id, 0), 'issues_pending': issues.get(community_id, 0)}
+        for community_id in community_ids
+    }
+
+
+def total_counters(counters):
+    return {
+        'sos_pending': sum(c['sos_pending'] for c in counters.values()),
+        'issues_pending': sum(c['issues_pending'] for c in counters.values()),
+    }
+
+
+# --- Publishing helpers (called from sync code, after commit) ---
+
+def publish_notifications(notifications):
+    if get_config()['BACKEND'] == 'polling':
+        # The poller publishes them from the table: MySQL's bulk_create returns no ids,
+        # so copies published here could not be de-duplicated.
+        return
+    for notification in notifications:
+        channel = user_channel(notification.userid_id)
+        if broker.has_subscribers(channel):
+            broker.publish(channel, 'notification', notification_payload(notification))
+
+
+def publish_authority_counters(community_id):
+    channel = authority_channel(community_id)
+    if community_id is not None and broker.has_subscribers(channel):
+        broker.publish(channel, 'counters', {'communityid': community_id, **community_counters([community_id])[community_id]})
+
+
+def sos_payload(sos):
+    return {
+        'sosid': sos.sosid, 'emergencytype': sos.emergencytype, 'location': sos.location,
+        'description': sos.description, 'status': sos.status, 'timestamp': sos.timestamp,
+        'communityid': sos.communityid_id,
+    }
+
+
+def publish_sos(sos):
+    channel = authority_channel(sos.communityid_id)
+    if broker.has_subscribers(channel):
+        broker.publish(channel, 'sos', sos_payload(sos))
+
+
+# --- Database polling fallback ---
+
+class DatabasePoller:
+    """
+    One per process. Runs on the event loop of the streams while any are connected and
+    does one round of queries per POLL_INTERVAL, however many streams there are.
+    """
+    def __init__(self):
+        self._task = None
+        self.reset()
+
+    def reset(self):
+        self.last_notification_id = None
+        self.last_sos_id = None
+        self.last_counters = {}
+
+    def ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        try:
+            while broker.has_subscribers():
+                await sync_to_async(self.poll)()
+                await asyncio.sleep(get_config()['POLL_INTERVAL'])
+        finally:
+            self.reset()  # the next stream starts from the rows current then
+
+    def poll(self):
+        """Publishes what changed since the last poll; the first poll sets the starting point."""
+        # New SOS go out first, including ones created by other processes.
+        if self.last_sos_id is None:
+            self.last_sos_id = Emergencyreport.objects.order_by('-sosid').values_list('sosid', flat=True).first() or 0
+        else:
+            for sos in Emergencyreport.objects.filter(sosid__gt=self.last_sos_id).order_by('sosid')[:50]:
+                self.last_sos_id = sos.sosid
+                publish_sos(sos)
+
+        user_ids = broker.channel_ids('user')
+        if self.last_notification_id is None:
+            self.last_notification_id = Notification.objects.order_by('-notificationid').values_list('notificationid', flat=True).first() or 0
+        elif user_ids:
+            new = Notification.objects.filter(notificationid__gt=self.last_notification_id, userid__in=user_ids).order_by('notificationid')[:200]
+            for notification in new:
+                self.last_notification_id = notification.notificationid
+                broker.publish(user_channel(notification.userid_id), 'notification', notification_payload(notification))
+
+        community_ids = broker.channel_ids('authority')
+        if community_ids:
+            for community_id, counters in community_counters(community_ids).items():
+                if counters != self.last_counters.get(community_id):
+                    self.last_counters[community_id] = counters
+                    broker.publish(authority_channel(community_id), 'counters', {'communityid': community_id, **counters})
+
+
+poller = DatabasePoller()
+
+
+async def event_stream(user_id, community_ids=None):
+    """
+    Async generator of SSE frames for one connected client. `community_ids` is given
+    for authorities: the communities whose SOS alerts and counters they receive.
+    """
+    config = get_config()
+    channels = [user_channel(user_id)] if user_id else []
+    channels += [authority_channel(community_id) for community_id in community_ids or ()]
+    subscriber = broker.subscribe(channels)
+    queue = subscriber[1]
+    if config['BACKEND'] == 'polling':
+        poller.ensure_running()
+    sent_sos = set()
+    counters = totals = None
+    try:
+        yield "retry: 5000\n\n"
+        if community_ids:
+            counters = await sync_to_async(community_counters)(community_ids)
+            totals = total_counters(counters)
+            yield format_sse('counters', totals)
+        loop = asyncio.get_running_loop()
+        last_frame = loop.time()
+        while True:
+            try:
+                timeout = last_frame + config['HEARTBEAT'] - loop.time()
+                event, data = await asyncio.wait_for(queue.get(), timeout=max(timeout, 0.01))
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                last_frame = loop.time()
+                continue
+            if event == 'sos':
+                # The broker and the poll can both deliver an SOS.
+                if data['sosid'] in sent_sos:
+                    continue
+                sent_sos.add(data['sosid'])
+                if len(sent_sos) > 500:
+                    sent_sos = set(sorted(sent_sos)[-250:])
+            elif event == 'counters':
+                # Per community on the channels; clients get the total of their communities.
+                counters[data['communityid']] = {key: value for key, value in data.items() if key != 'communityid'}
+                if total_counters(counters) == totals:
+                    continue
+                data = totals = total_counters(counters)
+            yield format_sse(event, data)
+            last_frame = loop.time()
+    finally:
+        broker.unsubscribe(subscriber, channels)
@@ -0,0 +1,269 @@
+import datetime
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import Case, Count, F, Q, Sum, When, DecimalField, DurationField, ExpressionWrapper
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Dailyrollup, Issuereport, Emergencyreport, Booking, Review
+
+# ==========================================
+#  DAILY ROLLUPS
+# ==========================================
+# Dailyrollup holds one number per (day, community, metric, dimension, dimension value),
+# so dashboards sum a few hundred small rows instead of scanning Issuereport/Review.
+#
+# Rows are keyed by the day the source row was *created* (a cohort): resolving an issue
+# later moves it from pending to resolved on its creation day. Metrics:
+#
+#   issues_created        type / priority / area
+#   issues_resolved       type / priority
+#   resolution_seconds    type     (resolvedat - createdat, resolved issues only)
+#   resolution_count      type
+#   sos                   emergencytype
+#   bookings              status
+#   earnings              -        (price of completed bookings)
+#   rating_sum            -
+#   rating_count          -
+#
+# Writes keep the table current from model signals (snapshot before save, apply the
+# difference after). The same grouped queries that `manage.py rebuild_daily_rollups`
+# uses to backfill are used to compute the current day live (see base/analytics.py).
+
+ISSUE_METRICS = ('issues_created', 'issues_resolved', 'resolution_seconds', 'resolution_count')
+SOS_METRICS = ('sos',)
+BOOKING_METRICS = ('bookings', 'earnings')
+REVIEW_METRICS = ('rating_sum', 'rating_count')
+
+RESOLUTION_TIME = ExpressionWrapper(F('resolvedat') - F('createdat'), output_field=DurationField())
+
+
+def _day(value):
+    if settings.USE_TZ and timezone.is_aware(value):
+        return timezone.localdate(value)
+    return value.date()
+
+
+def _value(value):
+    return (value or '')[:255]
+
+
+# --- Per-instance contributions (incremental maintenance) ---
+
+def issue_contributions(issue):
+    day, community = _day(issue.createdat), issue.communityid_id
+    type_, priority = _value(issue.type), _value(issue.prioritylevel)
+    out = Counter({
+        (day, community, 'issues_created', 'type', type_): 1,
+        (day, community, 'issues_created', 'priority', priority): 1,
+        (day, community, 'issues_created', 'area', _value(issue.mapaddress)): 1,
+    })
+    if issue.status == 'Resolved':
+        out[(day, community, 'issues_resolved', 'type', type_)] += 1
+        out[(day, community, 'issues_resolved', 'priority', priority)] += 1
+        if issue.resolvedat:
+            out[(day, community, 'resolution_seconds', 'type', type_)] += Decimal((issue.resolvedat - issue.createdat).total_seconds()).quantize(Decimal('0.01'))
+            out[(day, community, 'resolution_count', 'type', type_)] += 1
+    return out
+
+
+def sos_contributions(sos):
+    return Counter({(_day(sos.timestamp), sos.communityid_id, 'sos', 'emergencytype', _value(sos.emergencytype)): 1})
+
+
+def booking_contributions(booking):
+    day, community = _day(booking.createdat), booking.communityid_id
+    out = Counter({(day, community, 'bookings', 'status', _value(booking.status)): 1})
+    if (booking.status or '').lower() == 'completed' and booking.price:
+        out[(day, community, 'earnings', '', '')] += booking.price
+    return out
+
+
+def review_contributions(review):
+    if review.rating is None:
+        return Counter()
+    community = Booking.objects.filter(pk=review.bookingid_id).values_list('communityid', flat=True).first()
+    if community is None:
+        return Counter()
+    day = _day(review.createdat)
+    return Counter({
+        (day, community, 'rating_sum', '', ''): review.rating,
+        (day, community, 'rating_count', '', ''): 1,
+    })
+
+
+CONTRIBUTIONS = {
+    Issuereport: issue_contributions,
+    Emergencyreport: sos_contributions,
+    Booking: booking_contributions,
+    Review: review_contributions,
+}
+
+
+def contributions_for(instance):
+    return CONTRIBUTIONS[type(instance)](instance)
+
+
+def snapshot(instance):
+    """pre_save: remember what the stored row contributed before it is overwritten."""
+    if instance.pk is None:
+        instance._rollup_before = Counter()
+        return
+    old = type(instance).objects.filter(pk=instance.pk).first()
+    instance._rollup_before = contributions_for(old) if old else Counter()
+
+
+def record_save(instance):
+    """post_save: apply new contributions minus the snapshot taken in pre_save."""
+    deltas = Counter(contributions_for(instance))
+    deltas.subtract(getattr(instance, '_rollup_before', Counter()))
+    instance._rollup_before = Counter()
+    apply_deltas(deltas)
+
+
+def record_delete(instance):
+    deltas = Counter()
+    deltas.subtract(contributions_for(instance))
+    apply_deltas(deltas)
+
+
+def _key_q(key):
+    day, community, metric, dimension, dimension_value = key
+    return Q(day=day, communityid=community, metric=metric, dimension=dimension, dimensionvalue=dimension_value)
+
+
+def apply_deltas(deltas):
+    """
+    Adds each delta to its rollup row: one UPDATE ... CASE for rows that exist, a bulk
+    insert for the rest. A concurrent insert of the same key makes the insert fail, in
+    which case the update is simply retried.
+    """
+    deltas = {key: amount for key, amount in deltas.items() if amount}
+    if not deltas:
+        return
+    for _ in range(3):
+        keys = list(deltas)
+        match = Q()
+        for key in keys:
+            match |= _key_q(key)
+        increment = Case(*[When(_key_q(key), then=deltas[key]) for key in keys],
+                         default=0, output_field=DecimalField(max_digits=20, decimal_places=2))
+        updated = Dailyrollup.objects.filter(match).update(value=F('value') + increment)
+        if updated == len(keys):
+            return
+        existing = set(Dailyrollup.objects.filter(match).values_list('day', 'communityid', 'metric', 'dimension', 'dimensionvalue'))
+        missing = {key: amount for key, amount in deltas.items() if key not in existing}
+        # Rows that were just updated must not be incremented twice on retry.
+        deltas = missing
+        try:
+            with transaction.atomic():
+                Dailyrollup.objects.bulk_create([_row(key, amount) for key, amount in missing.items()])
+            return
+        except IntegrityError:
+            continue
+    raise IntegrityError("Could not apply rollup deltas after repeated conflicts")
+
+
+def _row(key, amount):
+    day, community, metric, dimension, dimension_value = key
+    return Dailyrollup(day=day, communityid_id=community, metric=metric, dimension=dimension, dimensionvalue=dimension_value, value=amount)
+
+
+# --- Grouped computation (backfill and live "today") ---
+
+def _seconds(value):
+    if value is None:
+        return 0
+    if isinstance(value, datetime.timedelta):
+        value = value.total_seconds()
+    return Decimal(value).quantize(Decimal('0.01'))
+
+
+def compute_issue_rollups(issues, dimensions=('type', 'priority', 'area')):
+    fields = {'type': 'type', 'priority': 'prioritylevel', 'area': 'mapaddress'}
+    out = Counter()
+    issues = issues.annotate(day=TruncDate('createdat'))
+    resolved = Q(status='Resolved')
+    for dimension in dimensions:
+        aggregates = {'created': Count('issueid')}
+        if dimension != 'area':
+            aggregates['resolved'] = Count('issueid', filter=resolved)
+        if dimension == 'type':
+            aggregates['seconds'] = Sum(RESOLUTION_TIME, filter=resolved & Q(resolvedat__isnull=False))
+            aggregates['timed'] = Count('issueid', filter=resolved & Q(resolvedat__isnull=False))
+        rows = issues.values('day', 'communityid', fields[dimension]).annotate(**aggregates).order_by()
+        for row in rows:
+            base = (row['day'], row['communityid'])
+            value = _value(row[fields[dimension]])
+            out[base + ('issues_created', dimension, value)] += row['created']
+            if 'resolved' in row:
+                out[base + ('issues_resolved', dimension, value)] += row['resolved']
+            if 'seconds' in row:
+                out[base + ('resolution_seconds', dimension, value)] += _seconds(row['seconds'])
+                out[base + ('resolution_count', dimension, value)] += row['timed']
+    return out
+
+
+def compute_sos_rollups(sos_reports):
+    out = Counter()
+    rows = sos_reports.annotate(day=TruncDate('timestamp')).values('day', 'communityid', 'emergencytype').annotate(n=Count('sosid')).order_by()
+    for row in rows:
+        out[(row['day'], row['communityid'], 'sos', 'emergencytype', _value(row['emergencytype']))] += row['n']
+    return out
+
+
+def compute_booking_rollups(bookings):
+    out = Counter()
+    rows = bookings.annotate(day=TruncDate('createdat')).values('day', 'communityid', 'status').annotate(n=Count('bookingid'), total=Sum('price')).order_by()
+    for row in rows:
+        base = (row['day'], row['communityid'])
+        out[base + ('bookings', 'status', _value(row['status']))] += row['n']
+        if (row['status'] or '').lower() == 'completed' and row['total']:
+            out[base + ('earnings', '', '')] += row['total']
+    return out
+
+
+def compute_review_rollups(reviews):
+    out = Counter()
+    rows = (
+        reviews.filter(rating__isnull=False)
+        .annotate(day=TruncDate('createdat'), community=F('bookingid__communityid'))
+        .values('day', 'community').annotate(total=Sum('rating'), n=Count('rating')).order_by()
+    )
+    for row in rows:
+        base = (row['day'], row['community'])
+        out[base + ('rating_sum', '', '')] += row['total']
+        out[base + ('rating_count', '', '')] += row['n']
+    return out
+
+
+def compute_rollups(filters, metrics=None, issue_dimensions=('type', 'priority', 'area')):
+    """Grouped queries over the source rows inside `filters`; only the sources `metrics` need."""
+    def wanted(source_metrics):
+        return metrics is None or any(metric in metrics for metric in source_metrics)
+    computed = Counter()
+    if wanted(ISSUE_METRICS):
+        computed.update(compute_issue_rollups(filters.issues(), issue_dimensions))
+    if wanted(SOS_METRICS):
+        computed.update(compute_sos_rollups(filters.sos_reports()))
+    if wanted(BOOKING_METRICS):
+        computed.update(compute_booking_rollups(filters.bookings()))
+    if wanted(REVIEW_METRICS):
+        computed.update(compute_review_rollups(filters.reviews()))
+    return computed
+
+
+def rebuild_rollups(filters, batch_size=1000):
+    """
+    Recomputes every rollup row inside `filters` (an analytics.AnalyticsFilters) from
+    the source tables. Returns the number of rows written.
+    """
+    computed = compute_rollups(filters)
+    rows = [_row(key, amount) for key, amount in computed.items() if amount]
+    with transaction.atomic():
+        filters.rollup_rows().delete()
+        Dailyrollup.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
@@ -0,0 +1,234 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import Searchposting
+
+# ==========================================
+#  FULL-TEXT SEARCH
+# ==========================================
+# /api/search/?q=... returns ranked, community-scoped hits over DOCUMENTS instead of
+# clients downloading whole lists to filter them. Two backends:
+#
+#   'mysql'  -> MATCH ... AGAINST (natural language mode) on the FULLTEXT indexes created
+#               by migration 0017; MySQL keeps them up to date itself
+#   'python' -> an inverted index in SearchPosting (term, document, community, weight),
+#               tokenized and ranked (TF-IDF) here; used on SQLite and in tests
+#
+# BACKEND 'auto' picks by database vendor. The python index is kept in step by the
+# post_save/post_delete handlers in base/signals.py; rows written with bulk_create or
+# queryset.update() (e.g. generate_synthetic_data) need `manage.py rebuild_search_index`.
+#
+# Each document type returns at most MAX_RESULTS hits; types are merged by score.
+
+DEFAULTS = {
+    'BACKEND': 'auto',
+    'MAX_RESULTS': 500,
+    'MIN_TERM_LENGTH': 2,
+    'SNIPPET_LENGTH': 160,
+}
+
+STOPWORDS = frozenset(
+    'a an and are as at be by for from has in is it of on or that the this to was were with'.split()
+)
+TOKEN = re.compile(r'\w+')
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'SEARCH', {}))
+    return config
+
+
+def tokenize(text, config=None):
+    min_length = (config or get_config())['MIN_TERM_LENGTH']
+    return [
+        term[:50] for term in TOKEN.findall((text or '').lower())
+        if len(term) >= min_length and term not in STOPWORDS
+    ]
+
+
+# --- Documents ---
+
+class SearchDocument:
+    def __init__(self, name, label, fields, title, category, extra=(), published_only=False):
+        self.name = name
+        self.label = label
+        self.fields = fields  # {field: weight}
+        self.title = title
+        self.category = category
+        self.extra = extra
+        # Non-authorities only find rows with status='Published'.
+        self.published_only = published_only
+
+    @property
+    def model(self):
+        return apps.get_model(self.label)
+
+    @property
+    def values(self):
+        return ('pk', 'communityid', self.title, self.category, 'description', *self.extra)
+
+    def queryset(self, community_ids, is_authority):
+        queryset = self.model.objects.filter(communityid__in=community_ids)
+        if self.published_only and not is_authority:
+            queryset = queryset.filter(status='Published')
+        return queryset
+
+    def hit(self, row, score, config):
+        description = row['description'] or ''
+        snippet_length = config['SNIPPET_LENGTH']
+        hit = {
+            'type': self.name,
+            'id': row['pk'],
+            'title': row[self.title],
+            'category': row[self.category],
+            'snippet': description[:snippet_length] + ('…' if len(description) > snippet_length else ''),
+            'score': round(score, 4),
+            'communityid': row['communityid'],
+        }
+        hit.update((field, row[field]) for field in self.extra)
+        return hit
+
+
+DOCUMENTS = {
+    'issue': SearchDocument('issue', 'base.Issuereport', {'title': 3, 'type': 2, 'mapaddress': 1, 'description': 1},
+                            title='title', category='type', extra=('status', 'createdat')),
+    'event': SearchDocument('event', 'base.Event', {'title': 3, 'category': 2, 'location': 1, 'description': 1},
+                            title='title', category='category', extra=('status', 'date', 'location'), published_only=True),
+    'service': SearchDocument('service', 'base.Service', {'servicename': 3, 'category': 2, 'description': 1},
+                              title='servicename', category='category', extra=('price', 'availability')),
+}
+DOCUMENTS_BY_LABEL = {document.label: document for document in DOCUMENTS.values()}
+
+
+# --- Backends ---
+
+class PythonBackend:
+    name = 'python'
+
+    def postings(self, document, instance, config):
+        weights = Counter()
+        for field, weight in document.fields.items():
+            for term in tokenize(getattr(instance, field), config):
+                weights[term] += weight
+        return [
+            Searchposting(term=term, doctype=document.name, objectid=instance.pk,
+                          communityid=instance.communityid_id, weight=weight)
+            for term, weight in weights.items()
+        ]
+
+    def index(self, document, instance, created=False):
+        with transaction.atomic():
+            if not created:
+                self.remove(document, instance.pk)
+            Searchposting.objects.bulk_create(self.postings(document, instance, get_config()))
+
+    def remove(self, document, pk):
+        Searchposting.objects.filter(doctype=document.name, objectid=pk).delete()
+
+    def rebuild(self, document, batch_size=1000):
+        config = get_config()
+        count = 0
+        with transaction.atomic():
+            Searchposting.objects.filter(doctype=document.name).delete()
+            batch = []
+            for instance in document.model.objects.only('pk', 'communityid', *document.fields).iterator(chunk_size=batch_size):
+                batch.extend(self.postings(document, instance, config))
+                count += 1
+                if len(batch) >= batch_size:
+                    Searchposting.objects.bulk_create(batch)
+                    batch = []
+            Searchposting.objects.bulk_create(batch)
+        return count
+
+    def rank(self, document, terms, community_ids, limit):
+        rows = list(
+            Searchposting.objects
+            .filter(doctype=document.name, term__in=terms, communityid__in=community_ids)
+            .values_list('term', 'objectid', 'weight')
+        )
+        document_frequency = Counter(term for term, _, _ in rows)
+        matched = {objectid for _, objectid, _ in rows}
+        scores = defaultdict(float)
+        terms_found = Counter()
+        for term, objectid, weight in rows:
+            idf = math.log(1 + len(matched) / document_frequency[term])
+            scores[objectid] += (1 + math.log(weight)) * idf
+            terms_found[objectid] += 1
+        # Documents containing more of the query terms rank higher.
+        ranked = [(objectid, score * terms_found[objectid] / len(terms)) for objectid, score in scores.items()]
+        ranked.sort(key=lambda item: (-item[1], -item[0]))
+        return ranked[:limit]
+
+    def search(self, document, query, queryset, community_ids, config):
+        terms = list(dict.fromkeys(tokenize(query, config)))
+        ranked = self.rank(document, terms, community_ids, config['MAX_RESULTS'])
+        rows = {row['pk']: row for row in queryset.filter(pk__in=[pk for pk, _ in ranked]).values(*document.values)}
+        return [(rows[pk], score) for pk, score in ranked if pk in rows]
+
+
+class MysqlBackend:
+    name = 'mysql'
+
+    def index(self, document, instance, created=False):
+        pass  # FULLTEXT indexes are maintained by MySQL
+
+    def remove(self, document, pk):
+        pass
+
+    def rebuild(self, document, batch_size=1000):
+        return 0
+
+    def search(self, document, query, queryset, community_ids, config):
+        model = document.model
+        columns = ', '.join(connection.ops.quote_name(model._meta.get_field(field).column) for field in document.fields)
+        match = RawSQL(f'MATCH ({columns}) AGAINST (%s IN NATURAL LANGUAGE MODE)', [query], output_field=FloatField())
+        rows = (
+            queryset.annotate(search_score=match).filter(search_score__gt=0)
+            .order_by('-search_score', '-pk').values(*document.values, 'search_score')[:config['MAX_RESULTS']]
+        )
+        return [(row, row['search_score']) for row in rows]
+
+
+BACKENDS = {'python': PythonBackend(), 'mysql': MysqlBackend()}
+
+
+def get_backend(config=None):
+    name = (config or get_config())['BACKEND']
+    if name == 'auto':
+        name = 'mysql' if connection.vendor == 'mysql' else 'python'
+    return BACKENDS[name]
+
+
+# --- Entry points ---
+
+def index_instance(instance, created=False):
+    document = DOCUMENTS_BY_LABEL[instance._meta.label]
+    get_backend().index(document, instance, created=created)
+
+
+def remove_instance(instance):
+    document = DOCUMENTS_BY_LABEL[instance._meta.label]
+    get_backend().remove(document, instance.pk)
+
+
+def search(query, community_ids, is_authority=False, types=None):
+    """Ranked hits (dicts) for `query` across `types` (default: all DOCUMENTS)."""
+    config = get_config()
+    if not tokenize(query, config) or not community_ids:
+        return []
+    backend = get_backend(config)
+    hits = []
+    for name in types or DOCUMENTS:
+        document = DOCUMENTS[name]
+        queryset = document.queryset(community_ids, is_authority)
+        hits.extend(document.hit(row, score, config) for row, score in backend.search(document, query, queryset, community_ids, config))
+    hits.sort(key=lambda hit: (-hit['score'], hit['type'], -hit['id']))
+    return hits
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from django.db.models import Avg
+from .media_serving import served_url
 from .models import (
     User, Resident, UserEmail, UserPhonenumber,
     Emergencyreport, Issuereport, Event, Service, Booking,  
@@ -7,6 +7,20 @@ from .models import (
     Review, Authority, Notification, Serviceprovider, Payment, Review
 )
 
+class MediaURLField(serializers.ReadOnlyField):
+    # Stored media URLs are sent as signed /api/media/ URLs (base/media_serving.py).
+    def to_representation(self, value):
+        return served_url(value)
+
+class ImageVariantField(MediaURLField):
+    # Photo derivatives are written by the uploads.derivatives task (base/uploads.py);
+    # until then, or without Pillow, the original is served.
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        super().__init__(source='*', **kwargs)
+    def to_representation(self, obj):
+        return super().to_representation(getattr(obj, f'photo{self.variant}') or obj.photo)
+
 class CommunitySerializer(serializers.ModelSerializer):
     class Meta:
         model = Community
@@ -86,25 +100,31 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return instance
 
 class EmergencyReportSerializer(serializers.ModelSerializer):
+    photo = ImageVariantField('web')
+    photo_thumb = ImageVariantField('thumb')
     class Meta:
         model = Emergencyreport
-        fields = ['sosid', 'emergencytype', 'description', 'location', 'photo', 'status', 'timestamp']
-        read_only_fields = ['status', 'timestamp', 'photo']
+        fields = ['sosid', 'emergencytype', 'description', 'location', 'photo', 'photo_thumb', 'status', 'timestamp']
+        read_only_fields = ['status', 'timestamp']
 
 class IssueReportSerializer(serializers.ModelSerializer):
     status = serializers.CharField(read_only=True)
     createdat = serializers.DateTimeField(read_only=True)
+    photo = ImageVariantField('web')
+    photo_thumb = ImageVariantField('thumb')
     class Meta:
         model = Issuereport
-        fields = ['issueid', 'title', 'type', 'description', 'mapaddress', 'prioritylevel', 'status', 'createdat']
+        fields = ['issueid', 'title', 'type', 'description', 'mapaddress', 'prioritylevel', 'status', 'createdat', 'photo', 'photo_thumb']
 
 # --- Find EventSerializer and REPLACE it with this: ---
 class EventSerializer(serializers.ModelSerializer):
     posted_by_name = serializers.SerializerMethodField()
+    photo = ImageVariantField('web')
+    photo_thumb = ImageVariantField('thumb')
     class Meta:
         model = Event
         # Added communityid, status, createdat so frontend can filter/sort
-        fields = ['eventid', 'communityid', 'title', 'description', 'date', 'time', 'location', 'category', 'status', 'createdat', 'posted_by_name']
+        fields = ['eventid', 'communityid', 'title', 'description', 'date', 'time', 'location', 'category', 'status', 'createdat', 'posted_by_name', 'photo', 'photo_thumb']
     
     def get_posted_by_name(self, obj):
         if obj.postedbyid: return f"{obj.postedbyid.firstname} {obj.postedbyid.lastname}"
@@ -112,9 +132,11 @@ class EventSerializer(serializers.ModelSerializer):
 
 class ServiceSerializer(serializers.ModelSerializer):
     provider_name = serializers.SerializerMethodField()
+    provider_rating = serializers.FloatField(source='providerid.average_rating', read_only=True)
+    provider_review_count = serializers.IntegerField(source='providerid.rating_count', read_only=True)
     class Meta:
         model = Service
-        fields = ['serviceid', 'servicename', 'category', 'price', 'description', 'provider_name', 'availability']
+        fields = ['serviceid', 'servicename', 'category', 'price', 'description', 'provider_name', 'provider_rating', 'provider_review_count', 'availability']
     def get_provider_name(self, obj):
         if obj.providerid and obj.providerid.userid: return f"{obj.providerid.userid.firstname} {obj.providerid.userid.lastname}"
         return "Unknown Provider"
@@ -143,52 +165,63 @@ class AuthorityIssueSerializer(serializers.ModelSerializer):
     downvotes = serializers.IntegerField(read_only=True)
     assignedTo = serializers.SerializerMethodField()
     resident_name = serializers.SerializerMethodField()
+    photo = ImageVariantField('web')
+    photo_thumb = ImageVariantField('thumb')
     class Meta:
         model = Issuereport
-        fields = ['issueid', 'title', 'type', 'description', 'mapaddress', 'prioritylevel', 'status', 'createdat', 'vote_count', 'upvotes', 'downvotes', 'assignedTo', 'resident_name']
+        fields = ['issueid', 'title', 'type', 'description', 'mapaddress', 'prioritylevel', 'status', 'createdat', 'vote_count', 'upvotes', 'downvotes', 'assignedTo', 'resident_name', 'photo', 'photo_thumb']
     def get_resident_name(self, obj):
         if obj.residentid and obj.residentid.userid: return f"{obj.residentid.userid.firstname} {obj.residentid.userid.lastname}"
         return "Unknown"
     def get_assignedTo(self, obj):
+        # List views annotate the latest assignment's department (see annotate_issue_assignment).
+        if hasattr(obj, 'assigned_department'): return obj.assigned_department or "Unassigned"
         assignment = Issueassignment.objects.filter(issueid=obj).last()
         if assignment and assignment.authorityid: return assignment.authorityid.departmentname
         return "Unassigned"
 
 class AuthorityEventSerializer(serializers.ModelSerializer):
     posted_by_name = serializers.SerializerMethodField()
+    photo = ImageVariantField('web')
+    photo_thumb = ImageVariantField('thumb')
     class Meta:
         model = Event
-        fields = ['eventid', 'title', 'description', 'date', 'time', 'location', 'category', 'status', 'posted_by_name']
+        fields = ['eventid', 'title', 'description', 'date', 'time', 'location', 'category', 'status', 'posted_by_name', 'photo', 'photo_thumb']
     def get_posted_by_name(self, obj):
         if obj.postedbyid: return f"{obj.postedbyid.firstname} {obj.postedbyid.lastname}"
         return "System"
 
 class AuthoritySOSSerializer(serializers.ModelSerializer):
+    # `photo` is the web-sized derivative and `photo_thumb` the list preview; the original
+    # upload stays on the row as evidence but is not sent in the feed.
+    photo = ImageVariantField('web')
+    photo_thumb = ImageVariantField('thumb')
     class Meta:
         model = Emergencyreport
-        fields = '__all__'
+        exclude = ['photothumb', 'photoweb']
 
 class CommunityIssueSerializer(serializers.ModelSerializer):
+    # upvotes/downvotes are annotated and user_votes ({issueid: votetype}) is passed in
+    # context by CommunityIssueListView, so listing issues runs a constant number of queries.
     resident_name = serializers.SerializerMethodField()
-    upvotes = serializers.SerializerMethodField()
-    downvotes = serializers.SerializerMethodField()
+    upvotes = serializers.IntegerField(read_only=True)
+    downvotes = serializers.IntegerField(read_only=True)
     user_vote = serializers.SerializerMethodField()
+    photo = ImageVariantField('web')
+    photo_thumb = ImageVariantField('thumb')
     class Meta:
         model = Issuereport
-        fields = ['issueid', 'title', 'type', 'description', 'mapaddress', 'status', 'createdat', 'resident_name', 'upvotes', 'downvotes', 'user_vote']
+        fields = ['issueid', 'title', 'type', 'description', 'mapaddress', 'status', 'createdat', 'resident_name', 'upvotes', 'downvotes', 'user_vote', 'photo', 'photo_thumb']
     def get_resident_name(self, obj):
         if obj.residentid and obj.residentid.userid: return f"{obj.residentid.userid.firstname} {obj.residentid.userid.lastname}"
         return "Unknown"
-    def get_upvotes(self, obj): return Issuevote.objects.filter(issueid=obj, votetype='up').count()
-    def get_downvotes(self, obj): return Issuevote.objects.filter(issueid=obj, votetype='down').count()
     def get_user_vote(self, obj):
-        user = self.context.get('request').user
-        try:
-            user_email = UserEmail.objects.get(email=user.email)
-            resident = Resident.objects.get(userid=user_email.userid)
-            vote = Issuevote.objects.filter(issueid=obj, residentid=resident).first()
-            return vote.votetype if vote else None
-        except: return None
+        user_votes = self.context.get('user_votes')
+        if user_votes is not None: return user_votes.get(obj.issueid)
+        resident = getattr(self.context.get('request'), 'resident', None)
+        if not resident: return None
+        vote = Issuevote.objects.filter(issueid=obj, residentid=resident).first()
+        return vote.votetype if vote else None
 
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -254,6 +287,8 @@ class ProviderProfileSerializer(serializers.ModelSerializer):
     # --- Computed Rating ---
     rating = serializers.SerializerMethodField()
 
+    certificationfile = MediaURLField()
+
     class Meta:
         model = Serviceprovider
         fields = [
@@ -270,12 +305,13 @@ class ProviderProfileSerializer(serializers.ModelSerializer):
             return ""
 
     def get_rating(self, obj):
-        avg = Review.objects.filter(providerid=obj).aggregate(Avg('rating'))['rating__avg']
-        return round(avg, 1) if avg else 0
+        return obj.average_rating
 
 class ProviderReviewSerializer(serializers.ModelSerializer):
     client_name = serializers.SerializerMethodField()
     service_name = serializers.SerializerMethodField()
+    # Review stores the text in 'comment'; the API has always called it 'description'.
+    description = serializers.CharField(source='comment', read_only=True)
     
     class Meta:
         model = Review
@@ -1,12 +1,24 @@
 import logging
-from django.db.models.signals import post_save, pre_save
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.db.models.signals import post_save, pre_save, post_delete, post_migrate
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
 
+from .analytics import AnalyticsFilters
+from .dashboard_cache import bump_versions
+from .identity_cache import identity_cache
+from .media_store import drop_references
+from .notifications import enqueue_event_published, emit
+from .realtime import publish_sos, publish_authority_counters
+from . import rollups, search
+from .sos import side_effects_deferred
 from .models import (
     User, Community, Resident, Serviceprovider, Authority,
-    Notification, Issuereport, Booking, Event, 
-    Issuevote, Eventparticipation, Emergencyreport
+    Issuereport, Booking, Event, Service,
+    Issuevote, Eventparticipation, Emergencyreport, UserEmail, Review
 )
 
 AuthUser = get_user_model()
@@ -68,141 +80,259 @@ def handle_booking_status_change(sender, instance, **kwargs):
 #  3. NOTIFICATIONS (LINKS CORRECTED)
 # ==============================================================================
 
+# Handlers only write a compact Notificationoutbox row (ids already on the instance,
+# no FK reads); the worker renders and inserts the Notification (base/notifications.py).
+
 # --- A. ISSUES ---
 @receiver(post_save, sender=Issuereport)
 def notify_new_issue(sender, instance, created, **kwargs):
     if created:
         print(f"--- DEBUG: New Issue '{instance.title}' Created ---")
-        Notification.objects.create(
-            userid=instance.residentid.userid, 
-            communityid=instance.communityid,
-            message=f"Success: Your issue report '{instance.title}' has been submitted.",
-            type='issue',
-            link='/report-issue' # <--- FIXED
-        )
+        emit('issue_submitted', resident=instance.residentid_id, community=instance.communityid_id, title=instance.title)
 
 @receiver(post_save, sender=Issuereport)
 def notify_issue_resolved(sender, instance, created, **kwargs):
     if not created and instance.status == 'Resolved':
         print(f"--- DEBUG: Issue '{instance.title}' Resolved ---")
-        Notification.objects.create(
-            userid=instance.residentid.userid, 
-            communityid=instance.communityid,
-            message=f"Good news! Your issue '{instance.title}' has been resolved.",
-            type='issue',
-            link='/report-issue' # <--- FIXED
-        )
+        emit('issue_resolved', resident=instance.residentid_id, community=instance.communityid_id, title=instance.title)
 
 # --- B. EVENTS ---
 @receiver(post_save, sender=Event)
 def notify_event_changes(sender, instance, created, **kwargs):
     if not created and instance.status == 'Published':
         print(f"--- DEBUG: Event '{instance.title}' Approved ---")
-        # Notify Creator
-        Notification.objects.create(
-            userid=instance.postedbyid,
-            communityid=instance.communityid,
-            message=f"Congratulations! Your event '{instance.title}' has been approved and published.",
-            type='event',
-            link='/events' # <--- FIXED
-        )
-        # Notify Community
-        community_users = User.objects.filter(communityid=instance.communityid)
-        notifs = []
-        for user in community_users:
-            if user != instance.postedbyid: 
-                notifs.append(Notification(
-                    userid=user,
-                    communityid=instance.communityid,
-                    message=f"New Event: '{instance.title}' is happening on {instance.date}!",
-                    type='event',
-                    link='/events' # <--- FIXED
-                ))
-        if notifs:
-            Notification.objects.bulk_create(notifs)
-
-# --- C. BOOKINGS (THIS IS THE FIX YOU ASKED FOR) ---
+        # Creator + community fan-out runs on the background worker (base/notifications.py).
+        # The task is keyed by event id, so saving a Published event again is a no-op.
+        enqueue_event_published(instance)
+
+# --- C. BOOKINGS ---
 @receiver(post_save, sender=Booking)
 def notify_new_booking(sender, instance, created, **kwargs):
     if created:
-        print(f"--- DEBUG: New Booking for '{instance.serviceid.servicename}' ---")
-        Notification.objects.create(
-            userid=instance.residentid.userid,
-            communityid=instance.communityid,
-            message=f"Booking Sent: Request for '{instance.serviceid.servicename}' submitted successfully.",
-            type='booking',
-            link='/book-service' # <--- FIXED (Was /resident/bookings)
-        )
+        print(f"--- DEBUG: New Booking #{instance.pk} ---")
+        emit('booking_created', resident=instance.residentid_id, community=instance.communityid_id, service=instance.serviceid_id)
 
 @receiver(post_save, sender=Booking)
 def notify_booking_update(sender, instance, created, **kwargs):
     if not created:
         if instance.status in ['Accepted', 'Rejected', 'Completed']:
             print(f"--- DEBUG: Booking Status Changed to {instance.status} ---")
-            
-            msg = ""
-            if instance.status == 'Accepted':
-                msg = f"Good news! Your booking for '{instance.serviceid.servicename}' has been ACCEPTED."
-            elif instance.status == 'Rejected':
-                msg = f"Update: Your booking for '{instance.serviceid.servicename}' was declined."
-            elif instance.status == 'Completed':
-                msg = f"Service '{instance.serviceid.servicename}' is marked as COMPLETED."
-
-            if msg:
-                Notification.objects.create(
-                    userid=instance.residentid.userid,
-                    communityid=instance.communityid,
-                    message=msg,
-                    type='booking',
-                    link='/book-service' # <--- FIXED (Was /resident/bookings)
-                )
+            emit('booking_updated', resident=instance.residentid_id, community=instance.communityid_id, service=instance.serviceid_id, status=instance.status)
 
 # --- D. EMERGENCY SOS ---
 @receiver(post_save, sender=Emergencyreport)
 def notify_sos_sent(sender, instance, created, **kwargs):
-    if created:
+    # Fast-lane SOS (base/sos.py) are notified by their follow-up task.
+    if created and not side_effects_deferred(instance):
         print(f"--- DEBUG: SOS Sent ---")
-        Notification.objects.create(
-            userid=instance.residentid.userid,
-            communityid=instance.communityid,
-            message="SOS ALERT SENT! Authorities have been notified of your location.",
-            type='sos',
-            link='/sos' # <--- FIXED
-        )
+        emit('sos_sent', resident=instance.residentid_id, community=instance.communityid_id)
 
 # --- E. PROFILE UPDATE ---
 @receiver(post_save, sender=User)
 def notify_profile_update(sender, instance, created, **kwargs):
     if not created:
         print(f"--- DEBUG: User Profile Updated for {instance.firstname} ---")
-        Notification.objects.create(
-            userid=instance,
-            communityid=instance.communityid,
-            message="Security Alert: Your profile information was updated.",
-            type='profile',
-            link='/profile' # <--- FIXED
-        )
+        emit('profile_updated', user=instance.pk, community=instance.communityid_id)
 
 # --- F. VOTING & PARTICIPATION ---
+# No 'community' here: these use the voter's own community, resolved by the worker.
 @receiver(post_save, sender=Issuevote)
 def notify_vote_cast(sender, instance, created, **kwargs):
     if created:
-        vote_action = "upvoted" if instance.votetype == 'up' else "downvoted"
-        Notification.objects.create(
-            userid=instance.residentid.userid,
-            communityid=instance.residentid.userid.communityid,
-            message=f"You {vote_action} the issue: '{instance.issueid.title}'.",
-            type='vote',
-            link='/community-voting' # <--- FIXED
-        )
+        emit('vote_cast', resident=instance.residentid_id, issue=instance.issueid_id, votetype=instance.votetype)
 
 @receiver(post_save, sender=Eventparticipation)
 def notify_event_join(sender, instance, created, **kwargs):
     if instance.interesttype == 'Going':
-        Notification.objects.create(
-            userid=instance.residentid.userid,
-            communityid=instance.residentid.userid.communityid,
-            message=f"You are going to event: '{instance.eventid.title}'",
-            type='event',
-            link='/events' # <--- FIXED
-        )
\ No newline at end of file
+        emit('event_join', resident=instance.residentid_id, event=instance.eventid_id)
+
+# ==============================================================================
+#  4. IDENTITY CACHE INVALIDATION
+# ==============================================================================
+def _invalidate_tokens(token_keys):
+    token_keys = list(token_keys)
+    identity_cache.invalidate(token_keys)
+    # Purge again once the write is visible, so a request that read the old rows
+    # while the transaction was open cannot leave a stale entry behind.
+    transaction.on_commit(lambda: identity_cache.invalidate(token_keys))
+
+def _tokens_for_app_user(app_user_id):
+    emails = UserEmail.objects.filter(userid_id=app_user_id).values_list('email', flat=True)
+    return Token.objects.filter(user__email__in=list(emails)).values_list('key', flat=True)
+
+@receiver(post_save, sender=AuthUser)
+@receiver(post_delete, sender=AuthUser)
+def invalidate_identity_for_auth_user(sender, instance, **kwargs):
+    _invalidate_tokens(Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
+
+@receiver(post_delete, sender=Token)
+def invalidate_identity_for_token(sender, instance, **kwargs):
+    _invalidate_tokens([instance.key])
+
+@receiver(post_save, sender=UserEmail)
+@receiver(post_delete, sender=UserEmail)
+def invalidate_identity_for_email(sender, instance, **kwargs):
+    _invalidate_tokens(Token.objects.filter(user__email=instance.email).values_list('key', flat=True))
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_identity_for_app_user(sender, instance, **kwargs):
+    _invalidate_tokens(_tokens_for_app_user(instance.pk))
+
+@receiver(post_save, sender=Resident)
+@receiver(post_delete, sender=Resident)
+@receiver(post_save, sender=Serviceprovider)
+@receiver(post_delete, sender=Serviceprovider)
+@receiver(post_save, sender=Authority)
+@receiver(post_delete, sender=Authority)
+def invalidate_identity_for_profile(sender, instance, **kwargs):
+    _invalidate_tokens(_tokens_for_app_user(instance.userid_id))
+
+
+# ==============================================================================
+#  5. REAL-TIME PUSH (base/realtime.py)
+# ==============================================================================
+@receiver(post_save, sender=Emergencyreport)
+def push_sos(sender, instance, created, **kwargs):
+    if side_effects_deferred(instance):
+        return  # ingest_sos publishes the alert itself; counters follow from the worker
+    if created:
+        transaction.on_commit(lambda: publish_sos(instance))
+    transaction.on_commit(lambda: publish_authority_counters(instance.communityid_id))
+
+@receiver(post_save, sender=Issuereport)
+def push_issue_counters(sender, instance, **kwargs):
+    transaction.on_commit(lambda: publish_authority_counters(instance.communityid_id))
+
+
+# ==============================================================================
+#  6. DAILY ROLLUPS (base/rollups.py)
+# ==============================================================================
+# pre_save remembers what the stored row contributed; post_save applies the difference.
+# QuerySet.update() bypasses these - run `manage.py rebuild_daily_rollups` after bulk edits.
+@receiver(pre_save, sender=Issuereport)
+@receiver(pre_save, sender=Emergencyreport)
+@receiver(pre_save, sender=Booking)
+@receiver(pre_save, sender=Review)
+def snapshot_rollup_contribution(sender, instance, **kwargs):
+    rollups.snapshot(instance)
+
+@receiver(post_save, sender=Issuereport)
+@receiver(post_save, sender=Emergencyreport)
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=Review)
+def update_rollups_on_save(sender, instance, **kwargs):
+    if side_effects_deferred(instance):
+        return  # applied by the fast-lane SOS follow-up task
+    rollups.record_save(instance)
+
+@receiver(post_delete, sender=Issuereport)
+@receiver(post_delete, sender=Emergencyreport)
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=Review)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    rollups.record_delete(instance)
+
+# Migration 0011 creates DailyRollup empty. It is filled here, after the whole plan has
+# run and the current models match the schema, rather than by a RunPython reading the
+# source tables through models that later migrations may change.
+ROLLUP_MIGRATION = ('base', '0011_dailyrollup')
+
+@receiver(post_migrate)
+def backfill_rollups_after_migrate(sender, plan=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    if sender.name != 'base' or not plan:
+        return
+    if not any((migration.app_label, migration.name) == ROLLUP_MIGRATION and not backwards for migration, backwards in plan):
+        return
+    executor = MigrationExecutor(connections[using])
+    if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+        # `migrate base 0011` stopped short of the current models; run
+        # `manage.py rebuild_daily_rollups` once the rest is applied.
+        logger.warning("Not backfilling DailyRollup: migrations are still pending")
+        return
+    rollups.rebuild_rollups(AnalyticsFilters())
+
+
+# ==============================================================================
+#  7. DASHBOARD CACHE VERSIONS (base/dashboard_cache.py)
+# ==============================================================================
+@receiver(post_save, sender=Issuereport)
+@receiver(post_delete, sender=Issuereport)
+def bump_dashboard_for_issue(sender, instance, **kwargs):
+    community_id = instance.communityid_id
+    transaction.on_commit(lambda: bump_versions([community_id]))
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_dashboard_for_review(sender, instance, **kwargs):
+    community_id = Booking.objects.filter(pk=instance.bookingid_id).values_list('communityid', flat=True).first()
+    transaction.on_commit(lambda: bump_versions([community_id]))
+
+
+# ==============================================================================
+#  8. PROVIDER RATING AGGREGATE (Serviceprovider.rating_sum / rating_count)
+# ==============================================================================
+def _adjust_rating(provider_id, rating_delta, count_delta):
+    if provider_id and (rating_delta or count_delta):
+        Serviceprovider.objects.filter(pk=provider_id).update(
+            rating_sum=F('rating_sum') + rating_delta, rating_count=F('rating_count') + count_delta
+        )
+        # Views read the rating from the identity-cached profile (request.provider).
+        emails = UserEmail.objects.filter(userid__serviceprovider=provider_id).values('email')
+        _invalidate_tokens(Token.objects.filter(user__email__in=emails).values_list('key', flat=True))
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = Review.objects.filter(pk=instance.pk).values_list('providerid', 'rating').first()
+    instance._previous_rating = previous
+
+@receiver(post_save, sender=Review)
+def update_provider_rating(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    instance._previous_rating = None
+    changes = {}
+    if previous and previous[1] is not None:
+        changes[previous[0]] = (-previous[1], -1)
+    if instance.rating is not None:
+        rating_delta, count_delta = changes.get(instance.providerid_id, (0, 0))
+        changes[instance.providerid_id] = (rating_delta + instance.rating, count_delta + 1)
+    for provider_id, (rating_delta, count_delta) in changes.items():
+        _adjust_rating(provider_id, rating_delta, count_delta)
+
+@receiver(post_delete, sender=Review)
+def remove_provider_rating(sender, instance, **kwargs):
+    if instance.rating is not None:
+        _adjust_rating(instance.providerid_id, -instance.rating, -1)
+
+# ==============================================================================
+#  9. MEDIA REFERENCES (base/media_store.py)
+# ==============================================================================
+# References are written by the code that stores a file (sync_references); deleting a
+# row releases its blobs for gc_media.
+@receiver(post_delete, sender=Emergencyreport)
+@receiver(post_delete, sender=Issuereport)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Serviceprovider)
+def release_media(sender, instance, **kwargs):
+    drop_references(instance)
+
+# ==============================================================================
+#  10. SEARCH INDEX (base/search.py)
+# ==============================================================================
+@receiver(post_save, sender=Issuereport)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Service)
+def index_for_search(sender, instance, created=False, update_fields=None, **kwargs):
+    document = search.DOCUMENTS_BY_LABEL[sender._meta.label]
+    # e.g. status-only saves do not change what the row is found by
+    if update_fields is not None and not set(update_fields) & {*document.fields, 'communityid'}:
+        return
+    search.index_instance(instance, created=created)
+
+@receiver(post_delete, sender=Issuereport)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Service)
+def remove_from_search(sender, instance, **kwargs):
+    search.remove_instance(instance)
@@ -0,0 +1,151 @@
+import datetime
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Case, When, Value, IntegerField
+
+from . import rollups
+from .models import Emergencyreport
+from .notifications import emit
+from .realtime import publish_sos, publish_authority_counters
+from .tasks import task, enqueue
+from .media_store import sync_references
+from .uploads import enqueue_derivatives
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+#  SOS FAST LANE
+# ==========================================
+# An SOS is acknowledged as soon as its row is committed. The request does two INSERTs
+# (the Emergencyreport and one Backgroundtask) and pushes the alert to connected
+# authority streams; everything else runs on the worker at TASK_PRIORITY, ahead of
+# every other task kind:
+#
+#   - the photo is only staged on local disk (a rename of the upload's temporary file);
+#     the task moves it into default_storage, fills in Emergencyreport.photo and queues
+#     its thumbnail/web derivatives (base/uploads.py) at the same priority
+#   - the daily rollup, the resident's "SOS sent" notification and the authority
+#     counters are applied by the same task
+#
+# Rows saved with `defer_side_effects = True` are skipped by the signal handlers that
+# would otherwise do that work inline (base/signals.py). The authority feed lists
+# Pending SOS first (pending_first), and the polling stream pushes new SOS rows before
+# anything else. `manage.py run_benchmarks --sos` measures POST -> authority feed
+# latency against LATENCY_SLO_MS.
+
+DEFAULTS = {
+    'TASK_PRIORITY': 100,
+    # Where photos wait for the worker; must be readable by the run_tasks process.
+    'STAGING_DIR': None,  # default: MEDIA_ROOT / 'sos_staging'
+    # p95 target for POST resident/sos/ -> visible in authority/sos/.
+    'LATENCY_SLO_MS': 250,
+    # Pending SOS listed at the top of the first authority/sos/ page.
+    'PENDING_LIMIT': 50,
+}
+
+FOLLOWUP_TASK = 'sos.followup'
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'SOS', {}))
+    return config
+
+
+def staging_dir(config):
+    return Path(config['STAGING_DIR'] or Path(settings.MEDIA_ROOT) / 'sos_staging')
+
+
+def side_effects_deferred(instance):
+    return getattr(instance, 'defer_side_effects', False)
+
+
+def pending_first(queryset):
+    """Pending SOS first, each group newest first."""
+    return queryset.annotate(
+        queue_rank=Case(When(status='Pending', then=Value(0)), default=Value(1), output_field=IntegerField())
+    ).order_by('queue_rank', '-timestamp', '-sosid')
+
+
+def stage_photo(upload, config):
+    """Puts the upload somewhere the worker can read it; returns (staged path, original name)."""
+    directory = staging_dir(config)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = os.path.basename(upload.name or 'photo')
+    path = directory / f"{uuid.uuid4().hex}{os.path.splitext(name)[1].lower()[:10]}"
+    temporary_path = getattr(upload, 'temporary_file_path', None)
+    if temporary_path:
+        # StreamingUploadHandler leaves every upload in a temporary file; a rename is all
+        # that is needed.
+        shutil.move(temporary_path(), path)
+    else:
+        with open(path, 'wb') as f:
+            for chunk in upload.chunks():
+                f.write(chunk)
+    return str(path), name
+
+
+def ingest_sos(resident_id, community_id, fields, photo=None):
+    """Commits the minimal Emergencyreport and queues its follow-up work."""
+    config = get_config()
+    staged = stage_photo(photo, config) if photo else (None, None)
+    with transaction.atomic():
+        sos = Emergencyreport(residentid_id=resident_id, communityid_id=community_id, status='Pending', **fields)
+        sos.defer_side_effects = True
+        sos.save()
+        sos.defer_side_effects = False
+        enqueue(FOLLOWUP_TASK, {
+            'sos': sos.pk,
+            'resident': resident_id,
+            'community': community_id,
+            'emergencytype': sos.emergencytype,
+            'timestamp': sos.timestamp.isoformat(),
+            'photo': staged[0],
+            'photo_name': staged[1],
+        }, priority=config['TASK_PRIORITY'])
+        transaction.on_commit(lambda: publish_sos(sos))
+    return sos
+
+
+@task(FOLLOWUP_TASK)
+def run_sos_followup(bg_task):
+    payload = bg_task.payload
+    # Each step records itself in the payload, so a retry does not repeat it.
+    if payload.get('photo') and not payload.get('photo_done'):
+        attach_photo(payload)
+        payload['photo_done'] = True
+        bg_task.save(update_fields=['payload', 'updatedat'])
+    if not payload.get('rollup_done'):
+        with transaction.atomic():
+            # Applied even if the SOS was deleted meanwhile: its delete already subtracted it.
+            sos = Emergencyreport(communityid_id=payload['community'], emergencytype=payload['emergencytype'],
+                                  timestamp=datetime.datetime.fromisoformat(payload['timestamp']))
+            rollups.apply_deltas(rollups.sos_contributions(sos))
+            emit('sos_sent', resident=payload['resident'], community=payload['community'])
+            payload['rollup_done'] = True
+            bg_task.save(update_fields=['payload', 'updatedat'])
+    publish_authority_counters(payload['community'])
+
+
+def attach_photo(payload):
+    staged = Path(payload['photo'])
+    if staged.exists():
+        with open(staged, 'rb') as f:
+            file_name = default_storage.save(f"sos_evidence/{payload['photo_name']}", File(f))
+        sos = Emergencyreport(pk=payload['sos'], photo=default_storage.url(file_name))
+        if Emergencyreport.objects.filter(pk=sos.pk).update(photo=sos.photo):
+            sync_references(sos)
+            enqueue_derivatives(sos, priority=get_config()['TASK_PRIORITY'])
+        else:
+            default_storage.delete(file_name)  # the SOS was deleted before its photo arrived
+        staged.unlink()
+    else:
+        logger.warning("Staged photo %s for SOS %s is missing", staged, payload['sos'])
@@ -0,0 +1,415 @@
+import datetime
+import itertools
+import random
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import (
+    Community, User, Resident, Serviceprovider, Authority, UserEmail, UserPhonenumber,
+    Service, Issuereport, Issuevote, Authoritycommunity, Event, Eventparticipation,
+    Issueassignment, Emergencyreport, Notification, Booking, Payment, Review,
+    Loginlog, Activitylog,
+)
+
+AuthUser = get_user_model()
+
+# ==========================================
+#  SYNTHETIC DATA
+# ==========================================
+# Fills every application table with realistic-looking rows at a chosen scale, for load
+# tests and benchmarks (`manage.py generate_synthetic_data`, `manage.py run_benchmarks`).
+#
+#   - rows are written with bulk_create in batches, so model signals do not fire; the
+#     derived tables (daily rollups, rating aggregates, unread counters) are rebuilt by
+#     the command afterwards
+#   - timestamps are spread over the last `days` days (auto_now_add is switched off
+#     while generating, see explicit_timestamps)
+#   - every app user gets an auth user with the same email and PASSWORD, so logins and
+#     token authentication work against the generated data
+#   - the same seed produces the same data (apart from database ids)
+
+PASSWORD = 'synthetic-pass'
+EMAIL_DOMAIN = 'synthetic.test'
+
+SCALES = {
+    'tiny': {
+        'communities': 2, 'users': 60, 'services': 10, 'issues': 80, 'votes': 150,
+        'events': 12, 'participations': 30, 'sos': 15, 'notifications': 300,
+        'bookings': 40, 'logs': 100,
+    },
+    'small': {
+        'communities': 5, 'users': 2_000, 'services': 200, 'issues': 5_000, 'votes': 5_000,
+        'events': 200, 'participations': 2_000, 'sos': 500, 'notifications': 10_000,
+        'bookings': 1_000, 'logs': 5_000,
+    },
+    'medium': {
+        'communities': 20, 'users': 20_000, 'services': 2_000, 'issues': 50_000, 'votes': 50_000,
+        'events': 1_000, 'participations': 20_000, 'sos': 5_000, 'notifications': 100_000,
+        'bookings': 10_000, 'logs': 50_000,
+    },
+    'large': {
+        'communities': 50, 'users': 200_000, 'services': 10_000, 'issues': 500_000, 'votes': 500_000,
+        'events': 5_000, 'participations': 100_000, 'sos': 20_000, 'notifications': 1_000_000,
+        'bookings': 100_000, 'logs': 200_000,
+    },
+}
+
+# Share of users per role; the rest are residents.
+PROVIDER_SHARE = 0.08
+AUTHORITY_SHARE = 0.02
+# Votes and participations pile onto a popular fifth of the issues/events.
+POPULAR_SHARE = 0.2
+
+AREAS = ['Road 1', 'Road 5', 'Block A', 'Block C', 'Main Street', 'Lake Road', 'Market Area',
+         'School Lane', 'Park View', 'North Avenue', 'Station Road', 'Hospital Road']
+ISSUE_TYPES = ['Road', 'Water', 'Electricity', 'Waste', 'Drainage', 'Security', 'Noise', 'Other']
+ISSUE_STATUSES = [('Pending', 45), ('In Progress', 20), ('Resolved', 35)]
+PRIORITIES = ['Low', 'Medium', 'High']
+EVENT_CATEGORIES = ['Community', 'Health', 'Education', 'Sports', 'Cleanup', 'Cultural']
+EVENT_STATUSES = [('Published', 70), ('Pending', 20), ('Rejected', 10)]
+SOS_TYPES = ['Fire', 'Medical', 'Crime', 'Flood', 'Accident']
+# The only statuses the app sets (Emergencyreport.status is 9 characters).
+SOS_STATUSES = [('Pending', 20), ('Resolved', 80)]
+SERVICE_CATEGORIES = {
+    'Home': ['Plumbing', 'Electrical Repair', 'Carpentry', 'Painting'],
+    'Cleaning': ['House Cleaning', 'Sofa Cleaning', 'Tank Cleaning'],
+    'Appliance': ['AC Servicing', 'Fridge Repair', 'Washing Machine Repair'],
+    'Health': ['Home Nurse', 'Physiotherapy'],
+}
+BOOKING_STATUSES = [('Pending', 15), ('Accepted', 15), ('Completed', 55), ('Cancelled', 10), ('Rejected', 5)]
+NOTIFICATION_TYPES = ['issue', 'event', 'booking', 'sos', 'vote', 'profile']
+FIRST_NAMES = ['Rahim', 'Karim', 'Ayesha', 'Fatema', 'Nusrat', 'Tanvir', 'Sabbir', 'Mim', 'Rafi', 'Sadia',
+               'Imran', 'Farhana', 'Arif', 'Jannat', 'Hasan', 'Tania']
+LAST_NAMES = ['Ahmed', 'Hossain', 'Islam', 'Rahman', 'Chowdhury', 'Khan', 'Akter', 'Sarker', 'Das', 'Roy']
+CITIES = [('Dhaka', 'Dhaka', ['Gulshan', 'Banani', 'Mirpur', 'Dhanmondi', 'Uttara']),
+          ('Chattogram', 'Chattogram', ['Panchlaish', 'Kotwali', 'Halishahar']),
+          ('Sylhet', 'Sylhet', ['Kotwali', 'Jalalabad'])]
+
+
+@contextmanager
+def explicit_timestamps(models):
+    """Lets generated rows carry historical auto_now/auto_now_add values."""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+class SyntheticDataGenerator:
+    def __init__(self, counts, seed=0, days=365, batch_size=2000, log=None):
+        self.counts = counts
+        self.rng = random.Random(seed)
+        self.days = days
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        # Keeps emails unique when generating into a database that already has data.
+        self.tag = f'{seed}-{self.rng.getrandbits(24):06x}'
+        self.written = {}
+
+    # --- helpers ---
+
+    def moment(self, after=None):
+        """A random timestamp in the generated window (or between `after` and now)."""
+        start = after or self.now - datetime.timedelta(days=self.days)
+        span = max((self.now - start).total_seconds(), 1)
+        return start + datetime.timedelta(seconds=self.rng.random() * span)
+
+    def insert(self, model, rows, ids=False):
+        """bulk_create `rows` (any iterable) in batches; with ids=True returns the new primary keys in insert order."""
+        before = (model.objects.aggregate(top=Max('pk'))['top'] or 0) if ids else None
+        rows = iter(rows)
+        total = 0
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            total += len(batch)
+        self.written[model._meta.label] = self.written.get(model._meta.label, 0) + total
+        self.log(f"{model._meta.label}: {total} row(s)")
+        if not ids:
+            return None
+        # Bulk inserts do not return ids on every backend (MySQL), so read them back.
+        return list(model.objects.filter(pk__gt=before).order_by('pk').values_list('pk', flat=True))
+
+    def popular_pairs(self, items, members_of, count):
+        """
+        Yields up to `count` unique (item index, member) pairs: item i gets members
+        members_of(i)[(7i + round) % len], so no member is paired with an item twice.
+        """
+        popular = max(1, int(len(items) * POPULAR_SHARE))
+        for k in range(count):
+            index = k % popular
+            members = members_of(index)
+            round_ = k // popular
+            if not members or round_ >= len(members):
+                continue
+            yield index, members[(index * 7 + round_) % len(members)]
+
+    # --- generation, in foreign-key order ---
+
+    def run(self):
+        with explicit_timestamps(apps.get_app_config('base').get_models()):
+            self.communities()
+            self.users()
+            self.profiles()
+            self.services()
+            self.issues()
+            self.votes()
+            self.events()
+            self.sos()
+            self.bookings()
+            self.notifications()
+            self.logs()
+        return self.written
+
+    def communities(self):
+        def rows():
+            for i in range(self.counts['communities']):
+                city, district, thanas = CITIES[i % len(CITIES)]
+                thana = thanas[i % len(thanas)]
+                yield Community(name=f'{thana} Block {i + 1}', city=city, district=district, thana=thana,
+                                postalcode=str(1000 + i), createdat=self.moment())
+        self.community_ids = self.insert(Community, rows(), ids=True)
+
+    def users(self):
+        n = self.counts['users']
+        n_providers = max(1, int(n * PROVIDER_SHARE))
+        n_authorities = max(1, int(n * AUTHORITY_SHARE))
+        self.user_roles = (['Authority'] * n_authorities + ['ServiceProvider'] * n_providers
+                           + ['Resident'] * max(1, n - n_providers - n_authorities))
+        self.user_community = [self.community_ids[i % len(self.community_ids)] for i in range(len(self.user_roles))]
+        created = [self.moment() for _ in self.user_roles]
+
+        def rows():
+            for i, (role, community) in enumerate(zip(self.user_roles, self.user_community)):
+                yield User(
+                    communityid_id=community, firstname=self.rng.choice(FIRST_NAMES), lastname=self.rng.choice(LAST_NAMES),
+                    password='', role=role, gender=self.rng.choice(['Male', 'Female']), status='Active',
+                    createdat=created[i], updatedat=created[i],
+                )
+        self.user_ids = self.insert(User, rows(), ids=True)
+
+        password = make_password(PASSWORD)  # hashed once; hashing per user would dominate the run
+        emails = [f'{role.lower()}{i}.{self.tag}@{EMAIL_DOMAIN}' for i, role in enumerate(self.user_roles)]
+        self.insert(AuthUser, (AuthUser(username=email, email=email, password=password, date_joined=created[i])
+                               for i, email in enumerate(emails)))
+        self.insert(UserEmail, (UserEmail(userid_id=user, email=email) for user, email in zip(self.user_ids, emails)))
+        self.insert(UserPhonenumber, (UserPhonenumber(userid_id=user, phonenumber=f'01{self.rng.randrange(10**9):09d}')
+                                      for user in self.user_ids if self.rng.random() < 0.6))
+
+    def profiles(self):
+        by_role = {'Resident': [], 'ServiceProvider': [], 'Authority': []}
+        for user, role, community in zip(self.user_ids, self.user_roles, self.user_community):
+            by_role[role].append((user, community))
+
+        resident_ids = self.insert(Resident, (
+            Resident(userid_id=user, street=self.rng.choice(AREAS), verification_status='Verified', registered_date=self.moment())
+            for user, _ in by_role['Resident']
+        ), ids=True)
+        provider_ids = self.insert(Serviceprovider, (
+            Serviceprovider(userid_id=user, service_area=self.rng.choice(AREAS), availability_status='Available',
+                            subrole=self.rng.choice(list(SERVICE_CATEGORIES)))
+            for user, _ in by_role['ServiceProvider']
+        ), ids=True)
+        authority_ids = self.insert(Authority, (
+            Authority(userid_id=user, departmentname=self.rng.choice(['Roads', 'Water', 'Power', 'Sanitation', 'Police']),
+                      designation='Officer', assignedarea=self.rng.choice(AREAS))
+            for user, _ in by_role['Authority']
+        ), ids=True)
+
+        self.residents = list(zip(resident_ids, [user for user, _ in by_role['Resident']], [c for _, c in by_role['Resident']]))
+        self.providers = list(zip(provider_ids, [c for _, c in by_role['ServiceProvider']]))
+        self.authorities = list(zip(authority_ids, [c for _, c in by_role['Authority']]))
+        self.residents_by_community = {}
+        for resident, _, community in self.residents:
+            self.residents_by_community.setdefault(community, []).append(resident)
+        self.authorities_by_community = {}
+        for authority, community in self.authorities:
+            self.authorities_by_community.setdefault(community, []).append(authority)
+
+        # Every authority covers its own community, some a neighbouring one too.
+        def mappings():
+            for authority, community in self.authorities:
+                yield Authoritycommunity(authorityid_id=authority, communityid_id=community)
+                other = self.rng.choice(self.community_ids)
+                if other != community and self.rng.random() < 0.3:
+                    yield Authoritycommunity(authorityid_id=authority, communityid_id=other)
+        self.insert(Authoritycommunity, mappings())
+
+    def services(self):
+        self.service_rows = []
+
+        def rows():
+            for _ in range(self.counts['services']):
+                provider, community = self.rng.choice(self.providers)
+                category = self.rng.choice(list(SERVICE_CATEGORIES))
+                price = Decimal(self.rng.randrange(300, 5000, 50))
+                self.service_rows.append((provider, community, price))
+                yield Service(providerid_id=provider, communityid_id=community, servicename=self.rng.choice(SERVICE_CATEGORIES[category]),
+                              category=category, price=price, availability=self.rng.random() < 0.9,
+                              description='Generated service', createdat=self.moment())
+        ids = self.insert(Service, rows(), ids=True)
+        self.services_list = [(service,) + row for service, row in zip(ids, self.service_rows)]
+
+    def _resident_in(self, community):
+        residents = self.residents_by_community.get(community)
+        if residents:
+            return self.rng.choice(residents)
+        return self.rng.choice(self.residents)[0]
+
+    def issues(self):
+        issue_rows = []
+
+        def rows():
+            for _ in range(self.counts['issues']):
+                community = self.rng.choice(self.community_ids)
+                created = self.moment()
+                status = _weighted(self.rng, ISSUE_STATUSES)
+                resolved = self.moment(after=created) if status == 'Resolved' else None
+                issue_rows.append((community, status, created))
+                yield Issuereport(
+                    residentid_id=self._resident_in(community), communityid_id=community,
+                    title=f'{self.rng.choice(ISSUE_TYPES)} problem near {self.rng.choice(AREAS)}',
+                    type=self.rng.choice(ISSUE_TYPES), description='Generated issue report',
+                    mapaddress=self.rng.choice(AREAS), status=status, prioritylevel=self.rng.choice(PRIORITIES),
+                    createdat=created, resolvedat=resolved,
+                )
+        ids = self.insert(Issuereport, rows(), ids=True)
+        self.issues_list = [(issue,) + row for issue, row in zip(ids, issue_rows)]
+
+        def assignments():
+            for issue, community, status, created in self.issues_list:
+                if status == 'Pending':
+                    continue
+                authorities = self.authorities_by_community.get(community) or [self.rng.choice(self.authorities)[0]]
+                yield Issueassignment(issueid_id=issue, authorityid_id=self.rng.choice(authorities),
+                                      assigneddate=self.moment(after=created), status='Completed' if status == 'Resolved' else 'Assigned')
+        self.insert(Issueassignment, assignments())
+
+    def votes(self):
+        pairs = self.popular_pairs(self.issues_list, lambda i: self.residents_by_community.get(self.issues_list[i][1]), self.counts['votes'])
+        self.insert(Issuevote, (
+            Issuevote(issueid_id=self.issues_list[i][0], residentid_id=resident, votetype='up' if self.rng.random() < 0.8 else 'down',
+                      votedat=self.moment(after=self.issues_list[i][3]))
+            for i, resident in pairs
+        ))
+
+    def events(self):
+        event_rows = []
+
+        def rows():
+            for _ in range(self.counts['events']):
+                index = self.rng.randrange(len(self.user_ids))
+                community = self.user_community[index]
+                created = self.moment()
+                event_rows.append(community)
+                yield Event(
+                    postedbyid_id=self.user_ids[index], communityid_id=community,
+                    title=f'{self.rng.choice(EVENT_CATEGORIES)} meetup', description='Generated event',
+                    date=(created + datetime.timedelta(days=self.rng.randrange(1, 60))).date(),
+                    time=datetime.time(self.rng.randrange(8, 21), self.rng.choice([0, 30])),
+                    location=self.rng.choice(AREAS), category=self.rng.choice(EVENT_CATEGORIES),
+                    status=_weighted(self.rng, EVENT_STATUSES), createdat=created,
+                )
+        ids = self.insert(Event, rows(), ids=True)
+        events = list(zip(ids, event_rows))
+        pairs = self.popular_pairs(events, lambda i: self.residents_by_community.get(events[i][1]), self.counts['participations'])
+        self.insert(Eventparticipation, (
+            Eventparticipation(eventid_id=events[i][0], residentid_id=resident, interesttype=self.rng.choice(['Going', 'Interested']))
+            for i, resident in pairs
+        ))
+
+    def sos(self):
+        def rows():
+            for _ in range(self.counts['sos']):
+                community = self.rng.choice(self.community_ids)
+                yield Emergencyreport(
+                    residentid_id=self._resident_in(community), communityid_id=community,
+                    emergencytype=self.rng.choice(SOS_TYPES), location=self.rng.choice(AREAS),
+                    description='Generated SOS', status=_weighted(self.rng, SOS_STATUSES), timestamp=self.moment(),
+                )
+        self.insert(Emergencyreport, rows())
+
+    def bookings(self):
+        booking_rows = []
+
+        def rows():
+            for _ in range(self.counts['bookings']):
+                service, provider, community, price = self.rng.choice(self.services_list)
+                created = self.moment()
+                status = _weighted(self.rng, BOOKING_STATUSES)
+                resident = self._resident_in(community)
+                paid = status == 'Completed' and self.rng.random() < 0.8
+                booking_rows.append((resident, provider, price, status, paid, created))
+                yield Booking(
+                    serviceid_id=service, residentid_id=resident, providerid_id=provider, communityid_id=community,
+                    bookingdate=created.date(), servicedate=(created + datetime.timedelta(days=self.rng.randrange(0, 14))).date(),
+                    status=status, price=price, paymentstatus='Paid' if paid else 'Unpaid', createdat=created,
+                )
+        ids = self.insert(Booking, rows(), ids=True)
+        bookings = [(booking,) + row for booking, row in zip(ids, booking_rows)]
+
+        self.insert(Payment, (
+            Payment(bookingid_id=booking, amount=price, method=self.rng.choice(['Bkash', 'Cash']),
+                    transactionid=f'SYN{booking:010d}', paymentdate=self.moment(after=created), status='Completed')
+            for booking, _, _, price, _, paid, created in bookings if paid
+        ))
+        self.insert(Review, (
+            Review(bookingid_id=booking, residentid_id=resident, providerid_id=provider,
+                   rating=_weighted(self.rng, [(5, 40), (4, 30), (3, 15), (2, 8), (1, 7)]),
+                   comment='Generated review', createdat=self.moment(after=created))
+            for booking, resident, provider, _, status, _, created in bookings
+            if status == 'Completed' and self.rng.random() < 0.6
+        ))
+
+    def notifications(self):
+        def rows():
+            for _ in range(self.counts['notifications']):
+                index = self.rng.randrange(len(self.user_ids))
+                kind = self.rng.choice(NOTIFICATION_TYPES)
+                yield Notification(
+                    userid_id=self.user_ids[index], communityid_id=self.user_community[index],
+                    message=f'Generated {kind} notification', type=kind, link='/',
+                    isread=self.rng.random() < 0.7, createdat=self.moment(),
+                )
+        self.insert(Notification, rows())
+
+    def logs(self):
+        def logins():
+            for _ in range(self.counts['logs']):
+                index = self.rng.randrange(len(self.user_ids))
+                login = self.moment()
+                yield Loginlog(userid_id=self.user_ids[index], user_role=self.user_roles[index], logintime=login,
+                               logouttime=login + datetime.timedelta(minutes=self.rng.randrange(1, 240)),
+                               ipaddress=f'10.0.{self.rng.randrange(256)}.{self.rng.randrange(256)}',
+                               deviceinfo='synthetic', twofactorstatus='Off')
+        self.insert(Loginlog, logins())
+
+        def activity():
+            for _ in range(self.counts['logs']):
+                yield Activitylog(userid_id=self.rng.choice(self.user_ids), actiontype=self.rng.choice(['view', 'create', 'update']),
+                                  description='Generated activity', entityaffected=self.rng.choice(['Issue', 'Booking', 'Event']),
+                                  timestamp=self.moment())
+        self.insert(Activitylog, activity())
@@ -0,0 +1,134 @@
+import datetime
+import logging
+import traceback
+
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Backgroundtask
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+#  DB-BACKED BACKGROUND TASKS
+# ==========================================
+# Work that should not run inside a request is written as a Backgroundtask row in the
+# caller's transaction (so it only becomes visible once the write commits) and picked
+# up by `python manage.py run_tasks`. No external broker is needed.
+#
+#   @task('kind')                       -> registers a handler taking the Backgroundtask
+#   enqueue('kind', payload, ...)       -> creates the row (dedupe_key makes it idempotent)
+#   run_pending(limit)                  -> claims and runs due tasks (used by the worker)
+
+DEFAULTS = {
+    # Run tasks right after the enqueuing transaction commits, inside the same process.
+    # Handy for development without a worker; keep False in production.
+    'RUN_EAGERLY': False,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 30,
+    'LOCK_TIMEOUT': 300,
+    'POLL_INTERVAL': 1.0,
+}
+
+TASK_HANDLERS = {}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'BACKGROUND_TASKS', {}))
+    return config
+
+
+def task(kind):
+    def decorator(func):
+        TASK_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, dedupe_key=None, priority=0, run_after=None):
+    """
+    Creates a task row. With dedupe_key an existing task with the same key is returned
+    instead, so producers can safely fire more than once.
+    """
+    fields = {
+        'kind': kind,
+        'payload': payload or {},
+        'priority': priority,
+        'runafter': run_after or timezone.now(),
+    }
+    if dedupe_key:
+        try:
+            with transaction.atomic():
+                bg_task, created = Backgroundtask.objects.get_or_create(dedupekey=dedupe_key, defaults=fields)
+        except IntegrityError:
+            # Lost a race with a concurrent producer; its row is the task.
+            return Backgroundtask.objects.get(dedupekey=dedupe_key)
+        if not created:
+            return bg_task
+    else:
+        bg_task = Backgroundtask.objects.create(**fields)
+
+    if get_config()['RUN_EAGERLY']:
+        transaction.on_commit(lambda: run_task(bg_task.pk))
+    return bg_task
+
+
+def claim_tasks(limit, kinds=None):
+    """
+    Marks up to `limit` due tasks as Running and returns their ids. Uses
+    SELECT ... FOR UPDATE SKIP LOCKED where supported so several workers can share
+    the queue; tasks stuck in Running past LOCK_TIMEOUT are picked up again.
+    """
+    config = get_config()
+    now = timezone.now()
+    stale = now - datetime.timedelta(seconds=config['LOCK_TIMEOUT'])
+    with transaction.atomic():
+        due = (
+            Backgroundtask.objects
+            .select_for_update(skip_locked=True)
+            .filter(Q(status='Pending', runafter__lte=now) | Q(status='Running', lockedat__lt=stale))
+            .order_by('-priority', 'taskid')
+        )
+        if kinds:
+            due = due.filter(kind__in=kinds)
+        ids = list(due.values_list('taskid', flat=True)[:limit])
+        if ids:
+            Backgroundtask.objects.filter(pk__in=ids).update(status='Running', lockedat=now, attempts=F('attempts') + 1)
+    return ids
+
+
+def run_task(task_id):
+    bg_task = Backgroundtask.objects.filter(pk=task_id).first()
+    if bg_task is None or bg_task.status == 'Done':
+        return
+    handler = TASK_HANDLERS.get(bg_task.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for task kind '{bg_task.kind}'")
+        handler(bg_task)
+    except Exception:
+        config = get_config()
+        bg_task.lasterror = traceback.format_exc()
+        attempts = max(bg_task.attempts, 1)
+        if attempts >= config['MAX_ATTEMPTS']:
+            bg_task.status = 'Failed'
+        else:
+            bg_task.status = 'Pending'
+            bg_task.runafter = timezone.now() + datetime.timedelta(seconds=config['RETRY_DELAY'] * attempts)
+        bg_task.lockedat = None
+        bg_task.save(update_fields=['status', 'lasterror', 'runafter', 'lockedat', 'updatedat'])
+        logger.exception("Background task %s (%s) failed", bg_task.pk, bg_task.kind)
+        return
+    bg_task.status = 'Done'
+    bg_task.lockedat = None
+    bg_task.save(update_fields=['status', 'lockedat', 'updatedat'])
+
+
+def run_pending(limit=100, kinds=None):
+    ids = claim_tasks(limit, kinds=kinds)
+    for task_id in ids:
+        run_task(task_id)
+    return len(ids)
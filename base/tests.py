@@ -1,3 +1,997 @@
-from django.test import TestCase
+import asyncio
+import base64
+import datetime
+import io
+import json
+import tempfile
+import time
+from pathlib import Path
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.apps import apps as django_apps
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.contrib.auth.models import User as DjangoAuthUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.db.migrations.loader import MigrationLoader
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .models import (
+    User, Community, UserEmail, Resident, Authority,
+    Issuereport, Issuevote, Issueassignment, Event, Notification, Authoritycommunity,
+    Notificationoutbox, Notificationcounter, Serviceprovider, Service, Booking,
+    Emergencyreport, Dailyrollup, Review, Payment, Backgroundtask, Mediareference, Searchposting
+)
+from .notifications import materialize_outbox, get_unread_count
+from .realtime import publish_sos, poller
+from .authentication import AppTokenAuthentication, AppSessionAuthentication
+from .identity_cache import identity_cache
+from .instrumentation import QueryBudgetExceeded, TRANSACTION_CONTROL
+from . import urls as base_urls, views
+from .tasks import run_pending
+from .benchmark import run_benchmarks, measure_sos_latency, ROUTE_QUERIES
+from . import bkash
+from .bkash_mock import MockBkashServer
+from .media_store import storage_name, blob_digest, sync_references
+from .payments import apply_gateway_status, reconcile_pending_payments
+from .management.commands.explain_hot_queries import Command as ExplainHotQueries
+
+
+def create_app_user(email, role, community):
+    auth_user = DjangoAuthUser.objects.create_user(username=email, email=email, password='pass1234')
+    app_user = User.objects.create(firstname=role, lastname='Test', password=auth_user.password, role=role, communityid=community)
+    UserEmail.objects.create(userid=app_user, email=email)
+    token = Token.objects.create(user=auth_user)
+    return app_user, token
+
+
+class RequestIdentityTests(TestCase):
+    def setUp(self):
+        identity_cache.clear()
+        self.community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        self.app_user, self.token = create_app_user('resident@test.com', 'Resident', self.community)
+        self.resident = Resident.objects.create(userid=self.app_user)
+
+    def test_identity_is_resolved_once_with_one_joined_query(self):
+        request = Request(APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {self.token.key}'))
+        with CaptureQueriesContext(connection) as ctx:
+            AppTokenAuthentication().authenticate(request)
+        self.assertEqual(len(ctx.captured_queries), 2)  # the token, then UserEmail -> User -> profiles
+        self.assertEqual((request.app_user, request.resident, request.community), (self.app_user, self.resident, self.community))
+        self.assertIsNone(request.provider)
+        self.assertIsNone(request.authority)
+
+        request = Request(APIRequestFactory().get('/'))
+        request._request.user = DjangoAuthUser.objects.get(email='resident@test.com')
+        AppSessionAuthentication().authenticate(request)
+        self.assertEqual((request.app_user, request.resident), (self.app_user, self.resident))
+
+    def test_warm_tokens_cost_no_queries_until_revoked(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        request = Request(APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {self.token.key}'))
+        AppTokenAuthentication().authenticate(request)
+        with self.assertNumQueries(0):
+            AppTokenAuthentication().authenticate(request)
+        self.assertEqual(request.resident, self.resident)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(client.get('/api/resident/community-issues/').status_code, 401)
+
+    @override_settings(IDENTITY_CACHE={'SHARED_CACHE': 'default', 'TTL': 60})
+    def test_revocation_reaches_the_local_tier_of_other_processes(self):
+        caches['default'].clear()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(client.get('/api/resident/community-issues/').status_code, 200)
+        other_process = dict(identity_cache._entries)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        identity_cache._entries.update(other_process)  # its local tier was not purged
+        self.assertEqual(client.get('/api/resident/community-issues/').status_code, 401)
+
+
+class HotQueryIndexTests(TestCase):
+    def test_every_hot_query_index_exists(self):
+        # Whether an index is picked depends on the planner's statistics; run
+        # `explain_hot_queries --strict` against MySQL with real data for that.
+        command = ExplainHotQueries()
+        with connection.cursor() as cursor:
+            indexes = {
+                name.lower()
+                for _, _, queryset, *_ in command.hot_queries()
+                for name in connection.introspection.get_constraints(cursor, queryset.model._meta.db_table)
+            }
+        for label, index_name, *_ in command.hot_queries():
+            self.assertIn(index_name.lower(), indexes, label)
+        call_command('explain_hot_queries', stdout=StringIO())  # EXPLAINs every query without errors
+
+
+class AuthorityIssueQueryCountTests(TestCase):
+    def setUp(self):
+        self.community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        resident_user, self.resident_token = create_app_user('resident@test.com', 'Resident', self.community)
+        self.resident = Resident.objects.create(userid=resident_user)
+        authority_user, token = create_app_user('authority@test.com', 'Authority', self.community)
+        self.authority = Authority.objects.create(userid=authority_user, departmentname='Roads')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def add_issues(self, count):
+        for i in range(count):
+            issue = Issuereport.objects.create(residentid=self.resident, communityid=self.community, title=f'Issue {i}', status='Pending')
+            Issuevote.objects.create(issueid=issue, residentid=self.resident, votetype='up')
+            Issueassignment.objects.create(issueid=issue, authorityid=self.authority, status='Assigned')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_issue_list_query_count_is_flat(self):
+        for url in ['/api/issues/', '/api/authority/voting-results/']:
+            self.client.get(url)  # warm the identity cache
+            self.add_issues(2)
+            small, _ = self.count_queries(url)
+            self.add_issues(20)
+            large, response = self.count_queries(url)
+            self.assertEqual(small, large, url)
+            self.assertEqual(response.data['results'][0]['assignedTo'], 'Roads')
+            self.assertEqual(response.data['results'][0]['resident_name'], 'Resident Test')
+
+    def test_community_issue_list_query_count_is_flat(self):
+        url = '/api/resident/community-issues/'
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.resident_token.key}')
+        self.client.get(url)  # warm the identity cache
+        self.add_issues(2)
+        small, _ = self.count_queries(url)
+        self.add_issues(20)
+        large, response = self.count_queries(url)
+        self.assertEqual(small, large)
+        issues = response.data
+        self.assertEqual(len(issues), 22)
+        self.assertEqual((issues[0]['upvotes'], issues[0]['downvotes'], issues[0]['user_vote']), (1, 0, 'up'))
+        self.assertEqual(issues[0]['resident_name'], 'Resident Test')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        authority_user, token = create_app_user('authority@test.com', 'Authority', community)
+        Authority.objects.create(userid=authority_user, departmentname='Roads')
+        for i in range(5):
+            Event.objects.create(postedbyid=authority_user, communityid=community, title=f'Event {i}', date='2030-01-01', time='10:00', category='Community', status='Published')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_pages_follow_the_cursor_and_reject_bad_ones(self):
+        seen, url = [], '/api/authority/events/?page_size=2'
+        while url:
+            page = self.client.get(url).data
+            seen += [event['eventid'] for event in page['results']]
+            url = page['next']
+        self.assertEqual(sorted(seen, reverse=True), seen)  # same date: the pk breaks the tie
+        self.assertEqual(len(set(seen)), 5)
+
+        for value in (['not-a-date', 1], ['2030-01-01', 'x'], [None, 1], {'a': 1}, 'garbage'):
+            cursor = base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+            response = self.client.get(f'/api/authority/events/?cursor={cursor}')
+            self.assertEqual(response.status_code, 404, value)
+
+
+class EventFanOutTests(TestCase):
+    def setUp(self):
+        self.community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        self.poster, _ = create_app_user('poster@test.com', 'Resident', self.community)
+        for i in range(5):
+            create_app_user(f'neighbour{i}@test.com', 'Resident', self.community)
+        self.event = Event.objects.create(postedbyid=self.poster, communityid=self.community, title='Cleanup', date='2030-01-01', time='10:00', category='Community', status='Pending')
+
+    def test_publish_fans_out_once_in_batches(self):
+        self.event.status = 'Published'
+        self.event.save()
+        self.event.save()  # re-saving an already-Published event must not notify twice
+        self.assertEqual(Notification.objects.filter(type='event').count(), 0)
+        with self.settings(NOTIFICATION_FANOUT_BATCH_SIZE=2):
+            run_pending()
+        self.assertEqual(Notification.objects.filter(userid=self.poster, type='event').count(), 1)
+        self.assertEqual(Notification.objects.filter(type='event').exclude(userid=self.poster).count(), 5)
+        self.event.save()
+        run_pending()
+        self.assertEqual(Notification.objects.filter(type='event').count(), 6)
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        app_user, _ = create_app_user('resident@test.com', 'Resident', self.community)
+        self.resident = Resident.objects.create(userid=app_user)
+        provider_user, _ = create_app_user('provider@test.com', 'ServiceProvider', self.community)
+        provider = Serviceprovider.objects.create(userid=provider_user)
+        self.service = Service.objects.create(providerid=provider, communityid=self.community, servicename='Plumbing', category='Home', price=500)
+
+    def test_writes_only_emit_outbox_rows(self):
+        with CaptureQueriesContext(connection) as ctx:
+            issue = Issuereport.objects.create(residentid=self.resident, communityid=self.community, title='Pothole')
+        # The issue insert + one outbox insert (daily rollup and search index upkeep aside).
+        queries = [q['sql'] for q in ctx.captured_queries
+                   if 'DailyRollup' not in q['sql'] and 'SearchPosting' not in q['sql'] and 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(len(queries), 2)
+        Issuevote.objects.create(issueid=issue, residentid=self.resident, votetype='up')
+        Booking.objects.create(serviceid=self.service, residentid=self.resident, providerid=self.service.providerid, communityid=self.community,
+                               bookingdate='2030-01-01', servicedate='2030-01-02', status='Pending', price=500)
+        self.assertFalse(Notification.objects.filter(userid=self.resident.userid).exists())
+
+        self.assertEqual(materialize_outbox(), 3)
+        messages = set(Notification.objects.filter(userid=self.resident.userid).values_list('message', flat=True))
+        self.assertEqual(messages, {
+            "Success: Your issue report 'Pothole' has been submitted.",
+            "You upvoted the issue: 'Pothole'.",
+            "Booking Sent: Request for 'Plumbing' submitted successfully.",
+        })
+        self.assertFalse(Notificationoutbox.objects.filter(processedat__isnull=True).exists())
+        self.assertEqual(materialize_outbox(), 0)
+
+        # Unread badge is served from the denormalized counter.
+        user_id = self.resident.userid_id
+        self.assertEqual(get_unread_count(user_id), 3)
+        Issuereport.objects.create(residentid=self.resident, communityid=self.community, title='Streetlight')
+        materialize_outbox()
+        self.assertEqual(Notificationcounter.objects.get(userid=user_id).unread, 4)
+        Notificationcounter.objects.filter(userid=user_id).update(unread=99)
+        call_command('reconcile_notification_counters', stdout=StringIO())
+        self.assertEqual(get_unread_count(user_id), 4)
+
+
+class ProviderDashboardTests(TestCase):
+    def setUp(self):
+        self.community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        app_user, _ = create_app_user('resident@test.com', 'Resident', self.community)
+        self.resident = Resident.objects.create(userid=app_user)
+        provider_user, token = create_app_user('provider@test.com', 'ServiceProvider', self.community)
+        self.provider = Serviceprovider.objects.create(userid=provider_user)
+        self.service = Service.objects.create(providerid=self.provider, communityid=self.community, servicename='Plumbing', category='Home', price=500)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def add_bookings(self, count, status, servicedate='2030-01-15', price=500):
+        Booking.objects.bulk_create([
+            Booking(serviceid=self.service, residentid=self.resident, providerid=self.provider, communityid=self.community,
+                    bookingdate='2030-01-01', servicedate=servicedate, status=status, price=price)
+            for _ in range(count)
+        ])
+
+    def test_totals_in_one_aggregate_and_monthly_breakdown(self):
+        url = '/api/provider/dashboard/?breakdown=monthly'
+        self.client.get(url)  # warm the identity cache
+        self.add_bookings(2, 'Completed')
+        self.add_bookings(1, 'completed', servicedate='2030-02-03', price=250)
+        self.add_bookings(3, 'Pending')
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(url).data
+        # aggregate, recent bookings (with residents and services), monthly breakdown
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertEqual((data['total_bookings'], data['completed_bookings'], data['earnings']), (6, 3, 1250))
+        self.assertEqual(len(data['recent_bookings']), 5)
+        self.assertEqual(data['monthly_earnings'], [
+            {'month': '2030-01', 'earnings': 1000, 'completed_bookings': 2},
+            {'month': '2030-02', 'earnings': 250, 'completed_bookings': 1},
+        ])
+
+    def test_rating_aggregate_follows_review_writes(self):
+        self.client.get('/api/provider/profile/')  # the identity-cached profile predates the reviews
+        self.add_bookings(3, 'Completed')
+        first, second, third = Booking.objects.all()
+        review = Review.objects.create(bookingid=first, residentid=self.resident, providerid=self.provider, rating=5)
+        Review.objects.create(bookingid=second, residentid=self.resident, providerid=self.provider, rating=2)
+        Review.objects.create(bookingid=third, residentid=self.resident, providerid=self.provider, rating=None)
+        review.rating = 4
+        review.save()
+        self.provider.refresh_from_db()
+        self.assertEqual((self.provider.rating_sum, self.provider.rating_count, self.provider.average_rating), (6, 2, 3.0))
+        review.delete()
+        self.provider.refresh_from_db()
+        self.assertEqual((self.provider.rating_sum, self.provider.rating_count), (2, 1))
+
+        self.client.get('/api/resident/services/')  # warm the identity cache
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/resident/services/?sort=rating')
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual((response.data[0]['provider_rating'], response.data[0]['provider_review_count']), (2.0, 1))
+        self.assertEqual(self.client.get('/api/provider/dashboard/').data['rating'], 2.0)
+        self.assertEqual(self.client.get('/api/provider/profile/').data['rating'], 2.0)
+
+        Serviceprovider.objects.update(rating_sum=0, rating_count=0)
+        identity_cache.clear()
+        self.assertEqual(self.client.get('/api/provider/profile/').data['rating'], 0)
+        call_command('rebuild_provider_ratings', stdout=StringIO())
+        self.provider.refresh_from_db()
+        self.assertEqual((self.provider.rating_sum, self.provider.rating_count), (2, 1))
+        self.assertEqual(self.client.get('/api/provider/profile/').data['rating'], 2.0)
+
+    def test_profile_update_keeps_ratings_recorded_after_the_identity_was_cached(self):
+        self.client.get('/api/provider/profile/')  # caches the provider with no ratings
+        Serviceprovider.objects.filter(pk=self.provider.pk).update(rating_sum=9, rating_count=2)
+        response = self.client.put('/api/provider/profile/', {'subrole': 'Electrical', 'first_name': 'Renamed'}, format='multipart')
+        self.assertEqual(response.data['rating'], 4.5)
+        self.provider.refresh_from_db()
+        self.assertEqual((self.provider.subrole, self.provider.rating_sum, self.provider.rating_count), ('Electrical', 9, 2))
+        self.assertEqual(self.provider.userid.firstname, 'Renamed')
+
+
+class AnalyticsSummaryTests(TestCase):
+    def setUp(self):
+        self.community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        self.other = Community.objects.create(name='Other', city='Dhaka', district='Dhaka', thana='Banani', postalcode='1213')
+        app_user, token = create_app_user('resident@test.com', 'Resident', self.community)
+        self.resident = Resident.objects.create(userid=app_user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def add_issue(self, community, type, hours_to_resolve=None):
+        issue = Issuereport.objects.create(residentid=self.resident, communityid=community, title='Issue', type=type, mapaddress='Road 1', status='Pending')
+        if hours_to_resolve is not None:
+            Issuereport.objects.filter(pk=issue.pk).update(status='Resolved', resolvedat=issue.createdat + datetime.timedelta(hours=hours_to_resolve))
+        return issue
+
+    def test_summary_is_aggregated_in_the_database(self):
+        self.add_issue(self.community, 'Road', hours_to_resolve=2)
+        self.add_issue(self.community, 'Road', hours_to_resolve=6)
+        self.add_issue(self.community, 'Water')
+        self.add_issue(self.other, 'Water', hours_to_resolve=100)
+
+        self.client.get('/api/analytics/summary/')  # warm the identity cache
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/analytics/summary/?community={self.community.pk}')
+        self.assertEqual(response.status_code, 200)
+        # Stored rollups + today's issues and reviews + the three top-area lookups.
+        self.assertEqual(len(ctx.captured_queries), 6)
+        self.assertEqual(response.data['totalReports'], 3)
+        self.assertEqual(response.data['avgResolutionTime'], '4 hrs')
+        self.assertEqual(response.data['categoryStats'], [{'name': 'Road', 'count': 2}, {'name': 'Water', 'count': 1}])
+
+        tomorrow = (timezone.now() + datetime.timedelta(days=1)).date()
+        self.assertEqual(self.client.get(f'/api/analytics/summary/?from={tomorrow}').data['totalReports'], 0)
+        self.assertEqual(self.client.get(f'/api/analytics/summary/?to={tomorrow}').data['totalReports'], 4)
+        self.assertEqual(self.client.get('/api/analytics/summary/?from=yesterday').status_code, 400)
+
+
+    def rollup_rows(self):
+        return set(Dailyrollup.objects.filter(value__gt=0).values_list('day', 'communityid', 'metric', 'dimension', 'dimensionvalue', 'value'))
+
+    def test_signals_match_rebuild_and_dashboards_read_rollups(self):
+        issue = self.add_issue(self.community, 'Road')
+        self.add_issue(self.other, 'Water')
+        issue.status = 'Resolved'
+        issue.resolvedat = issue.createdat + datetime.timedelta(hours=3)
+        issue.save()
+        Emergencyreport.objects.create(residentid=self.resident, communityid=self.community, emergencytype='Fire', status='Pending')
+        incremental = self.rollup_rows()
+        self.assertIn((issue.createdat.date(), self.community.pk, 'issues_resolved', 'type', 'Road', 1), incremental)
+        call_command('rebuild_daily_rollups', stdout=StringIO())
+        self.assertEqual(self.rollup_rows(), incremental)
+
+        # Move everything to last week: past days are then served from the rollups only.
+        last_week = timezone.now() - datetime.timedelta(days=7)
+        Issuereport.objects.update(createdat=last_week)
+        Issuereport.objects.filter(pk=issue.pk).update(resolvedat=last_week + datetime.timedelta(hours=3))
+        call_command('rebuild_daily_rollups', stdout=StringIO())
+        summary = self.client.get('/api/analytics/summary/').data
+        self.assertEqual((summary['totalReports'], summary['avgResolutionTime']), (2, '3 hrs'))
+
+        # QuerySet.update() skips the signals, so the rollups lag until rebuilt.
+        Issuereport.objects.exclude(pk=issue.pk).update(status='Resolved', resolvedat=last_week + datetime.timedelta(hours=5))
+        self.assertEqual(self.client.get('/api/analytics/summary/').data['avgResolutionTime'], '3 hrs')
+        call_command('rebuild_daily_rollups', stdout=StringIO())
+        self.assertEqual(self.client.get('/api/analytics/summary/').data['avgResolutionTime'], '4 hrs')
+
+    def test_rollups_are_backfilled_after_the_migration_creating_them(self):
+        self.add_issue(self.community, 'Road')
+        incremental = self.rollup_rows()
+        Dailyrollup.objects.all().delete()
+        graph = MigrationLoader(connection).graph
+        emit_post_migrate_signal(0, False, 'default', plan=[(graph.nodes[('base', '0017_search_index')], False)], apps=django_apps)
+        self.assertFalse(Dailyrollup.objects.exists())
+        emit_post_migrate_signal(0, False, 'default', plan=[(graph.nodes[('base', '0011_dailyrollup')], False)], apps=django_apps)
+        self.assertEqual(self.rollup_rows(), incremental)
+
+
+class AuthorityDashboardCacheTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        self.other = Community.objects.create(name='Other', city='Dhaka', district='Dhaka', thana='Banani', postalcode='1213')
+        resident_user, _ = create_app_user('resident@test.com', 'Resident', self.community)
+        self.resident = Resident.objects.create(userid=resident_user)
+        authority_user, token = create_app_user('authority@test.com', 'Authority', self.other)
+        authority = Authority.objects.create(userid=authority_user, departmentname='Roads')
+        Authoritycommunity.objects.create(authorityid=authority, communityid=self.community)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def total_issues(self):
+        return self.client.get('/api/authority/dashboard-stats/').data['total_issues']
+
+    def add_issue(self, community):
+        with self.captureOnCommitCallbacks(execute=True):
+            Issuereport.objects.create(residentid=self.resident, communityid=community, title='Issue', status='Pending')
+
+    def test_scoped_and_recomputed_in_the_request_with_a_local_cache(self):
+        self.add_issue(self.community)
+        self.add_issue(self.other)  # outside the authority's mapped communities
+        self.assertEqual(self.total_issues(), 1)
+
+        self.add_issue(self.community)
+        self.assertEqual(self.total_issues(), 2)  # a worker could not reach this process's LocMemCache
+        self.assertFalse(Backgroundtask.objects.filter(kind='dashboard.refresh').exists())
+
+        self.add_issue(self.other)  # a different community's version: entry stays fresh
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.total_issues(), 2)
+        self.assertFalse(any('IssueReport' in q['sql'] for q in ctx.captured_queries))
+
+    def test_served_stale_while_the_worker_refreshes_a_shared_cache(self):
+        with tempfile.TemporaryDirectory() as location, self.settings(
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+            },
+            DASHBOARD_CACHE={'CACHE': 'shared'},
+        ):
+            self.add_issue(self.community)
+            self.assertEqual(self.total_issues(), 1)
+
+            self.add_issue(self.community)
+            self.assertEqual(self.total_issues(), 1)  # stale entry served, one refresh queued
+            self.assertEqual(self.total_issues(), 1)
+            self.assertEqual(Backgroundtask.objects.filter(kind='dashboard.refresh').count(), 1)
+            # The worker process has its own cache client; only the backend is shared.
+            with mock.patch('base.dashboard_cache._cache', return_value=caches.create_connection('shared')):
+                run_pending()
+            self.assertEqual(self.total_issues(), 2)
+
+
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        self.community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        authority_user, self.token = create_app_user('authority@test.com', 'Authority', self.community)
+        Authority.objects.create(userid=authority_user, departmentname='Police')
+
+    def test_rejects_bad_tokens_and_wsgi_requests(self):
+        self.assertEqual(self.client.get('/api/stream/').status_code, 401)
+        self.assertEqual(self.client.get('/api/stream/?token=nope').status_code, 401)
+        # Under WSGI the stream would pin a worker thread forever; clients poll instead.
+        self.assertEqual(self.client.get(f'/api/stream/?token={self.token.key}').status_code, 204)
+
+    async def test_authority_stream_pushes_sos(self):
+        with self.settings(REALTIME={'BACKEND': 'inprocess'}):
+            response = await self.async_client.get(f'/api/stream/?token={self.token.key}')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            frames = aiter(response.streaming_content)
+            await anext(frames)  # retry hint
+            counters = await anext(frames)
+            # Published from another thread, as signal handlers and the worker do.
+            sos = Emergencyreport(sosid=7, emergencytype='Fire', location='Road 1', status='Pending', communityid=self.community)
+            await sync_to_async(publish_sos, thread_sensitive=False)(sos)
+            pushed = await asyncio.wait_for(anext(frames), timeout=5)
+            await response.streaming_content.aclose()
+        self.assertTrue(counters.startswith(b'event: counters'))
+        self.assertIn(b'event: sos', pushed)
+        self.assertIn(b'"sosid": 7', pushed)
+
+    async def test_poller_publishes_rows_of_the_authoritys_communities(self):
+        other = await Community.objects.acreate(name='Other', city='Dhaka', district='Dhaka', thana='Banani', postalcode='1213')
+        resident_user, _ = await sync_to_async(create_app_user)('resident@test.com', 'Resident', self.community)
+        resident = await Resident.objects.acreate(userid=resident_user)
+        with self.settings(REALTIME={'BACKEND': 'polling', 'POLL_INTERVAL': 0.05}):
+            response = await self.async_client.get(f'/api/stream/?token={self.token.key}')
+            frames = aiter(response.streaming_content)
+            await anext(frames)  # retry hint
+            self.assertIn(b'"sos_pending": 0', await anext(frames))
+            await asyncio.sleep(0.2)  # the first poll sets the starting point
+            # Written without on_commit publishing (as another process would): only the poll sees them.
+            await Emergencyreport.objects.acreate(residentid=resident, communityid=other, emergencytype='Flood', status='Pending')
+            sos = await Emergencyreport.objects.acreate(residentid=resident, communityid=self.community, emergencytype='Fire', status='Pending')
+            pushed = await asyncio.wait_for(anext(frames), timeout=5)
+            counters = await asyncio.wait_for(anext(frames), timeout=5)
+            await response._iterator.aclose()  # event_stream itself, as after a disconnect
+            await asyncio.wait_for(poller._task, timeout=5)  # stops with the last stream
+        self.assertIn(f'"sosid": {sos.sosid}'.encode(), pushed)
+        self.assertTrue(counters.startswith(b'event: counters'))
+        self.assertIn(b'"sos_pending": 1', counters)
+
+
+@override_settings(INSTRUMENTATION={'ENFORCE_BUDGETS': True}, DEBUG=True)
+class QueryBudgetTests(TestCase):
+    """Every view in base/urls.py that declares a query_budget must stay within it."""
+    def setUp(self):
+        self.community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        resident_user, resident_token = create_app_user('resident@test.com', 'Resident', self.community)
+        resident = Resident.objects.create(userid=resident_user)
+        authority_user, authority_token = create_app_user('authority@test.com', 'Authority', self.community)
+        authority = Authority.objects.create(userid=authority_user, departmentname='Roads')
+        provider_user, provider_token = create_app_user('provider@test.com', 'ServiceProvider', self.community)
+        provider = Serviceprovider.objects.create(userid=provider_user)
+        service = Service.objects.create(providerid=provider, communityid=self.community, servicename='Plumbing', category='Home', price=500)
+        for i in range(10):
+            issue = Issuereport.objects.create(residentid=resident, communityid=self.community, title=f'Issue {i}', type='Road', status='Pending')
+            Issuevote.objects.create(issueid=issue, residentid=resident, votetype='up')
+            Issueassignment.objects.create(issueid=issue, authorityid=authority, status='Assigned')
+            Event.objects.create(postedbyid=resident_user, communityid=self.community, title=f'Event {i}', date='2030-01-01', time='10:00', category='Community', status='Published' if i % 2 else 'Pending')
+            booking = Booking.objects.create(serviceid=service, residentid=resident, providerid=provider, communityid=self.community,
+                                             bookingdate='2030-01-01', servicedate='2030-01-02', status='Completed', price=500)
+            Review.objects.create(bookingid=booking, residentid=resident, providerid=provider, rating=4)
+            Emergencyreport.objects.create(residentid=resident, communityid=self.community, emergencytype='Fire', status='Pending')
+        materialize_outbox()
+        self.tokens = {'resident': resident_token, 'authority': authority_token, 'provider': provider_token}
+
+    def token_for(self, route):
+        if route.startswith('provider/'):
+            return self.tokens['provider']
+        if route.startswith('resident/') or route.startswith('auth/'):
+            return self.tokens['resident']
+        return self.tokens['authority']
+
+    def test_budgeted_views_stay_within_budget(self):
+        checked = []
+        for pattern in base_urls.urlpatterns:
+            view = getattr(pattern.callback, 'view_class', None)
+            budget = getattr(view, 'query_budget', None)
+            if isinstance(budget, dict):
+                budget = budget.get('GET')
+            route = str(pattern.pattern)
+            if budget is None or '<' in route:
+                continue
+            identity_cache._entries.clear()  # budgets cover the cold-cache path
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.token_for(route).key}')
+            query = f'?{ROUTE_QUERIES[pattern.name]}' if pattern.name in ROUTE_QUERIES else ''
+            response = client.get(f'/api/{route}{query}')  # raises QueryBudgetExceeded when over
+            self.assertEqual(response.status_code, 200, route)
+            self.assertLessEqual(int(response['X-Query-Count']), budget, route)
+            checked.append(route)
+        self.assertGreaterEqual(len(checked), 20)
+
+        metrics = self.client.get('/api/_metrics/').content.decode()
+        self.assertIn('aequora_sql_queries_total{view="auth_issue_list"}', metrics)
+        self.assertIn('aequora_sql_duplicate_queries_total', metrics)
+
+    def test_over_budget_raises(self):
+        with mock.patch.object(views.AuthorityIssueListView, 'query_budget', 1):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.tokens["authority"].key}')
+            with self.assertRaises(QueryBudgetExceeded):
+                client.get('/api/issues/')
+
+    async def test_asgi_requests_are_counted_and_budgeted(self):
+        headers = {'Authorization': f'Token {self.tokens["authority"].key}'}
+        response = await self.async_client.get('/api/issues/', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        with mock.patch.object(views.AuthorityIssueListView, 'query_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                await self.async_client.get('/api/issues/', headers=headers)
+
+
+class SyntheticDataBenchmarkTests(TestCase):
+    def test_generated_data_serves_every_benchmarked_endpoint(self):
+        call_command('generate_synthetic_data', scale='tiny', seed=1, stdout=StringIO())
+        self.assertEqual(Community.objects.count(), 2)
+        self.assertEqual(Issuereport.objects.count(), 80)
+        # Historical timestamps, and derived tables rebuilt after the bulk inserts.
+        self.assertTrue(Issuereport.objects.filter(createdat__lt=timezone.now() - datetime.timedelta(days=2)).exists())
+        self.assertTrue(Dailyrollup.objects.exists())
+        self.assertTrue(Notificationcounter.objects.exists())
+        # SQLite does not enforce max_length; MySQL in strict mode rejects the batch.
+        status_length = Emergencyreport._meta.get_field('status').max_length
+        self.assertFalse(any(len(value) > status_length for value in Emergencyreport.objects.values_list('status', flat=True).distinct()))
+
+        results = run_benchmarks(iterations=2)
+        self.assertEqual(results['skipped'], {})
+        self.assertGreaterEqual(len(results['endpoints']), 20)
+        for name, result in results['endpoints'].items():
+            self.assertEqual(result['status'], 200, name)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+        self.assertEqual(results['meta']['rows']['base.Issuereport'], 80)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        resident_user, _ = create_app_user('resident@test.com', 'Resident', self.community)
+        resident = Resident.objects.create(userid=resident_user)
+        authority_user, self.token = create_app_user('authority@test.com', 'Authority', self.community)
+        Authority.objects.create(userid=authority_user, departmentname='Roads')
+        for i in range(3):
+            Issuereport.objects.create(residentid=resident, communityid=self.community, title=f'Issue {i}', status='Pending')
+        self.output = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+    def test_sampled_request_is_written_as_collapsed_stacks_and_replayed(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        with override_settings(PROFILING={'ENABLED': True, 'SAMPLE_RATE': 1.0, 'MODE': 'tracing', 'OUTPUT_DIR': self.output}):
+            self.assertEqual(client.get('/api/issues/').status_code, 200)
+
+        stacks = (self.output / 'auth_issue_list.collapsed').read_text().splitlines()
+        self.assertTrue(stacks)
+        frames, value = stacks[0].rsplit(' ', 1)
+        self.assertTrue(int(value) > 0)
+        self.assertTrue(any('rest_framework/views.py:APIView.dispatch' in line and 'Model.from_db' in line for line in stacks))
+        entry = json.loads((self.output / 'requests.jsonl').read_text())
+        self.assertEqual(entry['url_name'], 'auth_issue_list')
+        self.assertGreater(entry['categories']['orm_instantiation'], 0)
+        self.assertGreater(entry['categories']['sql'], 0)
+
+        out = StringIO()
+        with override_settings(PROFILING={'OUTPUT_DIR': self.output}):
+            call_command('profile_replay', '--repeat', '2', stdout=out)
+        self.assertIn('auth_issue_list: 2 request(s)', out.getvalue())
+        self.assertTrue((self.output / 'replay' / 'auth_issue_list.collapsed').exists())
+
+    async def test_asgi_requests_profile_the_view_thread(self):
+        headers = {'Authorization': f'Token {self.token.key}'}
+        list_issues = views.AuthorityIssueListView.list
+
+        def slow_list(view, *args, **kwargs):
+            time.sleep(0.05)  # a fast request can finish before the sampler's first tick
+            return list_issues(view, *args, **kwargs)
+
+        for mode in ('tracing', 'sampling'):
+            with mock.patch.object(views.AuthorityIssueListView, 'list', slow_list), \
+                    self.settings(PROFILING={'ENABLED': True, 'SAMPLE_RATE': 1.0, 'MODE': mode, 'INTERVAL': 0.0005, 'OUTPUT_DIR': self.output / mode}):
+                response = await self.async_client.get('/api/issues/?page_size=2&token=secret', headers=headers)
+                self.assertEqual(response.status_code, 200)
+                await self.async_client.get('/api/stream/?token=secret')  # async view: not profiled
+            stacks = (self.output / mode / 'auth_issue_list.collapsed').read_text()
+            self.assertIn('rest_framework/views.py:APIView.dispatch', stacks, mode)
+            self.assertFalse((self.output / mode / 'event_stream.collapsed').exists())
+            entry = json.loads((self.output / mode / 'requests.jsonl').read_text())
+            self.assertEqual(entry['query'], 'page_size=2&token=%5Bredacted%5D')
+
+
+def use_mock_bkash(test_case, **config):
+    """Starts a MockBkashServer for the test and points settings.BKASH at it."""
+    server = test_case.enterContext(MockBkashServer())
+    test_case.enterContext(override_settings(
+        BKASH={
+            'BASE_URL': server.base_url, 'USERNAME': 'user', 'PASSWORD': 'pass', 'APP_KEY': 'key', 'APP_SECRET': 'secret',
+            'READ_TIMEOUT': 0.2, 'BACKOFF': 0, 'CACHE': 'bkash', **config,
+        },
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'bkash': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bkash-tests'}},
+    ))
+    caches['bkash'].clear()
+    return server
+
+
+class BkashClientTests(TestCase):
+    def setUp(self):
+        self.server = use_mock_bkash(self, BREAKER_THRESHOLD=2, BREAKER_RESET=60)
+
+    def test_token_is_granted_once_and_refreshed_when_rejected(self):
+        client = bkash.get_client()
+        created = client.create_payment('500.00', 'INV-1-ABC', '01700000000')
+        client.query_payment(created['paymentID'])
+        executed = client.execute_payment(created['paymentID'])
+        self.assertEqual(executed['transactionStatus'], 'Completed')
+        # One grant for three payment calls, each a single round-trip.
+        self.assertEqual(self.server.calls['token/grant'], 1)
+        self.assertEqual(sum(self.server.calls.values()), 4)
+
+        self.server.revoke_tokens()
+        self.assertEqual(client.query_payment(created['paymentID'])['statusCode'], '0000')
+        self.assertEqual(self.server.calls['token/grant'], 2)
+
+        # Near expiry the refresh token is used instead of a new grant.
+        entry = caches['bkash'].get(bkash.TOKEN_KEY)
+        caches['bkash'].set(bkash.TOKEN_KEY, dict(entry, expires_at=entry['expires_at'] - 3590))
+        client.query_payment(created['paymentID'])
+        self.assertEqual(self.server.calls['token/refresh'], 1)
+        self.assertEqual(self.server.calls['token/grant'], 2)
+
+    def test_timeouts_open_the_circuit_breaker(self):
+        client = bkash.get_client()
+        client.get_token()
+        self.server.delay('payment/create', 0.5)
+        for _ in range(2):
+            with self.assertRaises(bkash.BkashUnavailable):
+                client.create_payment('500.00', 'INV-1-ABC', '01700000000')
+        # POSTs are not retried after a read timeout; once open, calls fail without a request.
+        self.assertEqual(self.server.calls['payment/create'], 2)
+        with self.assertRaises(bkash.BkashUnavailable):
+            client.create_payment('500.00', 'INV-1-ABC', '01700000000')
+        self.assertEqual(self.server.calls['payment/create'], 2)
+
+        self.server.fail('payment/query', status=503, times=1)
+        client.breaker.reset_after = 0
+        self.assertEqual(client.query_payment('missing')['statusCode'], '2056')
+        self.assertFalse(client.breaker.is_open)
+        self.assertEqual(self.server.calls['payment/query'], 2)  # the 503 was retried
+
+
+class BkashPaymentFlowTests(TestCase):
+    def setUp(self):
+        self.server = use_mock_bkash(self)
+        community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        resident_user, token = create_app_user('resident@test.com', 'Resident', community)
+        resident = Resident.objects.create(userid=resident_user)
+        provider_user, _ = create_app_user('provider@test.com', 'ServiceProvider', community)
+        provider = Serviceprovider.objects.create(userid=provider_user)
+        service = Service.objects.create(providerid=provider, communityid=community, servicename='Plumbing', category='Home', price=500)
+        self.bookings = [
+            Booking.objects.create(serviceid=service, residentid=resident, providerid=provider, communityid=community,
+                                   bookingdate=datetime.date.today(), servicedate=datetime.date.today(),
+                                   status='Pending', price=500, paymentstatus='Pending')
+            for _ in range(2)
+        ]
+        for booking in self.bookings:
+            Payment.objects.create(bookingid=booking, amount=500, method='Bkash', status='Pending')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def initiate(self, booking):
+        response = self.client.post('/api/payment/bkash/initiate/', {'booking_id': booking.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return Payment.objects.get(bookingid=booking).gatewaypaymentid
+
+    def test_callback_defers_execution_to_the_worker(self):
+        payment_id = self.initiate(self.bookings[0])
+        for _ in range(2):
+            response = self.client.get('/api/payment/bkash/callback/', {'paymentID': payment_id, 'status': 'success'})
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(response['Location'].endswith(f'?payment=processing&paymentID={payment_id}'))
+        self.assertEqual(self.server.calls['payment/execute'], 0)
+        self.assertEqual(Backgroundtask.objects.filter(kind='payments.bkash_execute').count(), 1)
+        # What the return page polls while the worker has not run yet.
+        status_url = f'/api/payment/bkash/query/?paymentID={payment_id}'
+        self.assertEqual(self.client.get(status_url).data['status'], 'Pending')
+
+        run_pending()
+        self.assertEqual(self.client.get(status_url).data, {'status': 'Completed', 'booking_id': self.bookings[0].pk, 'booking_status': 'Confirmed'})
+        payment = Payment.objects.get(gatewaypaymentid=payment_id)
+        self.assertEqual(payment.status, 'Completed')
+        self.assertEqual(payment.transactionid, self.server.payments[payment_id]['trxID'])
+        booking = Booking.objects.get(pk=self.bookings[0].pk)
+        self.assertEqual((booking.status, booking.paymentstatus), ('Confirmed', 'Paid'))
+        self.assertEqual(Payment.objects.filter(bookingid=booking).count(), 1)
+
+        # A second execution is rejected by bKash; the query confirms it and nothing changes.
+        self.assertEqual(apply_gateway_status(payment.pk, {'statusCode': '0000', 'transactionStatus': 'Completed', 'trxID': 'OTHER'}), 'Completed')
+        self.assertEqual(Payment.objects.get(pk=payment.pk).transactionid, payment.transactionid)
+
+    def test_pending_payments_are_reconciled_through_the_query_api(self):
+        completed_id, cancelled_id = self.initiate(self.bookings[0]), self.initiate(self.bookings[1])
+        self.server.payments[completed_id].update(transactionStatus='Completed', trxID='TRX-LATE')
+        self.server.payments[cancelled_id]['transactionStatus'] = 'Cancelled'
+        Payment.objects.update(paymentdate=timezone.now() - datetime.timedelta(hours=1))
+
+        self.assertEqual(reconcile_pending_payments(), 2)
+        reconcile_pending_payments()  # same interval: the tasks are deduplicated
+        self.assertEqual(Backgroundtask.objects.filter(kind='payments.bkash_verify').count(), 2)
+        run_pending()
+        self.assertEqual(self.server.calls['payment/query'], 2)
+        self.assertEqual(Payment.objects.get(gatewaypaymentid=completed_id).transactionid, 'TRX-LATE')
+        self.assertEqual(Payment.objects.get(gatewaypaymentid=cancelled_id).status, 'Failed')
+        self.assertEqual(Booking.objects.get(pk=self.bookings[0].pk).paymentstatus, 'Paid')
+        self.assertEqual(reconcile_pending_payments(), 0)
+
+
+class SosFastLaneTests(TestCase):
+    def setUp(self):
+        community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        resident_user, self.resident_token = create_app_user('resident@test.com', 'Resident', community)
+        self.resident = Resident.objects.create(userid=resident_user)
+        authority_user, self.authority_token = create_app_user('authority@test.com', 'Authority', community)
+        Authority.objects.create(userid=authority_user, departmentname='Roads')
+        Emergencyreport.objects.create(residentid=self.resident, communityid=community, emergencytype='Medical', status='Resolved')
+        self.media = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(MEDIA_ROOT=self.media))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.resident_token.key}')
+
+    def test_sos_is_committed_first_and_completed_by_the_worker(self):
+        photo = SimpleUploadedFile('scene.jpg', b'jpeg-bytes' * 100, content_type='image/jpeg')
+        notified = Notificationoutbox.objects.filter(kind='sos_sent').count()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/resident/sos/', {'emergencytype': 'Fire', 'location': 'Road 5', 'photo': photo}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertLessEqual(len([q for q in queries if not q['sql'].startswith(TRANSACTION_CONTROL)]), 4)
+        sos = Emergencyreport.objects.get(pk=response.data['sosid'])
+        self.assertIsNone(sos.photo)
+        self.assertEqual(Notificationoutbox.objects.filter(kind='sos_sent').count(), notified)
+        self.assertFalse(Dailyrollup.objects.filter(metric='sos', dimensionvalue='Fire').exists())
+        self.assertEqual(Backgroundtask.objects.get(kind='sos.followup').priority, 100)
+
+        authority = APIClient()
+        authority.credentials(HTTP_AUTHORIZATION=f'Token {self.authority_token.key}')
+        legacy = authority.get('/api/authority/sos/?paginate=false').data
+        self.assertEqual([row['status'] for row in legacy], ['Pending', 'Resolved'])
+        self.assertEqual([row['sosid'] for row in authority.get('/api/authority/sos/').data['pending']], [sos.pk])
+
+        run_pending()
+        sos.refresh_from_db()
+        self.assertRegex(sos.photo, r'^/media/blobs/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual((self.media / storage_name(sos.photo)).read_bytes(), b'jpeg-bytes' * 100)
+        self.assertEqual(list((self.media / 'sos_staging').iterdir()), [])
+        self.assertEqual(Dailyrollup.objects.get(metric='sos', dimensionvalue='Fire').value, 1)
+        self.assertEqual(Notificationoutbox.objects.filter(kind='sos_sent').count(), notified + 1)
+
+    def test_latency_benchmark_leaves_no_rows_behind(self):
+        tokens = {'resident': self.resident_token.key, 'authority': self.authority_token.key}
+        result = measure_sos_latency(3, tokens, photo_bytes=1024)
+        self.assertEqual(result['iterations'], 3)
+        self.assertLessEqual(result['post_queries'], 4)
+        self.assertEqual(result['slo_met'], result['visible_p95_ms'] <= result['slo_ms'])
+        self.assertEqual(Emergencyreport.objects.count(), 1)
+
+
+def jpeg_upload(name, size=(2000, 1200), exif=None):
+    from PIL import Image
+    buffer = io.BytesIO()
+    metadata = Image.Exif()
+    metadata.update(exif or {})
+    Image.new('RGB', size, (200, 40, 40)).save(buffer, format='JPEG', exif=metadata)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class UploadPipelineTests(TestCase):
+    def setUp(self):
+        community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        resident_user, token = create_app_user('resident@test.com', 'Resident', community)
+        Resident.objects.create(userid=resident_user)
+        self.media = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(MEDIA_ROOT=self.media))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_issue_photo_gets_metadata_free_derivatives(self):
+        from PIL import Image
+        photo = jpeg_upload('pothole.jpg', exif={0x010F: 'PhoneMaker', 0x0131: 'CameraApp'})
+        response = self.client.post('/api/resident/issues/', {'title': 'Pothole', 'photo': photo}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['photo_thumb'], response.data['photo'])  # the original until the worker runs
+
+        run_pending()
+        issue = Issuereport.objects.get(pk=response.data['issueid'])
+        for url, side in ((issue.photothumb, 320), (issue.photoweb, 1600)):
+            with Image.open(self.media / storage_name(url)) as image:
+                self.assertEqual(max(image.size), side)
+                self.assertEqual(dict(image.getexif()), {})
+        listed = self.client.get('/api/resident/issues/').data
+        served = [listed[0][field].split('?')[0] for field in ('photo_thumb', 'photo')]
+        self.assertEqual(served, [f'/api/media/{storage_name(url)}' for url in (issue.photothumb, issue.photoweb)])
+
+    @override_settings(UPLOADS={'MAX_FILE_SIZE': 4096})
+    def test_oversized_photos_are_rejected_without_losing_an_sos(self):
+        photo = SimpleUploadedFile('big.jpg', jpeg_upload('big.jpg').read() + b'\0' * 8192, content_type='image/jpeg')
+        response = self.client.post('/api/resident/issues/', {'title': 'Pothole', 'photo': photo}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('photo', response.data)
+        self.assertFalse(Issuereport.objects.exists())
+
+        photo.seek(0)
+        response = self.client.post('/api/resident/sos/', {'emergencytype': 'Fire', 'photo': photo}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('larger than 4096', response.data['photo_error'])
+        self.assertFalse(Backgroundtask.objects.get(kind='sos.followup').payload['photo'])
+
+    def test_identical_uploads_share_one_blob_until_unreferenced(self):
+        content = jpeg_upload('a.jpg').read()
+        ids = []
+        for name in ('IMG_0001.jpg', 'scene.jpg'):
+            photo = SimpleUploadedFile(name, content, content_type='image/jpeg')
+            ids.append(self.client.post('/api/resident/issues/', {'title': 'Flood', 'photo': photo}, format='multipart').data['issueid'])
+        run_pending()
+        first, second = Issuereport.objects.filter(pk__in=ids)
+        self.assertEqual((first.photo, first.photothumb), (second.photo, second.photothumb))
+        self.assertEqual(Mediareference.objects.filter(sha256=blob_digest(storage_name(first.photo))).count(), 2)
+        blobs = self.media / 'blobs'
+        self.assertEqual(len([p for p in blobs.rglob('*') if p.is_file()]), 3)  # original, thumb, web
+
+        first.delete()
+        call_command('gc_media', grace=0, stdout=StringIO())
+        self.assertTrue((self.media / storage_name(second.photo)).exists())
+        second.delete()
+        call_command('gc_media', grace=0, stdout=StringIO())
+        self.assertEqual([p for p in blobs.rglob('*') if p.is_file()], [])
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        owner_user, self.owner_token = create_app_user('owner@test.com', 'Resident', community)
+        owner = Resident.objects.create(userid=owner_user)
+        other_user, self.other_token = create_app_user('other@test.com', 'Resident', community)
+        Resident.objects.create(userid=other_user)
+        authority_user, self.authority_token = create_app_user('authority@test.com', 'Authority', community)
+        Authority.objects.create(userid=authority_user, departmentname='Roads')
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.content = b'0123456789' * 100
+        name = default_storage.save('sos_evidence/scene.jpg', ContentFile(self.content))
+        self.sos = Emergencyreport.objects.create(residentid=owner, communityid=community, emergencytype='Fire',
+                                                  status='Pending', photo=default_storage.url(name))
+        sync_references(self.sos)
+        self.path = f'/api/media/{name}'
+
+    def fetch(self, url, token=None, **headers):
+        client = APIClient()
+        if token:
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client.get(url, headers=headers)
+
+    def test_signed_urls_support_etag_and_ranges(self):
+        listed = self.fetch('/api/authority/sos/?paginate=false', self.authority_token).data
+        url = listed[0]['photo']
+        self.assertTrue(url.startswith(self.path + '?'))
+
+        full = self.fetch(url)  # no credentials: the signature is the permission
+        self.assertEqual(full.status_code, 200)
+        self.assertEqual(b''.join(full.streaming_content), self.content)
+        self.assertIn('immutable', full['Cache-Control'])
+        self.assertEqual(self.fetch(url, **{'If-None-Match': full['ETag']}).status_code, 304)
+        partial = self.fetch(url, Range='bytes=10-19')
+        self.assertEqual((partial.status_code, partial['Content-Range']), (206, 'bytes 10-19/1000'))
+        self.assertEqual(b''.join(partial.streaming_content), self.content[10:20])
+        self.assertEqual(self.fetch(url, Range='bytes=5000-').status_code, 416)
+        self.assertEqual(self.fetch(url.replace('sig=', 'sig=x')).status_code, 401)
+
+    def test_unsigned_requests_need_owner_or_authority(self):
+        self.assertEqual(self.fetch(self.path, self.other_token).status_code, 403)
+        self.assertEqual(self.fetch(self.path, self.owner_token).status_code, 200)
+        with override_settings(MEDIA_SERVING={'BACKEND': 'nginx'}):
+            response = self.fetch(self.path, self.authority_token)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.path[len("/api/media/"):]}')
+        self.assertEqual(response.content, b'')
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        community = Community.objects.create(name='Test', city='Dhaka', district='Dhaka', thana='Gulshan', postalcode='1212')
+        elsewhere = Community.objects.create(name='Other', city='Dhaka', district='Dhaka', thana='Banani', postalcode='1213')
+        resident_user, token = create_app_user('resident@test.com', 'Resident', community)
+        resident = Resident.objects.create(userid=resident_user)
+        other = Resident.objects.create(userid=create_app_user('other@test.com', 'Resident', elsewhere)[0])
+        self.titled = Issuereport.objects.create(residentid=resident, communityid=community, title='Flooded road near school', type='Drainage')
+        self.described = Issuereport.objects.create(residentid=resident, communityid=community, title='Broken drain',
+                                                    description='Water floods the lane whenever it rains. Flooded every week.')
+        Issuereport.objects.create(residentid=other, communityid=elsewhere, title='Flooded market')
+        Event.objects.create(postedbyid=resident_user, communityid=community, title='Flooded area cleanup', date='2030-01-01',
+                             time='10:00', category='Community', status='Pending')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_results_are_ranked_scoped_and_paginated(self):
+        response = self.client.get('/api/search/?q=flooded road&page_size=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(hit['type'], hit['id']) for hit in response.data['results']], [('issue', self.titled.pk)])
+        second = self.client.get(f"/api/search/?q=flooded road&page_size=1&cursor={response.data['next_cursor']}").data
+        self.assertEqual([hit['id'] for hit in second['results']], [self.described.pk])
+        self.assertIsNone(second['next_cursor'])  # other community and the pending event are not found
+        self.assertEqual(self.client.get('/api/search/').status_code, 400)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.described.title = 'Blocked culvert'
+        self.described.description = ''
+        self.described.save()
+        self.titled.delete()
+        self.assertEqual(self.client.get('/api/search/?q=flooded&paginate=false').data, [])
+        self.assertEqual([hit['id'] for hit in self.client.get('/api/search/?q=culvert&type=issue&paginate=false').data], [self.described.pk])
+
+        Searchposting.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.client.get('/api/search/?q=culvert&paginate=false').data), 1)
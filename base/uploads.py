@@ -0,0 +1,192 @@
+import hashlib
+import io
+import logging
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler, SkipFile
+from rest_framework import serializers
+
+from .media_store import storage_name, sync_references
+from .tasks import task, enqueue
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError, features
+except ImportError:  # derivatives are skipped; rows keep serving the original
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+#  UPLOADS & IMAGE DERIVATIVES
+# ==========================================
+# StreamingUploadHandler (settings.FILE_UPLOAD_HANDLERS) writes every multipart file
+# straight to a temporary file in CHUNK_SIZE pieces - Django's default handlers keep
+# files under 2.5 MB in memory - and skips files over MAX_FILE_SIZE, or every file of
+# a request over MAX_REQUEST_SIZE, hashing (SHA-256) as it goes so the content-addressed
+# store (base/media_store.py) only has to rename the file. Skipped fields are listed in request.upload_errors;
+# image_upload() turns them into a 400 for the field.
+#
+# Photos of SOS reports, issues and events are stored as uploaded (`photo`, the
+# evidence copy) and DERIVATIVES_TASK then writes, with Pillow:
+#
+#   photothumb -> longest side VARIANTS['thumb'][0] px, for list endpoints
+#   photoweb   -> longest side VARIANTS['web'][0] px, what clients open
+#
+# Derivatives are re-encoded from the decoded pixels (EXIF orientation applied), so
+# EXIF/GPS and other metadata are not carried over. Without Pillow, or for files Pillow
+# cannot read, no derivatives are made and serializers fall back to the original.
+
+DEFAULTS = {
+    'MAX_FILE_SIZE': 10 * 1024 * 1024,
+    'MAX_REQUEST_SIZE': 25 * 1024 * 1024,
+    'CHUNK_SIZE': 64 * 1024,
+    'IMAGE_TYPES': ('image/jpeg', 'image/png', 'image/webp', 'image/gif', 'image/heic'),
+    # Longest side in pixels and encoder quality per derivative.
+    'VARIANTS': {'thumb': (320, 70), 'web': (1600, 80)},
+    # 'WEBP' when the Pillow build supports it, else JPEG.
+    'FORMAT': 'WEBP',
+}
+
+DERIVATIVES_TASK = 'uploads.derivatives'
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'UPLOADS', {}))
+    return config
+
+
+# --- Streaming upload handler ---
+
+class StreamingUploadHandler(TemporaryFileUploadHandler):
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.config = get_config()
+        self.chunk_size = self.config['CHUNK_SIZE']
+        self.request_too_large = False
+        self.received = 0
+        self.hasher = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request_too_large = content_length > self.config['MAX_REQUEST_SIZE']
+
+    def new_file(self, field_name, *args, **kwargs):
+        if self.request_too_large:
+            self.reject(field_name, f"The request is larger than {self.config['MAX_REQUEST_SIZE']} bytes.")
+        self.received = 0
+        self.hasher = hashlib.sha256()
+        super().new_file(field_name, *args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.config['MAX_FILE_SIZE']:
+            self.file.close()  # removes the partial temporary file
+            self.reject(self.field_name, f"The file is larger than {self.config['MAX_FILE_SIZE']} bytes.")
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        upload.sha256 = self.hasher.hexdigest()
+        return upload
+
+    def reject(self, field_name, message):
+        if self.request is not None:
+            if not hasattr(self.request, 'upload_errors'):
+                self.request.upload_errors = {}
+            self.request.upload_errors[field_name] = message
+        raise SkipFile(message)
+
+
+def image_upload(request, field='photo'):
+    """The image uploaded in `field`, or None; ValidationError for rejected uploads."""
+    upload = request.FILES.get(field)  # parses the body, filling upload_errors
+    errors = getattr(request, 'upload_errors', {})
+    if field in errors:
+        raise serializers.ValidationError({field: errors[field]})
+    if upload is not None and upload.content_type not in get_config()['IMAGE_TYPES']:
+        raise serializers.ValidationError({field: f"Unsupported image type {upload.content_type!r}."})
+    return upload
+
+
+def store_upload(upload, directory):
+    """
+    Saves the upload in default_storage; returns its URL. `directory` only matters for
+    storages that keep client names (the content-addressed store does not).
+    """
+    name = default_storage.save(f"{directory}/{os.path.basename(upload.name)}", upload)
+    return default_storage.url(name)
+
+
+# --- Derivatives ---
+
+def enqueue_derivatives(instance, priority=0):
+    """Queues thumbnail/web versions of instance.photo (a stored photo URL)."""
+    if not instance.photo:
+        return None
+    label = instance._meta.label
+    digest = hashlib.sha1(instance.photo.encode()).hexdigest()[:12]
+    return enqueue(DERIVATIVES_TASK, {'model': label, 'pk': instance.pk, 'photo': instance.photo},
+                   dedupe_key=f'derivatives:{label}:{instance.pk}:{digest}', priority=priority)
+
+
+def _output_format(config):
+    if config['FORMAT'] == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return config['FORMAT']
+
+
+def render_variants(source, config):
+    """{variant: encoded bytes} for an open image file; raises on unreadable images."""
+    fmt = _output_format(config)
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'L'):
+            rgba = image.convert('RGBA')
+            image = Image.new('RGB', rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel('A'))
+        outputs = {}
+        for variant, (size, quality) in config['VARIANTS'].items():
+            copy = image.copy()
+            copy.thumbnail((size, size), Image.LANCZOS)
+            buffer = io.BytesIO()
+            # No exif=/icc_profile= arguments: the derivative carries no metadata.
+            copy.save(buffer, format=fmt, quality=quality, optimize=True)
+            outputs[variant] = buffer.getvalue()
+    return outputs, EXTENSIONS.get(fmt, fmt.lower())
+
+
+@task(DERIVATIVES_TASK)
+def make_derivatives(bg_task):
+    payload = bg_task.payload
+    if Image is None:
+        logger.warning("Pillow is not installed; no derivatives for %s %s", payload['model'], payload['pk'])
+        return
+    name = storage_name(payload['photo'])
+    if name is None or not default_storage.exists(name):
+        logger.warning("Photo %s of %s %s is not in default_storage", payload['photo'], payload['model'], payload['pk'])
+        return
+    config = get_config()
+    try:
+        with default_storage.open(name, 'rb') as source:
+            outputs, extension = render_variants(source, config)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        logger.warning("Cannot make derivatives of %s: %s", name, e)
+        return
+
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    urls = {}
+    for variant, data in outputs.items():
+        saved = default_storage.save(f"{directory}/derivatives/{stem}-{variant}.{extension}", ContentFile(data))
+        urls[f'photo{variant}'] = default_storage.url(saved)
+    model = apps.get_model(payload['model'])
+    # Only if the photo is still the one the derivatives were made from.
+    if model.objects.filter(pk=payload['pk'], photo=payload['photo']).update(**urls):
+        sync_references(model(pk=payload['pk']))
+
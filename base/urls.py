@@ -24,6 +24,10 @@ from .views import (
     CommunityIssueListView,
     IssueVoteView,
     NotificationView,
+    NotificationStreamView,
+    MetricsView,
+    MediaView,
+    SearchView,
 
     # --- Bkash Payment Integration ---
     BkashInitiateView,
@@ -91,6 +95,10 @@ urlpatterns = [
     
     # Notifications
     path('resident/notifications/', NotificationView.as_view(), name='notifications'),
+    path('stream/', NotificationStreamView.as_view(), name='event_stream'),
+    path('_metrics/', MetricsView.as_view(), name='metrics'),
+    path('media/<path:name>', MediaView.as_view(), name='media'),
+    path('search/', SearchView.as_view(), name='search'),
 
     # ==========================
     # BKASH PAYMENT INTEGRATION
@@ -4,15 +4,26 @@ from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.contrib.auth.models import User as DjangoAuthUser
+from django.conf import settings
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from django.contrib.auth import authenticate
-from django.core.files.storage import default_storage
+from django.db import transaction
 from django.shortcuts import redirect
-from django.db.models import Count, Avg, F, Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, Http404
+from django.core.handlers.asgi import ASGIRequest
+from django.views import View
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import AuthenticationFailed
+from django.db.models import Count, Sum, F, Q, OuterRef, Subquery, Case, When, Value, ExpressionWrapper, FloatField
+from django.db.models.functions import TruncMonth
 import datetime
-import requests
 import json
+import os
 import uuid
+from urllib.parse import urlencode
 
 from .models import (
     User as AppUser, Resident, UserEmail, UserPhonenumber, Loginlog,
@@ -21,6 +32,20 @@ from .models import (
     Review, Issueassignment, Issuevote, Authoritycommunity, Notification
 )
 
+from . import bkash
+from .analytics import AnalyticsFilters, analytics_summary
+from .authentication import authenticate_token_key, resolve_identity, attach_identity
+from .dashboard_cache import cached_stats
+from .instrumentation import render_prometheus, get_config as instrumentation_config
+from .notifications import get_unread_count, reset_unread
+from .realtime import event_stream
+from .search import search, DOCUMENTS as SEARCH_DOCUMENTS
+from .sos import ingest_sos, pending_first, get_config as sos_config
+from .pagination import KeysetPagination, RankedPagination, paginated_response
+from .media_serving import valid_signature, may_access, serve
+from .media_store import sync_references
+from .uploads import image_upload, store_upload, enqueue_derivatives
+from .payments import record_created_payment, enqueue_execution, apply_gateway_status
 from .serializers import (
     RegisterSerializer, UserProfileSerializer, EmergencyReportSerializer,
     IssueReportSerializer, EventSerializer, EventParticipationSerializer,
@@ -123,13 +148,12 @@ class ChangePasswordView(APIView):
                 return Response({"error": "Incorrect current password."}, status=status.HTTP_400_BAD_REQUEST)
             user.set_password(new_pass)
             user.save()
-            try:
-                user_email = UserEmail.objects.get(email=user.email)
-                app_user = user_email.userid
+            app_user = request.app_user
+            if app_user:
                 app_user.password = user.password 
                 app_user.save()
-            except Exception as e:
-                print("Error syncing password:", e)
+            else:
+                print("Error syncing password: app user not found")
             return Response({"message": "Password updated successfully"}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -139,10 +163,12 @@ class ChangePasswordView(APIView):
 
 class ResidentDashboardView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 8
     def get(self, request):
         try:
-            user_email = UserEmail.objects.get(email=request.user.email)
-            resident = Resident.objects.get(userid=user_email.userid)
+            resident = request.resident
+            if not resident:
+                raise Resident.DoesNotExist
             total_issues = Issuereport.objects.filter(residentid=resident).count()
             total_bookings = Booking.objects.filter(residentid=resident, status__in=['Accepted', 'Completed']).count()
             total_events = Eventparticipation.objects.filter(residentid=resident, interesttype='Going').count()
@@ -150,7 +176,7 @@ class ResidentDashboardView(APIView):
             issues = Issuereport.objects.filter(residentid=resident).order_by('-createdat')[:5]
             for i in issues:
                 activities.append({'id': f"issue_{i.issueid}", 'type': 'Issue', 'title': i.title, 'status': i.status, 'date': i.createdat, 'description': f"Reported: {i.type}"})
-            bookings = Booking.objects.filter(residentid=resident).order_by('-createdat')[:5]
+            bookings = Booking.objects.filter(residentid=resident).select_related('serviceid').order_by('-createdat')[:5]
             for b in bookings:
                 activities.append({'id': f"booking_{b.bookingid}", 'type': 'Booking', 'title': b.serviceid.servicename, 'status': b.status, 'date': b.createdat, 'description': f"Service Date: {b.servicedate}"})
             events = Eventparticipation.objects.filter(residentid=resident, interesttype='Going').select_related('eventid')[:5]
@@ -165,20 +191,15 @@ class ResidentDashboardView(APIView):
 
 class UserMeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
-    def get_app_user(self, request):
-        try:
-            user_email = UserEmail.objects.get(email=request.user.email)
-            return user_email.userid
-        except UserEmail.DoesNotExist:
-            return None
+    query_budget = {'GET': 3}
     def get(self, request):
-        app_user = self.get_app_user(request)
+        app_user = request.app_user
         if not app_user:
             return Response({"error": "User profile not found"}, status=404)
         serializer = UserProfileSerializer(app_user)
         return Response(serializer.data)
     def put(self, request):
-        app_user = self.get_app_user(request)
+        app_user = request.app_user
         if not app_user:
             return Response({"error": "User profile not found"}, status=404)
         data = request.data.copy()
@@ -199,124 +220,102 @@ class EmergencySOSView(generics.CreateAPIView):
     serializer_class = EmergencyReportSerializer
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
+    # Cold identity cache (2) + the SOS row + its follow-up task; see base/sos.py.
+    query_budget = {'POST': 4}
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        self.perform_create(serializer)
-        headers = self.get_success_headers(serializer.data)
-        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
-    def perform_create(self, serializer):
-        user_email = UserEmail.objects.get(email=self.request.user.email)
-        app_user = user_email.userid
-        try:
-            resident = Resident.objects.get(userid=app_user)
-            community = app_user.communityid 
-            if not community:
-                raise serializers.ValidationError("You are not assigned to a community.")
-            photo_path = None
-            if 'photo' in self.request.FILES:
-                image = self.request.FILES['photo']
-                file_name = default_storage.save(f"sos_evidence/{image.name}", image)
-                photo_path = default_storage.url(file_name)
-            serializer.save(residentid=resident, communityid=community, photo=photo_path, status="Pending")
-        except Resident.DoesNotExist:
+        resident = request.resident
+        if not resident:
             raise serializers.ValidationError("User is not a registered resident.")
-        except Exception as e:
-            raise serializers.ValidationError(str(e))
+        community = request.community
+        if not community:
+            raise serializers.ValidationError("You are not assigned to a community.")
+        try:
+            photo, photo_error = image_upload(request), None
+        except serializers.ValidationError as e:
+            # An SOS is never refused over its photo; the client is told it was dropped.
+            photo, photo_error = None, str(e.detail['photo'])
+        sos = ingest_sos(resident.pk, community.pk, serializer.validated_data, photo)
+        data = self.get_serializer(sos).data
+        if photo_error:
+            data['photo_error'] = photo_error
+        return Response(data, status=status.HTTP_201_CREATED)
 
 class IssueReportView(generics.ListCreateAPIView):
     serializer_class = IssueReportSerializer
     permission_classes = [permissions.IsAuthenticated]
-    def get_app_user(self):
-        return UserEmail.objects.get(email=self.request.user.email).userid
+    query_budget = {'GET': 3}
     def get_queryset(self):
-        app_user = self.get_app_user()
-        try:
-            resident = Resident.objects.get(userid=app_user)
-            return Issuereport.objects.filter(residentid=resident).order_by('-createdat')
-        except Resident.DoesNotExist:
+        resident = self.request.resident
+        if not resident:
             return Issuereport.objects.none()
+        return Issuereport.objects.filter(residentid=resident).order_by('-createdat')
     def perform_create(self, serializer):
-        app_user = self.get_app_user()
-        try:
-            resident = Resident.objects.get(userid=app_user)
-            community = app_user.communityid
-            serializer.save(residentid=resident, communityid=community, status="Pending")
-        except Resident.DoesNotExist:
+        resident = self.request.resident
+        if not resident:
             raise serializers.ValidationError("User is not a resident.")
+        photo = image_upload(self.request)
+        photo_url = store_upload(photo, 'issue_photos') if photo else None
+        issue = serializer.save(residentid=resident, communityid=self.request.community, status="Pending", photo=photo_url)
+        if photo_url:
+            sync_references(issue)
+            enqueue_derivatives(issue)
 
 # In base/views.py
 
 class EventListView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
 
     def get(self, request):
-        user = request.user
-        
-        # 1. Resolve User Object
-        if hasattr(user, 'email'): 
-            email_str = user.email
-        else: 
-            email_str = str(user)
-            
-        try:
-            email_obj = UserEmail.objects.get(email=email_str)
-            user_obj = email_obj.userid
-        except UserEmail.DoesNotExist:
+        # 1. Resolve User Object (done once by base.authentication)
+        if not request.app_user:
             return Response({'error': 'User not found'}, status=404)
 
         # 2. Check if User is a Resident and get Community
         community_id = None
-        try:
-            resident = Resident.objects.get(userid=user_obj)
-            # CHECK: Ensure we are accessing the ID correctly
-            if resident.userid.communityid:
-                community_id = resident.userid.communityid.communityid
-        except Resident.DoesNotExist:
-            pass
+        if request.resident and request.community:
+            community_id = request.community.communityid
 
         # 3. Filter Events
         if community_id:
             # Show events for this community
-            events = Event.objects.filter(communityid=community_id).order_by('-date')
+            events = Event.objects.filter(communityid=community_id).select_related('postedbyid').order_by('-date')
         else:
             # FALLBACK: If user has no community, show ALL events (for testing)
             # Remove this 'else' block later if you want strict privacy
-            events = Event.objects.all().order_by('-date')
+            events = Event.objects.all().select_related('postedbyid').order_by('-date')
 
-        serializer = EventSerializer(events, many=True)
-        return Response(serializer.data)
+        return paginated_response(request, events, EventSerializer, '-date', view=self)
 
 class ResidentPendingEventsView(generics.ListAPIView):
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
     def get_queryset(self):
-        try:
-            user_email = UserEmail.objects.get(email=self.request.user.email)
-            app_user = user_email.userid
-            community = app_user.communityid
-            if community:
-                return Event.objects.filter(communityid=community, status='Pending', postedbyid=app_user).order_by('-createdat')
-            return Event.objects.none()
-        except Exception:
-            return Event.objects.none()
+        app_user = self.request.app_user
+        community = self.request.community
+        if app_user and community:
+            return Event.objects.filter(communityid=community, status='Pending', postedbyid=app_user).select_related('postedbyid').order_by('-createdat')
+        return Event.objects.none()
 
 class EventParticipationView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'GET': 3}
     def get(self, request):
-        try:
-            user_email = UserEmail.objects.get(email=request.user.email)
-            resident = Resident.objects.get(userid=user_email.userid)
-            participations = Eventparticipation.objects.filter(residentid=resident)
-            serializer = EventParticipationSerializer(participations, many=True)
-            return Response(serializer.data)
-        except Exception:
+        resident = request.resident
+        if not resident:
             return Response([], status=200)
+        participations = Eventparticipation.objects.filter(residentid=resident)
+        serializer = EventParticipationSerializer(participations, many=True)
+        return Response(serializer.data)
     def post(self, request):
         try:
-            user_email = UserEmail.objects.get(email=request.user.email)
-            resident = Resident.objects.get(userid=user_email.userid)
+            resident = request.resident
+            if not resident:
+                raise Resident.DoesNotExist("User is not a resident.")
             event_id = request.data.get('eventid')
             action = request.data.get('action') 
             db_value = 'Going' if action == 'participate' else 'Ignored'
@@ -329,30 +328,33 @@ class EventParticipationView(APIView):
 class ServiceListView(generics.ListAPIView):
     serializer_class = ServiceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
     def get_queryset(self):
-        try:
-            user_email = UserEmail.objects.get(email=self.request.user.email)
-            app_user = user_email.userid
-            community = app_user.communityid
-            if community:
-                return Service.objects.filter(communityid=community)
-            return Service.objects.none()
-        except Exception:
+        community = self.request.community
+        if not community:
             return Service.objects.none()
+        services = Service.objects.filter(communityid=community).select_related('providerid__userid')
+        # ?sort=rating -> best-rated providers first (denormalized Serviceprovider rating columns).
+        if self.request.query_params.get('sort') == 'rating':
+            average = Case(
+                When(providerid__rating_count=0, then=Value(0.0)),
+                default=ExpressionWrapper(F('providerid__rating_sum') * 1.0 / F('providerid__rating_count'), output_field=FloatField()),
+            )
+            services = services.annotate(provider_average=average).order_by('-provider_average', '-providerid__rating_count', 'serviceid')
+        return services
 
 # --- BOOKING VIEW WITH DOUBLE REQUEST PREVENTION ---
 class BookingView(generics.ListCreateAPIView):
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
-    def get_app_user(self):
-        return UserEmail.objects.get(email=self.request.user.email).userid
+    query_budget = {'GET': 3}
+    pagination_class = KeysetPagination
+    cursor_ordering = '-bookingdate'
     def get_queryset(self):
-        app_user = self.get_app_user()
-        try:
-            resident = Resident.objects.get(userid=app_user)
-            return Booking.objects.filter(residentid=resident).order_by('-bookingdate')
-        except Resident.DoesNotExist:
+        resident = self.request.resident
+        if not resident:
             return Booking.objects.none()
+        return Booking.objects.filter(residentid=resident).select_related('serviceid', 'providerid__userid').order_by('-bookingdate')
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if not serializer.is_valid():
@@ -361,10 +363,11 @@ class BookingView(generics.ListCreateAPIView):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
     def perform_create(self, serializer):
-        app_user = self.get_app_user()
         try:
-            resident = Resident.objects.get(userid=app_user)
-            community = app_user.communityid
+            resident = self.request.resident
+            if not resident:
+                raise Resident.DoesNotExist
+            community = self.request.community
             if not community:
                 raise serializers.ValidationError("You must join a community before booking.")
             service_id = self.request.data.get('serviceid')
@@ -399,10 +402,9 @@ class BookingDetailView(generics.DestroyAPIView):
     def delete(self, request, *args, **kwargs):
         try:
             booking = self.get_object()
-            user_email = UserEmail.objects.get(email=request.user.email)
-            resident = Resident.objects.get(userid=user_email.userid)
+            resident = request.resident
             
-            if booking.residentid != resident:
+            if not resident or booking.residentid_id != resident.residentid:
                 return Response({"error": "Permission denied."}, status=status.HTTP_403_FORBIDDEN)
 
             today = timezone.now().date()
@@ -427,21 +429,42 @@ class BookingDetailView(generics.DestroyAPIView):
 #  AUTHORITY & SHARED VIEWS
 # ==========================================
 
+def authority_community_ids(request):
+    """Communities mapped to the authority in Authoritycommunity, else the user's own community."""
+    if request.authority:
+        mapped = list(Authoritycommunity.objects.filter(authorityid=request.authority).values_list('communityid', flat=True))
+        if mapped:
+            return mapped
+    return [request.community.pk] if request.community else []
+
 class AuthorityDashboardStatsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 6
     def get(self, request):
-        total_issues = Issuereport.objects.count()
-        resolved_issues = Issuereport.objects.filter(status='Resolved').count()
-        pending_issues = Issuereport.objects.exclude(status='Resolved').count()
-        avg_rating = Review.objects.aggregate(Avg('rating'))['rating__avg'] or 0
-        satisfaction_rate = round((avg_rating / 5) * 100, 1)
-        return Response({"total_issues": total_issues, "resolved_issues": resolved_issues, "pending_issues": pending_issues, "satisfaction_rate": satisfaction_rate})
+        community_ids = authority_community_ids(request)
+        # Rollup-backed (base/analytics.py) and served through the versioned
+        # stale-while-revalidate cache (base/dashboard_cache.py).
+        stats = cached_stats('authority', community_ids)
+        return Response(stats)
+
+def annotate_issue_assignment(queryset):
+    """
+    Adds what AuthorityIssueSerializer needs without per-row queries:
+    the resident's user (select_related) and the latest assignment's department.
+    """
+    latest_assignment = Issueassignment.objects.filter(issueid=OuterRef('pk')).order_by('-assignmentid')
+    return queryset.select_related('residentid__userid').annotate(
+        assigned_department=Subquery(latest_assignment.values('authorityid__departmentname')[:1])
+    )
 
 class AuthorityIssueListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
     serializer_class = AuthorityIssueSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = '-createdat'
     def get_queryset(self):
-        return Issuereport.objects.annotate(vote_count=Count('issuevote')).order_by('-createdat')
+        return annotate_issue_assignment(Issuereport.objects.annotate(vote_count=Count('issuevote'))).order_by('-createdat')
 
 class AuthorityIssueDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -467,34 +490,28 @@ class AuthorityIssueDetailView(APIView):
 
 class AnalyticsSummaryView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 8
     def get(self, request):
-        total = Issuereport.objects.count()
-        resolved_issues = Issuereport.objects.filter(status='Resolved', resolvedat__isnull=False)
-        total_seconds = 0
-        count = 0
-        for i in resolved_issues:
-            if i.createdat and i.resolvedat:
-                diff = i.resolvedat - i.createdat
-                total_seconds += diff.total_seconds()
-                count += 1
-        avg_time_str = "0h 0m"
-        if count > 0:
-            avg_seconds = total_seconds / count
-            hours = int(avg_seconds // 3600)
-            avg_time_str = f"{hours} hrs"
-        avg_score = Review.objects.aggregate(Avg('rating'))['rating__avg'] or 0
-        cat_stats = Issuereport.objects.values('type').annotate(count=Count('issueid')).order_by('-count')
-        formatted_cats = [{'name': c['type'] or 'Uncategorized', 'count': c['count']} for c in cat_stats]
-        area_stats = Issuereport.objects.values('mapaddress').annotate(count=Count('issueid')).order_by('-count')[:5]
-        formatted_areas = [{'name': a['mapaddress'] or 'Unknown', 'count': a['count']} for a in area_stats]
-        return Response({"totalReports": total, "avgResolutionTime": avg_time_str, "satisfactionScore": round(avg_score, 1), "categoryStats": formatted_cats, "topAreas": formatted_areas})
+        try:
+            filters = AnalyticsFilters.from_params(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        return Response(analytics_summary(filters))
 
 class AuthoritySOSView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 4
     def get(self, request):
-        sos_list = Emergencyreport.objects.all().order_by('-timestamp')
-        serializer = AuthoritySOSSerializer(sos_list, many=True)
-        return Response(serializer.data)
+        # Pending SOS come first: the whole list in legacy mode, and a "pending" block on
+        # top of the first page otherwise (later pages follow the timeline only).
+        paginator = KeysetPagination('-timestamp')
+        if paginator.is_legacy(request):
+            return Response(AuthoritySOSSerializer(pending_first(Emergencyreport.objects.all()), many=True).data)
+        response = paginated_response(request, Emergencyreport.objects.all(), AuthoritySOSSerializer, '-timestamp', view=self)
+        if not request.query_params.get(paginator.cursor_query_param):
+            pending = Emergencyreport.objects.filter(status='Pending').order_by('-timestamp', '-sosid')[:sos_config()['PENDING_LIMIT']]
+            response.data['pending'] = AuthoritySOSSerializer(pending, many=True).data
+        return response
 
 class AuthoritySOSDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -511,31 +528,42 @@ class AuthoritySOSDetailView(APIView):
 
 class VotingResultsView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
     serializer_class = AuthorityIssueSerializer
+    pagination_class = KeysetPagination
+    # Vote counts change between requests, so pages are cut on the issue's creation time
+    # instead (a keyset over a live aggregate skips or repeats rows). The ranking by
+    # upvotes is the legacy ?paginate=false list, which CommunityVoting uses: it needs
+    # every issue for its totals.
+    cursor_ordering = '-createdat'
     def get_queryset(self):
-        return Issuereport.objects.annotate(upvotes=Count('issuevote', filter=Q(issuevote__votetype='up')), downvotes=Count('issuevote', filter=Q(issuevote__votetype='down'))).order_by('-upvotes')
+        return annotate_issue_assignment(Issuereport.objects.annotate(upvotes=Count('issuevote', filter=Q(issuevote__votetype='up')), downvotes=Count('issuevote', filter=Q(issuevote__votetype='down')))).order_by('-upvotes')
 
 class AuthorityEventView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'GET': 3}
     def get(self, request):
-        events = Event.objects.filter(status='Published').order_by('-date')
-        serializer = AuthorityEventSerializer(events, many=True)
-        return Response(serializer.data)
+        events = Event.objects.filter(status='Published').select_related('postedbyid').order_by('-date')
+        return paginated_response(request, events, AuthorityEventSerializer, '-date', view=self)
     def post(self, request):
         data = request.data
-        user_email = UserEmail.objects.get(email=request.user.email)
-        community = user_email.userid.communityid 
+        community = request.community
         if not community:
             community = Community.objects.first()
-        Event.objects.create(postedbyid=user_email.userid, communityid=community, title=data.get('title'), description=data.get('description'), date=data.get('date'), time=data.get('time'), location=data.get('location'), category=data.get('category'), status='Published')
+        photo = image_upload(request)
+        photo_url = store_upload(photo, 'event_photos') if photo else None
+        event = Event.objects.create(postedbyid=request.app_user, communityid=community, title=data.get('title'), description=data.get('description'), date=data.get('date'), time=data.get('time'), location=data.get('location'), category=data.get('category'), status='Published', photo=photo_url)
+        if photo_url:
+            sync_references(event)
+            enqueue_derivatives(event)
         return Response({'message': 'Event Created'}, status=201)
 
 class AuthorityEventRequestsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
     def get(self, request):
-        requests = Event.objects.filter(status='Pending').order_by('-date')
-        serializer = AuthorityEventSerializer(requests, many=True)
-        return Response(serializer.data)
+        requests = Event.objects.filter(status='Pending').select_related('postedbyid').order_by('-date')
+        return paginated_response(request, requests, AuthorityEventSerializer, '-date', view=self)
 
 class AuthorityEventActionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -569,23 +597,41 @@ class DepartmentListView(APIView):
 class CommunityIssueListView(generics.ListAPIView):
     serializer_class = CommunityIssueSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 4
     def get_queryset(self):
-        try:
-            user_email = UserEmail.objects.get(email=self.request.user.email)
-            app_user = user_email.userid
-            community = app_user.communityid
-            if community:
-                return Issuereport.objects.filter(communityid=community).order_by('-createdat')
-            return Issuereport.objects.none()
-        except Exception:
-            return Issuereport.objects.none()
+        community = self.request.community
+        if community:
+            return (
+                Issuereport.objects.filter(communityid=community)
+                .select_related('residentid__userid')
+                .annotate(
+                    upvotes=Count('issuevote', filter=Q(issuevote__votetype='up')),
+                    downvotes=Count('issuevote', filter=Q(issuevote__votetype='down')),
+                )
+                .order_by('-createdat')
+            )
+        return Issuereport.objects.none()
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        resident = self.request.resident
+        community = self.request.community
+        if resident and community:
+            # One query for the current resident's votes across the whole community.
+            context['user_votes'] = dict(
+                Issuevote.objects.filter(residentid=resident, issueid__communityid=community)
+                .values_list('issueid', 'votetype')
+            )
+        else:
+            context['user_votes'] = {}
+        return context
 
 class IssueVoteView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def post(self, request):
         try:
-            user_email = UserEmail.objects.get(email=request.user.email)
-            resident = Resident.objects.get(userid=user_email.userid)
+            resident = request.resident
+            if not resident:
+                raise Resident.DoesNotExist("User is not a resident.")
             issue_id = request.data.get('issueid')
             vote_type = request.data.get('type') 
             issue = Issuereport.objects.get(pk=issue_id)
@@ -608,19 +654,24 @@ class IssueVoteView(APIView):
 
 class NotificationView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'GET': 6}
     def get(self, request):
         try:
-            user_email = UserEmail.objects.get(email=request.user.email)
-            notifs = Notification.objects.filter(userid=user_email.userid).order_by('-createdat')
-            unread_count = notifs.filter(isread=False).count()
+            if not request.app_user:
+                raise UserEmail.DoesNotExist("User profile not found")
+            notifs = Notification.objects.filter(userid=request.app_user).order_by('-createdat')
+            unread_count = get_unread_count(request.app_user.userid)
             serializer = NotificationSerializer(notifs[:10], many=True)
             return Response({'unread_count': unread_count, 'notifications': serializer.data})
         except Exception as e:
             return Response({'error': str(e)}, status=400)
     def post(self, request):
         try:
-            user_email = UserEmail.objects.get(email=request.user.email)
-            Notification.objects.filter(userid=user_email.userid, isread=False).update(isread=True)
+            if not request.app_user:
+                raise UserEmail.DoesNotExist("User profile not found")
+            with transaction.atomic():
+                Notification.objects.filter(userid=request.app_user, isread=False).update(isread=True)
+                reset_unread(request.app_user.userid)
             return Response({'message': 'Notifications marked as read', 'unread_count': 0})
         except Exception as e:
             return Response({'error': str(e)}, status=400)
@@ -630,75 +681,195 @@ class EventRequestView(APIView):
     def post(self, request):
         serializer = EventRequestSerializer(data=request.data)
         if serializer.is_valid():
+            photo = image_upload(request)
             try:
-                user_email = UserEmail.objects.get(email=request.user.email)
-                app_user = user_email.userid
-                community = app_user.communityid
+                app_user = request.app_user
+                community = request.community
                 if not community:
                     return Response({"error": "You must be assigned to a community to request events."}, status=status.HTTP_400_BAD_REQUEST)
-                serializer.save(postedbyid=app_user, communityid=community, status='Pending')
+                photo_url = store_upload(photo, 'event_photos') if photo else None
+                event = serializer.save(postedbyid=app_user, communityid=community, status='Pending', photo=photo_url)
+                if photo_url:
+                    sync_references(event)
+                    enqueue_derivatives(event)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             except Exception as e:
                 return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# ==========================================
+#  SEARCH
+# ==========================================
+
+class SearchView(APIView):
+    """
+    Ranked search over issues, events and services (base/search.py), scoped to the
+    user's community (authorities: their mapped communities).
+    ?q=...  ?type=issue|event|service (repeatable)  ?page_size=  ?cursor=
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    # Cold identity cache (2) + authority communities + at most 2 per document type.
+    query_budget = 9
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'The q parameter is required.'}, status=400)
+        types = request.query_params.getlist('type')
+        unknown = set(types) - set(SEARCH_DOCUMENTS)
+        if unknown:
+            return Response({'error': f"Unknown type(s): {', '.join(sorted(unknown))}."}, status=400)
+        is_authority = request.authority is not None
+        community_ids = authority_community_ids(request) if is_authority else [request.community.pk] if request.community else []
+        hits = search(query, community_ids, is_authority=is_authority, types=types)
+        paginator = RankedPagination()
+        page = paginator.paginate_list(hits, request)
+        if page is None:
+            return Response(hits)
+        return paginator.get_paginated_response(page)
+
+# ==========================================
+#  MEDIA
+# ==========================================
+
+class MediaView(View):
+    """Uploaded files, after a signature or permission check (base/media_serving.py)."""
+    def get(self, request, name):
+        if not valid_signature(name, request.GET.get('exp'), request.GET.get('sig')):
+            key = request.GET.get('token')
+            header = request.headers.get('Authorization', '')
+            if not key and header.startswith('Token '):
+                key = header.split(' ', 1)[1].strip()
+            if key:
+                try:
+                    _, _, profile, _ = authenticate_token_key(key)
+                except AuthenticationFailed as e:
+                    return JsonResponse({'error': str(e.detail)}, status=401)
+            elif request.user.is_authenticated:
+                _, profile = resolve_identity(request.user)
+            else:
+                return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=401)
+            if not may_access(name, profile):
+                return JsonResponse({'error': 'You do not have access to this file.'}, status=403)
+        try:
+            path = safe_join(settings.MEDIA_ROOT, name)
+        except SuspiciousFileOperation:
+            raise Http404
+        if not os.path.isfile(path):
+            raise Http404
+        return serve(request, name, path)
+
+# ==========================================
+#  METRICS (PROMETHEUS)
+# ==========================================
+
+class MetricsView(View):
+    """Per-endpoint request/SQL metrics recorded by QueryBudgetMiddleware (this process only)."""
+    def get(self, request):
+        token = instrumentation_config()['METRICS_TOKEN']
+        if token:
+            supplied = request.GET.get('token') or request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+            if not constant_time_compare(supplied, token):
+                return HttpResponse('Forbidden', status=403, content_type='text/plain')
+        elif not settings.DEBUG:
+            raise Http404
+        return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# ==========================================
+#  REAL-TIME STREAM (SERVER-SENT EVENTS, ASGI)
+# ==========================================
+
+class NotificationStreamView(View):
+    """
+    Pushes new notifications (and, for authorities, SOS alerts and counters of the
+    communities they cover) instead of polling.
+    EventSource cannot set headers, so the token may also come as ?token=.
+    Needs an ASGI server (uvicorn AEQUORA.asgi:application, see README): under WSGI
+    the endless stream would be drained into memory by a worker thread that never
+    comes back, so it answers 204 there, which tells EventSource not to reconnect
+    and the pages fall back to polling.
+    """
+    async def get(self, request):
+        key = request.GET.get('token')
+        header = request.headers.get('Authorization', '')
+        if not key and header.startswith('Token '):
+            key = header.split(' ', 1)[1].strip()
+        if not key:
+            return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=401)
+        try:
+            _, app_user, profile, _ = await sync_to_async(authenticate_token_key)(key)
+        except AuthenticationFailed as e:
+            return JsonResponse({'error': str(e.detail)}, status=401)
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse(status=204)
+        attach_identity(request, app_user, profile)
+        community_ids = await sync_to_async(authority_community_ids)(request) if request.authority else None
+        user_id = app_user.userid if app_user else None
+        response = StreamingHttpResponse(event_stream(user_id, community_ids), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # let nginx flush events immediately
+        return response
+
 # ==========================================
 #  SERVICE PROVIDER VIEWS
 # ==========================================
 
-def get_provider_safely(request_user):
+def get_provider_safely(request):
     """
     Safely retrieves the ServiceProvider based on your specific DB Schema:
     UserEmail -> User -> ServiceProvider
+    The chain is resolved once per request by base.authentication.
     """
-    email_str = str(request_user)
-    if hasattr(request_user, 'email'):
-        email_str = request_user.email
-    
-    # 1. Find User via UserEmail table
-    try:
-        email_record = UserEmail.objects.get(email=email_str)
-        user_instance = email_record.userid
-    except (UserEmail.DoesNotExist, AttributeError):
-        return None
-
-    # 2. Get ServiceProvider profile
-    try:
-        return Serviceprovider.objects.get(userid=user_instance)
-    except Serviceprovider.DoesNotExist:
-        return None
+    return getattr(request, 'provider', None)
 
 class ProviderDashboardStatsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 5
 
     def get(self, request):
-        provider = get_provider_safely(request.user)
+        provider = get_provider_safely(request)
         if not provider:
             return Response({'error': 'Profile not found'}, status=404)
 
         bookings = Booking.objects.filter(providerid=provider)
-        total_bookings = bookings.count()
-        completed_bookings = bookings.filter(status__iexact='Completed').count()
-        earnings = sum(b.price for b in bookings.filter(status__iexact='Completed') if b.price)
-        
-        # Calculate Rating dynamically
-        avg_rating = Review.objects.filter(providerid=provider).aggregate(Avg('rating'))['rating__avg'] or 0
+        completed = Q(status__iexact='Completed')
+        # Totals, counts and earnings in one conditional aggregate.
+        totals = bookings.aggregate(
+            total_bookings=Count('bookingid'),
+            completed_bookings=Count('bookingid', filter=completed),
+            earnings=Sum('price', filter=completed),
+        )
         
-        recent_bookings = ProviderBookingSerializer(bookings.order_by('-bookingdate')[:5], many=True).data
-
-        return Response({
-            'total_bookings': total_bookings,
-            'completed_bookings': completed_bookings,
-            'earnings': earnings,
-            'rating': round(avg_rating, 1),
+        recent = bookings.select_related('residentid__userid', 'serviceid').order_by('-bookingdate')[:5]
+        recent_bookings = ProviderBookingSerializer(recent, many=True).data
+
+        data = {
+            'total_bookings': totals['total_bookings'],
+            'completed_bookings': totals['completed_bookings'],
+            'earnings': totals['earnings'] or 0,
+            'rating': provider.average_rating,
             'recent_bookings': recent_bookings
-        })
+        }
+        # ?breakdown=monthly -> completed earnings per month (by service date), oldest first.
+        if request.query_params.get('breakdown') == 'monthly':
+            monthly = (
+                bookings.filter(completed)
+                .annotate(month=TruncMonth('servicedate'))
+                .values('month')
+                .annotate(earnings=Sum('price'), completed_bookings=Count('bookingid'))
+                .order_by('month')
+            )
+            data['monthly_earnings'] = [
+                {'month': row['month'].strftime('%Y-%m'), 'earnings': row['earnings'], 'completed_bookings': row['completed_bookings']}
+                for row in monthly
+            ]
+        return Response(data)
 
 class ProviderServiceManageView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'GET': 3}
 
     def get(self, request):
-        provider = get_provider_safely(request.user)
+        provider = get_provider_safely(request)
         if not provider:
             return Response({'error': 'Provider not found'}, status=404)
 
@@ -707,7 +878,7 @@ class ProviderServiceManageView(APIView):
         return Response(serializer.data)
 
     def post(self, request):
-        provider = get_provider_safely(request.user)
+        provider = get_provider_safely(request)
         if not provider:
             return Response({'error': 'Provider not found'}, status=404)
 
@@ -730,7 +901,7 @@ class ProviderServiceDetailView(APIView):
 
     def put(self, request, pk):
         """ Update an existing service """
-        provider = get_provider_safely(request.user)
+        provider = get_provider_safely(request)
         if not provider:
             return Response({'error': 'Provider not found'}, status=404)
 
@@ -752,7 +923,7 @@ class ProviderServiceDetailView(APIView):
 
     def delete(self, request, pk):
         """ Delete a service """
-        provider = get_provider_safely(request.user)
+        provider = get_provider_safely(request)
         if not provider:
             return Response({'error': 'Provider not found'}, status=404)
 
@@ -765,15 +936,15 @@ class ProviderServiceDetailView(APIView):
 
 class ProviderBookingManageView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
 
     def get(self, request):
-        provider = get_provider_safely(request.user)
+        provider = get_provider_safely(request)
         if not provider:
             return Response({'error': 'Provider not found'}, status=404)
 
-        bookings = Booking.objects.filter(providerid=provider).order_by('-bookingdate')
-        serializer = ProviderBookingSerializer(bookings, many=True)
-        return Response(serializer.data)
+        bookings = Booking.objects.filter(providerid=provider).select_related('residentid__userid', 'serviceid').order_by('-bookingdate')
+        return paginated_response(request, bookings, ProviderBookingSerializer, '-bookingdate', view=self)
 
 # base/views.py
 
@@ -782,22 +953,13 @@ class ProviderBookingStatusUpdateView(generics.UpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        # CRITICAL FIX: request.user is an email string, NOT a User object.
-        # We must resolve Email -> User object via UserEmail table as per your database truths.
-        email_str = self.request.user
-        
-        try:
-            # 1. Find the UserEmail entry matching the logged-in email
-            user_email_obj = UserEmail.objects.get(email=email_str)
-            # 2. Extract the actual User object (userid is the ForeignKey)
-            user_obj = user_email_obj.userid
-        except UserEmail.DoesNotExist:
-            # If email doesn't exist in UserEmail, return empty
+        # Email -> User -> ServiceProvider is resolved once by base.authentication.
+        provider = get_provider_safely(self.request)
+        if not provider:
             return Booking.objects.none()
 
-        # 3. Use the resolved User object to filter bookings
-        # Booking -> providerid (ServiceProvider) -> userid (User)
-        return Booking.objects.filter(providerid__userid=user_obj)
+        # Booking -> providerid (ServiceProvider)
+        return Booking.objects.filter(providerid=provider)
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -818,39 +980,50 @@ class ProviderBookingStatusUpdateView(generics.UpdateAPIView):
 
 class ProviderProfileView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'GET': 3}
     parser_classes = (MultiPartParser, FormParser) # REQUIRED for File Uploads
 
     def get(self, request):
-        provider = get_provider_safely(request.user)
+        provider = get_provider_safely(request)
         if not provider:
             return Response({'error': 'Provider not found'}, status=404)
         serializer = ProviderProfileSerializer(provider)
         return Response(serializer.data)
 
     def put(self, request):
-        provider = get_provider_safely(request.user)
+        provider = get_provider_safely(request)
         if not provider:
             return Response({'error': 'Provider not found'}, status=404)
+        certification = request.FILES.get('certificationfile')
+        if 'certificationfile' in getattr(request, 'upload_errors', {}):
+            return Response({'certificationfile': request.upload_errors['certificationfile']}, status=400)
 
         user = provider.userid # Get the linked User instance
+        # provider/user come from the identity cache: save only the columns edited here,
+        # so the snapshot never overwrites rating_sum/rating_count (signals keep those
+        # with F() increments) or other columns written since it was cached.
 
         # 1. Update User Table Fields
         user.firstname = request.data.get('first_name', user.firstname)
         user.lastname = request.data.get('last_name', user.lastname)
         user.gender = request.data.get('gender', user.gender)
+        user_fields = ['firstname', 'lastname', 'gender']
         
         dob = request.data.get('date_of_birth')
-        if dob and dob != 'null': user.date_of_birth = dob
+        if dob and dob != 'null':
+            user.date_of_birth = dob
+            user_fields.append('date_of_birth')
 
         # Update Community ID
         comm_id = request.data.get('community_id')
         if comm_id:
             try:
                 user.communityid = Community.objects.get(communityid=comm_id)
+                user_fields.append('communityid')
             except Community.DoesNotExist:
                 pass # Ignore invalid community IDs
         
-        user.save()
+        user.save(update_fields=user_fields)
 
         # 2. Update Phone Number Table
         phone = request.data.get('phone_number')
@@ -862,49 +1035,40 @@ class ProviderProfileView(APIView):
         provider.service_area = request.data.get('service_area', provider.service_area)
         provider.workinghours = request.data.get('workinghours', provider.workinghours)
         provider.availability_status = request.data.get('availability_status', provider.availability_status)
+        provider_fields = ['subrole', 'service_area', 'workinghours', 'availability_status']
 
         # 4. Handle File Upload
-        if 'certificationfile' in request.FILES:
-            provider.certificationfile = request.FILES['certificationfile']
-
-        provider.save()
+        if certification:
+            provider.certificationfile = store_upload(certification, 'certifications')
+            provider_fields.append('certificationfile')
+
+        provider.save(update_fields=provider_fields)
+        if certification:
+            sync_references(provider)
+        provider.refresh_from_db(fields=['rating_sum', 'rating_count'])
         
         return Response(ProviderProfileSerializer(provider).data)
 
 class ProviderReviewsListView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
 
     def get(self, request):
-        provider = get_provider_safely(request.user)
+        provider = get_provider_safely(request)
         if not provider:
             return Response({'error': 'Provider not found'}, status=404)
 
         # Get reviews for this provider, newest first
-        reviews = Review.objects.filter(providerid=provider).order_by('-createdat')
-        serializer = ProviderReviewSerializer(reviews, many=True)
-        return Response(serializer.data)
+        reviews = Review.objects.filter(providerid=provider).select_related('residentid__userid', 'bookingid__serviceid').order_by('-createdat')
+        return paginated_response(request, reviews, ProviderReviewSerializer, '-createdat', view=self)
 
 # ==========================================
 #  BKASH PAYMENT CONFIGURATION & VIEWS
 # ==========================================
 
-BKASH_BASE_URL = "https://checkout.sandbox.bka.sh/v1.2.0-beta/checkout"
-BKASH_USERNAME = "YOUR_SANDBOX_USERNAME"      
-BKASH_PASSWORD = "YOUR_SANDBOX_PASSWORD"      
-BKASH_APP_KEY = "YOUR_SANDBOX_APP_KEY"        
-BKASH_APP_SECRET = "YOUR_SANDBOX_APP_SECRET"  
-
-def get_bkash_token():
-    url = f"{BKASH_BASE_URL}/token/grant"
-    headers = {"username": BKASH_USERNAME, "password": BKASH_PASSWORD, "Content-Type": "application/json", "Accept": "application/json"}
-    body = {"app_key": BKASH_APP_KEY, "app_secret": BKASH_APP_SECRET}
-    try:
-        response = requests.post(url, json=body, headers=headers)
-        if response.status_code == 200:
-            return response.json().get('id_token')
-    except Exception as e:
-        print("Token Error:", e)
-    return None
+# All gateway calls go through base.bkash: one cached grant token shared by the workers,
+# a pooled session, timeouts and a circuit breaker. Executing the payment happens on the
+# background worker (base/payments.py), not inside the callback redirect.
 
 class BkashInitiateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -914,56 +1078,57 @@ class BkashInitiateView(APIView):
             booking = Booking.objects.get(bookingid=booking_id)
         except Booking.DoesNotExist:
             return Response({'error': 'Booking not found'}, status=400)
-        token = get_bkash_token()
-        if not token:
-            return Response({'error': 'bKash Auth Failed'}, status=500)
-        create_url = f"{BKASH_BASE_URL}/payment/create"
-        headers = {"Authorization": token, "X-APP-Key": BKASH_APP_KEY, "Content-Type": "application/json", "Accept": "application/json"}
+        if booking.paymentstatus == 'Paid':
+            return Response({'error': 'Booking is already paid'}, status=400)
         invoice_no = f"INV-{booking_id}-{uuid.uuid4().hex[:6].upper()}"
-        payload = {"mode": "0011", "payerReference": "01700000000", "callbackURL": f"http://127.0.0.1:8000/api/payment/bkash/callback/", "amount": str(booking.price), "currency": "BDT", "intent": "sale", "merchantInvoiceNumber": invoice_no}
-        response = requests.post(create_url, json=payload, headers=headers)
-        data = response.json()
-        if response.status_code == 200 and 'bkashURL' in data:
+        try:
+            data = bkash.get_client().create_payment(booking.price, invoice_no, payer_reference="01700000000")
+        except bkash.BkashUnavailable:
+            return Response({'error': 'bKash is unavailable, please try again shortly'}, status=503)
+        except bkash.BkashError as e:
+            return Response({'error': str(e)}, status=400)
+        if 'bkashURL' in data and data.get('paymentID'):
+            record_created_payment(booking, data['paymentID'])
             return Response({'payment_url': data['bkashURL']})
-        else:
-            return Response({'error': data.get('statusMessage', 'Failed')}, status=400)
+        return Response({'error': data.get('statusMessage', 'Failed')}, status=400)
 
 class BkashCallbackView(APIView):
     def get(self, request):
+        return_url = bkash.get_config()['RETURN_URL']
         payment_id = request.GET.get('paymentID')
         status_msg = request.GET.get('status') 
-        if status_msg != 'success':
-             return redirect('http://localhost:5173/book-service?payment=failed')
-        token = get_bkash_token()
-        if not token:
-            return redirect('http://localhost:5173/book-service?payment=error')
-        execute_url = f"{BKASH_BASE_URL}/payment/execute/{payment_id}"
-        headers = {"Authorization": token, "X-APP-Key": BKASH_APP_KEY, "Accept": "application/json"}
-        response = requests.post(execute_url, headers=headers)
-        data = response.json()
-        if data.get("statusCode") == "0000" and data.get("transactionStatus") == "Completed":
-             merchant_inv = data.get('merchantInvoiceNumber')
-             try:
-                 booking_id = merchant_inv.split('-')[1] 
-                 booking = Booking.objects.get(bookingid=booking_id)
-                 booking.status = 'Confirmed'
-                 booking.paymentstatus = 'Paid'
-                 booking.save()
-                 Payment.objects.create(bookingid=booking, amount=booking.price, method='Bkash', transactionid=data.get('trxID'), status='Completed')
-                 return redirect('http://localhost:5173/book-service?payment=success')
-             except Exception as e:
-                 print("DB Error:", e)
-                 return redirect('http://localhost:5173/book-service?payment=error')
-        else:
-             print("Execution Failed:", data)
-             return redirect('http://localhost:5173/book-service?payment=failed')
+        if status_msg != 'success' or not payment_id:
+             # Cancelled/failed sessions are marked Failed by reconciliation.
+             return redirect(f'{return_url}?payment=failed')
+        if not Payment.objects.filter(gatewaypaymentid=payment_id).exists():
+             return redirect(f'{return_url}?payment=error')
+        enqueue_execution(payment_id)
+        # The page polls BkashQueryPaymentView.get until the worker has settled it.
+        return redirect(f"{return_url}?{urlencode({'payment': 'processing', 'paymentID': payment_id})}")
 
 class BkashQueryPaymentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    def get(self, request):
+        # Our recorded status (no gateway call): Pending until the worker executes it.
+        payment = (
+            Payment.objects.filter(gatewaypaymentid=request.GET.get('paymentID'), bookingid__residentid=request.resident)
+            .values('status', 'bookingid', 'bookingid__status').first()
+        ) if request.resident else None
+        if payment is None:
+            return Response({'error': 'Payment not found'}, status=404)
+        return Response({'status': payment['status'], 'booking_id': payment['bookingid'], 'booking_status': payment['bookingid__status']})
     def post(self, request):
         payment_id = request.data.get('paymentID')
-        token = get_bkash_token()
-        query_url = f"{BKASH_BASE_URL}/payment/query/{payment_id}"
-        headers = {"Authorization": token, "X-APP-Key": BKASH_APP_KEY, "Accept": "application/json"}
-        response = requests.get(query_url, headers=headers)
-        return Response(response.json())
\ No newline at end of file
+        if not payment_id:
+            return Response({'error': 'paymentID is required'}, status=400)
+        try:
+            data = bkash.get_client().query_payment(payment_id)
+        except bkash.BkashUnavailable:
+            return Response({'error': 'bKash is unavailable, please try again shortly'}, status=503)
+        except bkash.BkashError as e:
+            return Response(e.data or {'error': str(e)}, status=400)
+        # The answer is authoritative, so use it to settle the payment early.
+        payment_pk = Payment.objects.filter(gatewaypaymentid=payment_id).values_list('pk', flat=True).first()
+        if payment_pk is not None:
+            apply_gateway_status(payment_pk, data)
+        return Response(data)
\ No newline at end of file
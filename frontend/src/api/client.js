@@ -23,4 +23,29 @@ api.interceptors.request.use(
   (error) => {
     return Promise.reject(error);
   }
-);
\ No newline at end of file
+);
+
+// --- Server-Sent Events (api/stream/) ---
+// EventSource cannot send headers, so the token goes in the query string.
+// handlers: { notification, counters, sos } -> called with the parsed JSON payload.
+// onUnavailable() is called when there is no stream to use: the browser has no
+// EventSource, or the server answered without one (204 when not served under ASGI),
+// so callers can poll instead. Returns a function that closes the stream.
+export function openEventStream(handlers, onUnavailable = () => {}) {
+  const token = localStorage.getItem("token");
+  if (!token) return () => {};
+  if (typeof EventSource === "undefined") {
+    onUnavailable();
+    return () => {};
+  }
+  const source = new EventSource(`${api.defaults.baseURL}stream/?token=${encodeURIComponent(token)}`);
+  Object.entries(handlers).forEach(([event, handler]) => {
+    source.addEventListener(event, (e) => handler(JSON.parse(e.data)));
+  });
+  // Network errors reconnect by themselves (readyState CONNECTING); a 204 or an
+  // error status closes the source for good.
+  source.onerror = () => {
+    if (source.readyState === EventSource.CLOSED) onUnavailable();
+  };
+  return () => source.close();
+}
@@ -17,7 +17,7 @@ import {
 import { Row, Col, Container, Card, ProgressBar } from 'react-bootstrap';
 
 import './AuthorityDashboard.css'; 
-import { api } from "../../api/client";
+import { api, openEventStream } from "../../api/client";
 
 function AuthorityDashboard() {
   const navigate = useNavigate();
@@ -81,8 +81,17 @@ function AuthorityDashboard() {
     };
     
     fetchStats();
-    const interval = setInterval(fetchStats, 30000);
-    return () => clearInterval(interval);
+    // Refresh when the server pushes new SOS/issue counters; the slow poll is only a fallback,
+    // and polls faster when the server has no event stream.
+    let interval = setInterval(fetchStats, 120000);
+    const closeStream = openEventStream({ counters: fetchStats }, () => {
+      clearInterval(interval);
+      interval = setInterval(fetchStats, 30000);
+    });
+    return () => {
+      closeStream();
+      clearInterval(interval);
+    };
   }, []);
 
   const handleLogout = () => {
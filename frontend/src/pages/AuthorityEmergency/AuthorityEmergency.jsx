@@ -7,13 +7,15 @@ import {
   MapPin, CheckCircle, ShieldAlert, Ambulance, Flame
 } from 'lucide-react';
 import { Row, Col, Card, Badge, Button } from 'react-bootstrap';
-import { api } from "../../api/client"; 
+import { api, openEventStream } from "../../api/client"; 
 import './AuthorityEmergency.css';
 
 const AuthorityEmergency = () => {
   const navigate = useNavigate();
   const [loading, setLoading] = useState(true);
   const [emergencies, setEmergencies] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   
   // Sidebar User State
   const [userInfo, setUserInfo] = useState({
@@ -46,10 +48,33 @@ const AuthorityEmergency = () => {
   }, [navigate]);
 
   // --- 2. Fetch SOS Reports ---
+  // The list is paginated: the first page carries the pending SOS ("pending") plus the
+  // newest of the timeline; older history is loaded on demand with the next cursor.
+
+  // Pending first, each group newest first (the server's order).
+  const byQueue = (a, b) => {
+    const pendingA = a.status === 'Pending';
+    const pendingB = b.status === 'Pending';
+    if (pendingA !== pendingB) return pendingA ? -1 : 1;
+    return new Date(b.timestamp) - new Date(a.timestamp);
+  };
+
+  // Fresh rows replace what we had for the same SOS; nothing already loaded is dropped.
+  const mergeEmergencies = (current, incoming) => {
+    const byId = new Map(current.map((e) => [e.sosid || e.id, e]));
+    incoming.forEach((e) => {
+      const id = e.sosid || e.id;
+      byId.set(id, { ...byId.get(id), ...e });
+    });
+    return [...byId.values()].sort(byQueue);
+  };
+
   const fetchEmergencies = async () => {
     try {
-      const response = await api.get('authority/sos/'); 
-      setEmergencies(response.data);
+      const response = await api.get('authority/sos/');
+      const { pending = [], results, next_cursor } = response.data;
+      setEmergencies((current) => mergeEmergencies(current, [...pending, ...results]));
+      setNextCursor((cursor) => cursor || next_cursor);
     } catch (err) {
       console.error("Backend connection failed:", err);
     } finally {
@@ -57,10 +82,39 @@ const AuthorityEmergency = () => {
     }
   };
 
+  const loadOlder = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await api.get(`authority/sos/?cursor=${encodeURIComponent(nextCursor)}`);
+      setEmergencies((current) => mergeEmergencies(current, response.data.results));
+      setNextCursor(response.data.next_cursor);
+    } catch (err) {
+      console.error("Failed to load older SOS reports:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // A pushed SOS carries the card's fields; merge it instead of refetching the list.
+  // The evidence photo is attached afterwards and shows up with the fallback poll.
+  const mergeEmergency = (sos) => {
+    setEmergencies((current) => mergeEmergencies(current, [sos]));
+  };
+
   useEffect(() => {
     fetchEmergencies();
-    const interval = setInterval(fetchEmergencies, 5000); 
-    return () => clearInterval(interval);
+    // New SOS alerts are pushed over the event stream; the poll is only a fallback,
+    // and polls faster when the server has no event stream.
+    let interval = setInterval(fetchEmergencies, 60000);
+    const closeStream = openEventStream({ sos: mergeEmergency }, () => {
+      clearInterval(interval);
+      interval = setInterval(fetchEmergencies, 10000);
+    });
+    return () => {
+      closeStream();
+      clearInterval(interval);
+    };
   }, []);
 
   const handleLogout = () => {
@@ -262,6 +316,13 @@ const AuthorityEmergency = () => {
             </table>
           </div>
         </Card>
+        {nextCursor && (
+          <div className="text-center mt-3">
+            <Button variant="outline-secondary" size="sm" onClick={loadOlder} disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load older reports'}
+            </Button>
+          </div>
+        )}
 
       </main>
     </div>
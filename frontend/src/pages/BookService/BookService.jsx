@@ -7,7 +7,7 @@ import {
 } from "lucide-react";
 import { Modal, Button, Form, Badge, Tabs, Tab } from "react-bootstrap";
 import "./BookService.css"; 
-import { api } from "../../api/client"; 
+import { api, openEventStream } from "../../api/client"; 
 
 const Sidebar = () => {
   const navigate = useNavigate();
@@ -71,6 +71,7 @@ const BookService = () => {
   const [paymentMethod, setPaymentMethod] = useState("Cash");
   const [isBooking, setIsBooking] = useState(false);
   const [deletingIds, setDeletingIds] = useState([]); // To track which items are deleting
+  const [paymentNotice, setPaymentNotice] = useState(null); // bKash payment awaiting confirmation
 
   useEffect(() => {
     localStorage.removeItem('resident_notifications');
@@ -101,12 +102,44 @@ const BookService = () => {
             alert("Payment Successful! Your booking is confirmed.");
         } else if (status === 'failed') {
             alert("Payment Failed or Cancelled. Please try again.");
+        } else if (status === 'error') {
+            alert("We could not find this payment. Please contact support if you were charged.");
+        } else if (status === 'processing' && query.get('paymentID')) {
+            waitForPayment(query.get('paymentID'));
         }
         window.history.replaceState({}, document.title, window.location.pathname);
         fetchBookings();
     }
   };
 
+  // bKash returns here before the payment is executed (that happens on the server's
+  // worker), so poll its recorded status until it is final.
+  const waitForPayment = async (paymentId, attempt = 0) => {
+    setPaymentNotice("Your payment is being confirmed. This usually takes a few seconds...");
+    try {
+      const res = await api.get(`payment/bkash/query/?paymentID=${encodeURIComponent(paymentId)}`);
+      if (res.data.status === 'Completed') {
+        setPaymentNotice(null);
+        alert("Payment Successful! Your booking is confirmed.");
+        fetchBookings();
+        return;
+      }
+      if (res.data.status === 'Failed') {
+        setPaymentNotice(null);
+        alert("Payment Failed or Cancelled. Please try again.");
+        fetchBookings();
+        return;
+      }
+    } catch (err) {
+      console.error("Error checking payment status", err);
+    }
+    if (attempt >= 40) {
+      setPaymentNotice("Your payment is still being confirmed. Check your bookings again in a minute.");
+      return;
+    }
+    setTimeout(() => waitForPayment(paymentId, attempt + 1), 3000);
+  };
+
   const fetchServices = async () => {
     try {
       const res = await api.get('resident/services/');
@@ -118,13 +151,20 @@ const BookService = () => {
 
   const fetchBookings = async () => {
     try {
-      const res = await api.get('resident/bookings/');
+      const res = await api.get('resident/bookings/?paginate=false');
       setBookings(res.data);
     } catch (err) {
       console.error("Error fetching bookings", err);
     }
   };
 
+  // New notifications are pushed over the event stream: bump the badge instead of refetching.
+  useEffect(() => {
+    return openEventStream({
+      notification: (n) => { if (!n.isread) setNotificationCount((count) => count + 1); },
+    });
+  }, []);
+
   const fetchBadgeCount = async (userId) => {
     if (!userId) return;
     try {
@@ -321,6 +361,11 @@ const BookService = () => {
             <div className="page-subtitle">Find and book community professionals</div>
           </div>
         </div>
+        {paymentNotice && (
+          <div className="alert alert-info d-flex align-items-center mb-4" role="status">
+            <Clock size={18} className="me-2" /> {paymentNotice}
+          </div>
+        )}
         <Tabs defaultActiveKey="browse" id="service-tabs" className="mb-4 custom-tabs">
           <Tab eventKey="browse" title="Browse Services">
             <div className="search-wrapper mb-4">
@@ -7,7 +7,7 @@ import {
 } from "lucide-react";
 import { Modal, Button, Badge, Form, Tabs, Tab } from "react-bootstrap";
 import "./CommunityEvents.css";
-import { api } from "../../api/client"; 
+import { api, openEventStream } from "../../api/client"; 
 
 const Sidebar = () => {
   const navigate = useNavigate();
@@ -96,7 +96,7 @@ const CommunityEvents = () => {
   const fetchData = async () => {
     try {
       const [eventsRes, partRes, pendingRes] = await Promise.all([
-        api.get('resident/events/'),
+        api.get('resident/events/?paginate=false'),
         api.get('resident/events/participate/'),
         api.get('resident/events/pending/') 
       ]);
@@ -118,6 +118,13 @@ const CommunityEvents = () => {
   };
 
   // --- SYNCHRONIZED BADGE LOGIC ---
+  // New notifications are pushed over the event stream: bump the badge instead of refetching.
+  useEffect(() => {
+    return openEventStream({
+      notification: (n) => { if (!n.isread) setNotificationCount((count) => count + 1); },
+    });
+  }, []);
+
   const fetchBadgeCount = async (userId) => {
     if (!userId) return;
     try {
@@ -50,7 +50,7 @@ const CommunityVoting = () => {
   useEffect(() => {
     const fetchVotingResults = async () => {
       try {
-        const response = await api.get('authority/voting-results/');
+        const response = await api.get('authority/voting-results/?paginate=false');
         setVotingData(response.data);
       } catch (err) {
         console.error("Backend not running or endpoint missing:", err);
@@ -96,7 +96,7 @@ const CustomerReviews = () => {
             });
 
             // 2. Fetch Reviews
-            const reviewsRes = await api.get('/provider/reviews/');
+            const reviewsRes = await api.get('/provider/reviews/?paginate=false');
             const fetchedReviews = reviewsRes.data;
             setReviews(fetchedReviews);
 
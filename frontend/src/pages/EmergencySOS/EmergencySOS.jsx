@@ -9,7 +9,7 @@ import { MapContainer, TileLayer, Marker, useMap, useMapEvents } from 'react-lea
 import 'leaflet/dist/leaflet.css';
 import L from 'leaflet';
 import "./EmergencySOS.css";
-import { api } from "../../api/client"; 
+import { api, openEventStream } from "../../api/client"; 
 import icon from 'leaflet/dist/images/marker-icon.png';
 import iconShadow from 'leaflet/dist/images/marker-shadow.png';
 
@@ -96,6 +96,13 @@ const EmergencySOS = () => {
     handleGetLocation(); 
   }, []);
 
+  // New notifications are pushed over the event stream: bump the badge instead of refetching.
+  useEffect(() => {
+    return openEventStream({
+      notification: (n) => { if (!n.isread) setNotificationCount((count) => count + 1); },
+    });
+  }, []);
+
   const fetchBadgeCount = async (userId) => {
     try {
       const response = await api.get('resident/notifications/');
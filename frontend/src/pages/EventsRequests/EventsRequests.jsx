@@ -107,8 +107,8 @@ const EventsRequests = () => {
     try {
       setLoading(true);
       const [eventsRes, requestsRes] = await Promise.all([
-         api.get('authority/events/'),
-         api.get('authority/events/requests/')
+         api.get('authority/events/?paginate=false'),
+         api.get('authority/events/requests/?paginate=false')
       ]);
       setEvents(eventsRes.data);
       setRequests(requestsRes.data);
@@ -7,7 +7,7 @@ import { MapContainer, TileLayer, Marker, useMap, useMapEvents } from 'react-lea
 import 'leaflet/dist/leaflet.css';
 import L from 'leaflet';
 import "./IssueReports.css";
-import { api } from "../../api/client"; 
+import { api, openEventStream } from "../../api/client"; 
 import icon from 'leaflet/dist/images/marker-icon.png';
 import iconShadow from 'leaflet/dist/images/marker-shadow.png';
 
@@ -86,6 +86,13 @@ const IssueReports = () => {
     fetchIssues();
   }, []);
 
+  // New notifications are pushed over the event stream: bump the badge instead of refetching.
+  useEffect(() => {
+    return openEventStream({
+      notification: (n) => { if (!n.isread) setNotificationCount((count) => count + 1); },
+    });
+  }, []);
+
   const fetchBadgeCount = async (userId) => {
     try {
       const response = await api.get('resident/notifications/');
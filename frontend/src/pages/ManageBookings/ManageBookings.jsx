@@ -66,7 +66,7 @@ const ManageBookings = ({ handleLogout }) => {
 
     const fetchBookings = async () => {
         try {
-            const response = await api.get('/provider/bookings/');
+            const response = await api.get('/provider/bookings/?paginate=false');
             const mapped = response.data.map(b => ({
                 id: b.bookingid,
                 client_name: b.resident_name || 'Resident',
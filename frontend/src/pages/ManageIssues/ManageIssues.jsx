@@ -67,7 +67,7 @@ const ManageIssues = () => {
     const fetchData = async () => {
       try {
         const [issuesRes, deptRes] = await Promise.all([
-            api.get('issues/'),              
+            api.get('issues/?paginate=false'),              
             api.get('authority/departments/') 
         ]);
 
@@ -3,7 +3,7 @@ import React, { useState, useEffect } from "react";
 import { Link, useNavigate } from "react-router-dom";
 import { LayoutDashboard, AlertCircle, Briefcase, Calendar, Bell, LogOut, User, MapPin, Clock, ThumbsUp, ThumbsDown } from "lucide-react";
 import "./ResidentCommunityVoting.css";
-import { api } from "../../api/client"; 
+import { api, openEventStream } from "../../api/client"; 
 
 const Sidebar = () => {
   const navigate = useNavigate();
@@ -55,6 +55,13 @@ const ResidentCommunityVoting = () => {
 
   const fetchIssues = async () => { try { const response = await api.get('resident/community-issues/'); const initializedIssues = response.data.map(issue => ({ ...issue, upvotes: issue.upvotes || 0, downvotes: issue.downvotes || 0, userVote: issue.user_vote })); setIssues(initializedIssues); } catch (error) { console.error("Failed to fetch issues:", error); } finally { setLoading(false); } };
 
+  // New notifications are pushed over the event stream: bump the badge instead of refetching.
+  useEffect(() => {
+    return openEventStream({
+      notification: (n) => { if (!n.isread) setNotificationCount((count) => count + 1); },
+    });
+  }, []);
+
   const fetchBadgeCount = async (userId) => {
     try {
       const response = await api.get('resident/notifications/');
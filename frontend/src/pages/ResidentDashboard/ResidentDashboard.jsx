@@ -8,7 +8,7 @@ import {
 } from 'lucide-react';
 import { Row, Col, Container, Badge } from 'react-bootstrap';
 import './ResidentDashboard.css';
-import { api } from "../../api/client"; 
+import { api, openEventStream } from "../../api/client"; 
 
 function ResidentDashboard() {
   const navigate = useNavigate();
@@ -65,6 +65,13 @@ function ResidentDashboard() {
     fetchData();
   }, [navigate]);
 
+  // New notifications are pushed over the event stream: bump the badge instead of refetching.
+  useEffect(() => {
+    return openEventStream({
+      notification: (n) => { if (!n.isread) setNotificationCount((count) => count + 1); },
+    });
+  }, []);
+
   const fetchBadgeCount = async (userId) => {
     try {
       // Fetch DB Notifications
@@ -5,7 +5,7 @@ import {
   User, CheckCircle, Info, AlertTriangle, ThumbsUp, CheckSquare
 } from "lucide-react";
 import "./ResidentNotification.css";
-import { api } from "../../api/client"; 
+import { api, openEventStream } from "../../api/client"; 
 
 const Sidebar = () => {
   const navigate = useNavigate();
@@ -95,6 +95,25 @@ const ResidentNotification = () => {
     });
   };
 
+  // New notifications are pushed over the event stream: prepend them instead of refetching.
+  useEffect(() => {
+    return openEventStream({
+      notification: (n) => {
+        const item = {
+          id: `db-${n.notificationid}`,
+          type: n.type,
+          message: n.message,
+          date: formatDateTime(n.createdat),
+          timestamp: new Date(n.createdat).getTime(),
+          read: n.isread,
+          link: n.link
+        };
+        setNotifications((current) => (current.some((c) => c.id === item.id) ? current : [item, ...current]));
+        if (!n.isread) setNotificationCount((count) => count + 1);
+      },
+    });
+  }, []);
+
   const fetchNotifications = async (userId) => {
     if (!userId) return;
 
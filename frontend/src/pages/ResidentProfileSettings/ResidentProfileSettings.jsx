@@ -6,7 +6,7 @@ import {
   User, MapPin, Users, Save, Shield, ThumbsUp, Lock, Key
 } from "lucide-react";
 import "./ResidentProfileSettings.css";
-import { api } from "../../api/client"; 
+import { api, openEventStream } from "../../api/client"; 
 
 const Sidebar = () => {
   const navigate = useNavigate();
@@ -107,6 +107,13 @@ const ResidentProfileSettings = () => {
     fetchAllData();
   }, []);
 
+  // New notifications are pushed over the event stream: bump the badge instead of refetching.
+  useEffect(() => {
+    return openEventStream({
+      notification: (n) => { if (!n.isread) setNotificationCount((count) => count + 1); },
+    });
+  }, []);
+
   const fetchBadgeCount = async (userId) => {
     try {
       const response = await api.get('resident/notifications/');